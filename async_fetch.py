@@ -0,0 +1,148 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import aiohttp
+
+
+# Requests per second (and burst size) allowed per host. Every coroutine that
+# talks to the same host shares one bucket, so adding more concurrent games
+# does not add more load on Steam.
+HOST_RATE_LIMITS = {
+    "store.steampowered.com": (1.5, 3),
+    "api.gamalytic.com": (5.0, 5),
+}
+DEFAULT_RATE_LIMIT = (2.0, 4)
+
+REQUEST_TIMEOUT_S = 30
+MAX_RETRIES = 6
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 120.0
+
+# HTTP status codes worth retrying; anything else >= 400 is a hard failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, holding at most `capacity`.
+    Each request takes one token. `pause()` empties the bucket for a while so
+    a 429 on one coroutine slows down every coroutine using the same host.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        # Push the bucket into debt so nobody gets a token for `seconds`
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+_buckets: dict[str, TokenBucket] = {}
+
+
+def bucket_for(url: str) -> TokenBucket:
+    """Return the shared token bucket for the host of `url`."""
+    host = urlparse(url).hostname or ""
+    if host not in _buckets:
+        rate, capacity = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+        _buckets[host] = TokenBucket(rate, capacity)
+    return _buckets[host]
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After can be a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """
+    Exponential backoff with jitter. If the server told us how long to wait
+    we wait at least that long, plus some jitter so the workers don't all
+    come back at the same instant.
+    """
+    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay + random.uniform(0, delay / 2)
+
+
+def make_session(limit_per_host: int = 8) -> aiohttp.ClientSession:
+    """One pooled session shared by all fetchers."""
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_S),
+        connector=aiohttp.TCPConnector(limit_per_host=limit_per_host),
+    )
+
+
+async def get_json(session: aiohttp.ClientSession, url: str, params: dict | None = None,
+                   label: str = "", max_retries: int = MAX_RETRIES):
+    """
+    GET `url` and return the decoded JSON body.
+    Waits on the host's token bucket before every attempt, retries 429/5xx
+    and connection errors with backoff, and honors Retry-After.
+    """
+    bucket = bucket_for(url)
+    label = label or url
+
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        retry_after = None
+        try:
+            async with session.get(url, params=params) as resp:
+                if resp.status in RETRY_STATUSES:
+                    retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                    reason = f"HTTP {resp.status}"
+                else:
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+        except aiohttp.ClientResponseError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            reason = f"{type(e).__name__}: {e}"
+
+        if attempt == max_retries:
+            break
+
+        delay = backoff_delay(attempt, retry_after)
+        if retry_after is not None:
+            bucket.pause(delay)
+        print(f"[{label}] {reason}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+        await asyncio.sleep(delay)
+
+    raise RuntimeError(f"[{label}] giving up after {max_retries} retries ({reason})")
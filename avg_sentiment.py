@@ -1,11 +1,19 @@
 import csv
-import time
-import json
-import requests
+import argparse
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import aiohttp
 import pandas as pd
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from async_fetch import make_session
+from review_source import ReviewSource, filter_reviews
+from sentiment_cache import CACHE_DB_PATH
+from sentiment_scoring import make_scoring_pool, worker_scores_cached
+from vader_batch import require_lexicon
 
 
 # Paths
@@ -18,8 +26,9 @@ MIN_PLAYTIME_HOURS = 5          # >= 5 hours
 MIN_WORDS_PER_REVIEW = 5        # >= 5 words
 TARGET_REVIEWS_PER_GAME = 1000  # try to collect this many matching reviews per game
 
-# Steam reviews endpoint
-STEAM_REVIEWS_URL = "https://store.steampowered.com/appreviews/{appid}"
+# Pipeline sizing
+MAX_CONCURRENT_GAMES = 8   # games being fetched at the same time
+PAGES_AHEAD = 4            # pages per game allowed to wait for a scoring worker
 
 
 def load_games_from_csv(path: Path):
@@ -40,86 +49,57 @@ def load_games_from_csv(path: Path):
     return games
 
 
-def fetch_filtered_reviews_sentiment(appid: int,
-                                     sid: SentimentIntensityAnalyzer,
-                                     target_n: int = TARGET_REVIEWS_PER_GAME):
+def filter_and_score(page: pd.DataFrame, min_playtime_minutes: int, min_words: int):
+    """Runs in a worker: filter one page of reviews and return their compound scores in order."""
+    reviews = filter_reviews(page, min_playtime_minutes, min_words)
+    return worker_scores_cached(reviews["recommendationid"], reviews["review"])
+
+
+async def fetch_filtered_reviews_sentiment(game: dict,
+                                           source: ReviewSource,
+                                           session,
+                                           pool: ProcessPoolExecutor,
+                                           target_n: int = TARGET_REVIEWS_PER_GAME,
+                                           pages_ahead: int = PAGES_AHEAD):
     """
-    Fetch reviews from Steam for a given appid and compute VADER compound
-    sentiment for up to `target_n` reviews that match:
-      - language = English (handled by API)
+    Compute VADER compound sentiment for up to `target_n` of the newest
+    reviews of a game that match:
+      - language = English
       - playtime >= MIN_PLAYTIME_HOURS
       - review has >= MIN_WORDS_PER_REVIEW words
+    Reviews come from the local corpus first; `source` only goes to the
+    Steam API for games we don't have or reviews newer than ours.
+
+    Pages are filtered and scored in `pool` while the next page is fetched.
+    At most `pages_ahead` pages per game are waiting to be scored, and we
+    stop fetching once `target_n` scores are in. Scores are kept in page
+    order, so the result is the same as scoring one page at a time.
     Returns (avg_sentiment, count_used).
     """
-    url = STEAM_REVIEWS_URL.format(appid=appid)
-    cursor = "*"
+    loop = asyncio.get_running_loop()
+    pending = deque()
     collected_scores = []
-    min_playtime_minutes = MIN_PLAYTIME_HOURS * 60
-
-    while len(collected_scores) < target_n:
-        params = {
-            "json": 1,
-            "language": "english",
-            "filter": "recent",      # could also use 'all'; 'recent' is fine
-            "review_type": "all",
-            "purchase_type": "all",
-            "num_per_page": 100,
-            "cursor": cursor,
-        }
+    pages = source.iter_pages_async(session, game["appid"], game["slug"])
 
-        resp = requests.get(url, params=params, timeout=3)
+    try:
+        async for page in pages:
+            pending.append(loop.run_in_executor(
+                pool, filter_and_score, page, MIN_PLAYTIME_HOURS * 60, MIN_WORDS_PER_REVIEW))
 
-        if resp.status_code == 429:
-            print(f"[appid {appid}] rate limited, sleeping 10s...")
-            time.sleep(10)
-            continue
-
-        resp.raise_for_status()
-        data = resp.json()
-
-        if data.get("success") != 1:
-            print(f"[appid {appid}] request unsuccessful, stopping.")
-            break
-
-        reviews = data.get("reviews", [])
-        if not reviews:
-            print(f"[appid {appid}] no more reviews from API, stopping.")
-            break
-
-        for r in reviews:
-            # Text filter
-            text = (r.get("review") or "").strip()
-            if not text:
-                continue
-            if len(text.split()) < MIN_WORDS_PER_REVIEW:
-                continue
-
-            # Playtime filter
-            author = r.get("author", {}) or {}
-            playtime_forever = author.get("playtime_forever")
-            if playtime_forever is None:
-                continue
-            try:
-                playtime_forever = int(playtime_forever)
-            except (TypeError, ValueError):
-                continue
-
-            if playtime_forever < min_playtime_minutes:
-                continue
-
-            # Passed filters → compute VADER sentiment
-            compound = sid.polarity_scores(text)["compound"]
-            collected_scores.append(compound)
+            while pending and (len(pending) >= pages_ahead or pending[0].done()):
+                collected_scores.extend(await pending.popleft())
 
             if len(collected_scores) >= target_n:
                 break
 
-        new_cursor = data.get("cursor")
-        if not new_cursor or new_cursor == cursor:
-            # No further pages
-            break
-        cursor = new_cursor
+        while pending and len(collected_scores) < target_n:
+            collected_scores.extend(await pending.popleft())
+    finally:
+        for fut in pending:
+            fut.cancel()
+        await pages.aclose()
 
+    collected_scores = collected_scores[:target_n]
     if not collected_scores:
         return None, 0
 
@@ -127,32 +107,66 @@ def fetch_filtered_reviews_sentiment(appid: int,
     return avg_sentiment, len(collected_scores)
 
 
-def main():
-    # Load the list of games for which we want sentiment
-    games = load_games_from_csv(GAMES_LIST_PATH)
-    print(f"Loaded {len(games)} games from {GAMES_LIST_PATH}")
-
-    sid = SentimentIntensityAnalyzer()
-
-    results = []
+async def compute_all_sentiment(games, source: ReviewSource, workers: int, concurrency: int,
+                                cache_path=CACHE_DB_PATH):
+    """
+    Run the fetch/score pipeline for every game, `concurrency` games at a time.
+    Workers reuse scores from the sentiment cache at cache_path (None = no cache).
+    """
+    sem = asyncio.Semaphore(concurrency)
 
-    for i, game in enumerate(games, start=1):
+    async def one(i, session, pool, game):
         appid = game["appid"]
         name = game["name"] or f"appid_{appid}"
-        print(f"\n[{i}/{len(games)}] Processing {name} (appid {appid})")
 
-        avg_sent, count = fetch_filtered_reviews_sentiment(appid, sid)
+        async with sem:
+            print(f"[{i}/{len(games)}] Processing {name} (appid {appid})")
+            try:
+                avg_sent, count = await fetch_filtered_reviews_sentiment(game, source, session, pool)
+            except (aiohttp.ClientError, RuntimeError, ValueError, TypeError, KeyError) as e:
+                # one bad game must not cancel the others; it is written with no sentiment
+                print(f"  [appid {appid}] failed: {e}")
+                avg_sent, count = None, 0
 
         if avg_sent is None:
-            print(f"  → No qualifying reviews found for this game.")
+            print(f"  [appid {appid}] → No qualifying reviews found for this game.")
         else:
-            print(f"  → Used {count} reviews, avg sentiment = {avg_sent:.4f}")
+            print(f"  [appid {appid}] → Used {count} reviews, avg sentiment = {avg_sent:.4f}")
 
-        results.append({
+        return {
             "appid": appid,
             "avg_sentiment_vader": avg_sent,
             "n_reviews_sentiment": count,
-        })
+        }
+
+    with make_scoring_pool(workers, cache_path) as pool:
+        async with make_session(limit_per_host=concurrency) as session:
+            return await asyncio.gather(*(one(i, session, pool, g) for i, g in enumerate(games, start=1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Average VADER sentiment per game.")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use reviews already saved locally, never call the Steam API")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of scoring processes")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_GAMES,
+                        help="number of games fetched at the same time")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="rescore everything instead of reusing cached scores")
+    args = parser.parse_args()
+
+    # Fail now, not in every worker, if the VADER lexicon was never downloaded
+    require_lexicon()
+
+    source = ReviewSource(allow_network=not args.offline)
+
+    # Load the list of games for which we want sentiment
+    games = load_games_from_csv(GAMES_LIST_PATH)
+    print(f"Loaded {len(games)} games from {GAMES_LIST_PATH}")
+
+    cache_path = None if args.no_cache else CACHE_DB_PATH
+    results = asyncio.run(compute_all_sentiment(games, source, args.workers, args.concurrency, cache_path))
 
     # Turn results into a DataFrame
     sentiment_df = pd.DataFrame(results)
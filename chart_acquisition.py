@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import csv
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import aiohttp
+
+from async_fetch import get_json, make_session
+
+
+GAME_LIST_CSV = Path("data/games_list.csv")
+CHART_DIR = Path("game_concurrent_players")
+CHART_FILE = "steamcharts_chart_{appid}.csv"  # one of player_store.CHART_DIR_GLOBS
+STEAMDB_CHART_FILE = "steamdb_chart_{appid}.csv"  # hand-downloaded SteamDB charts, never touched here
+QUEUE_DB_PATH = Path(__file__).resolve().parent / "data" / "chart_queue.db"
+
+STEAMCHARTS_BASE_URL = "https://steamcharts.com"
+MAX_CONCURRENT_CHARTS = 8  # requests still go through the per-host rate limit in async_fetch
+REFRESH_AFTER_DAYS = 7
+CHART_HEADER = ["DateTime", "Players", "Average Players"]
+
+
+def daily_peaks(points):
+    """
+    [[ms timestamp, players], ...] -> [(UTC day "YYYY-MM-DD 00:00:00", peak players)],
+    one row per day with data, oldest first: the shape of a SteamDB daily chart.
+    """
+    peaks = {}
+    for ts, players in points:
+        if players is None:
+            continue
+        day = int(ts) // 1000 // 86_400
+        peaks[day] = max(peaks.get(day, players), players)
+    return [(datetime.fromtimestamp(day * 86_400, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"), int(p))
+            for day, p in sorted(peaks.items())]
+
+
+class SteamChartsSource:
+    """Player charts from steamcharts' chart-data.json (the same data 90_day_concurrent_player.py uses)."""
+
+    name = "steamcharts"
+
+    def __init__(self, base_url=STEAMCHARTS_BASE_URL):
+        self.base_url = base_url.rstrip("/")
+
+    def url(self, appid):
+        return f"{self.base_url}/app/{appid}/chart-data.json"
+
+    async def fetch(self, session, appid):
+        """The chart for appid as (DateTime, Players) rows, one per day."""
+        points = await get_json(session, self.url(appid), label=f"{self.name} {appid}")
+        if not isinstance(points, list) or not all(
+                isinstance(p, list) and len(p) == 2 and isinstance(p[0], (int, float))
+                and (p[1] is None or isinstance(p[1], (int, float))) for p in points):
+            raise ValueError(f"unexpected chart payload: {str(points)[:100]}")
+        return daily_peaks(points)
+
+
+# A chart source needs a `name` and `async fetch(session, appid)` returning
+# (DateTime, Players) rows; register new ones here to make them selectable
+CHART_SOURCES = {
+    SteamChartsSource.name: SteamChartsSource,
+}
+
+
+class ChartQueue:
+    """
+    Persistent queue of the appids whose chart needs (re)fetching, in
+    SQLite so a job that is stopped picks up where it left off. An appid
+    stays pending until its chart is written; failures are retried on the
+    next run, the ones that failed least often first.
+    """
+
+    def __init__(self, db_path=QUEUE_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS charts (
+                appid INTEGER PRIMARY KEY,
+                pending INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                refreshed_at INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    def enqueue_due(self, appids, chart_dir=CHART_DIR, max_age_days=REFRESH_AFTER_DAYS, force=False, prune=False):
+        """
+        Queue the appids whose chart was never fetched, is missing, or was last
+        refreshed more than max_age_days ago. Appids with a SteamDB download
+        are left alone unless `force`. With `prune`, appids is the whole games
+        list and queued appids not in it are dropped. Returns how many are pending.
+        """
+        cutoff = time.time() - max_age_days * 86_400
+        refreshed = dict(self.conn.execute("SELECT appid, refreshed_at FROM charts"))
+        due, skipped = [], []
+        for appid in appids:
+            appid = int(appid)
+            if not force and (Path(chart_dir) / STEAMDB_CHART_FILE.format(appid=appid)).exists():
+                skipped.append((appid,))
+                continue
+            fetched = (Path(chart_dir) / CHART_FILE.format(appid=appid)).exists() and refreshed.get(appid)
+            if not fetched or refreshed[appid] < cutoff:
+                due.append((appid,))
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO charts (appid, pending) VALUES (?, 1)", due)
+            self.conn.executemany("UPDATE charts SET pending = 1 WHERE appid = ?", due)
+            self.conn.executemany("UPDATE charts SET pending = 0 WHERE appid = ?", skipped)
+            if prune:
+                listed = {int(a) for a in appids}
+                self.conn.executemany("DELETE FROM charts WHERE appid = ?",
+                                      [(a,) for a in refreshed if a not in listed])
+        return len(self.pending())
+
+    def pending(self):
+        return [r[0] for r in self.conn.execute("SELECT appid FROM charts WHERE pending = 1 ORDER BY attempts, appid")]
+
+    def mark_done(self, appid):
+        with self.conn:
+            self.conn.execute("UPDATE charts SET pending = 0, attempts = 0, last_error = NULL, refreshed_at = ? "
+                              "WHERE appid = ?", (int(time.time()), appid))
+
+    def mark_failed(self, appid, error):
+        with self.conn:
+            self.conn.execute("UPDATE charts SET attempts = attempts + 1, last_error = ? WHERE appid = ?",
+                              (str(error), appid))
+
+    def close(self):
+        self.conn.close()
+
+
+def write_chart_csv(path: Path, rows):
+    """Write a chart in the SteamDB CSV layout via a temp file, so readers never see half a chart."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CHART_HEADER)
+        writer.writerows((day, players, "") for day, players in rows)
+    os.replace(tmp_path, path)
+
+
+async def refresh_charts(queue: ChartQueue, source, chart_dir=CHART_DIR, concurrency=MAX_CONCURRENT_CHARTS):
+    """Fetch every pending chart, `concurrency` at a time. Returns (charts written, failures)."""
+    todo = queue.pending()
+    sem = asyncio.Semaphore(concurrency)
+    written = failed = 0
+
+    async def one(i, session, appid):
+        nonlocal written, failed
+        async with sem:
+            try:
+                rows = await source.fetch(session, appid)
+                if not rows:
+                    raise RuntimeError("empty chart")
+            except (aiohttp.ClientError, RuntimeError, ValueError, TypeError, KeyError) as e:
+                queue.mark_failed(appid, e)
+                failed += 1
+                print(f"[{i}/{len(todo)}] appid {appid}: failed: {e}")
+                return
+            await asyncio.to_thread(write_chart_csv, Path(chart_dir) / CHART_FILE.format(appid=appid), rows)
+        queue.mark_done(appid)
+        written += 1
+        print(f"[{i}/{len(todo)}] appid {appid}: {len(rows)} days, {rows[0][0][:10]} to {rows[-1][0][:10]}")
+
+    async with make_session(limit_per_host=concurrency) as session:
+        await asyncio.gather(*(one(i, session, a) for i, a in enumerate(todo, start=1)))
+    return written, failed
+
+
+def main():
+    from review_collection import load_games_from_csv
+
+    parser = argparse.ArgumentParser(description="Fetch player charts into game_concurrent_players/ without a browser.")
+    parser.add_argument("--source", choices=sorted(CHART_SOURCES), default=SteamChartsSource.name)
+    parser.add_argument("--base-url", help="fetch from this host instead of the source's own (e.g. a local stub)")
+    parser.add_argument("--appid", type=int, action="append", help=f"appid to refresh (repeatable; default: {GAME_LIST_CSV})")
+    parser.add_argument("--max-age-days", type=float, default=REFRESH_AFTER_DAYS,
+                        help="refresh charts last fetched longer ago than this (0 = refresh all)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_CHARTS)
+    parser.add_argument("--chart-dir", type=Path, default=CHART_DIR)
+    parser.add_argument("--force", action="store_true",
+                        help="also fetch games that have a SteamDB download (it is kept; the store merges both)")
+    parser.add_argument("--ingest", action="store_true", help="update the player store afterwards")
+    args = parser.parse_args()
+
+    source_cls = CHART_SOURCES[args.source]
+    source = source_cls(args.base_url) if args.base_url else source_cls()
+    appids = args.appid or [g["appid"] for g in load_games_from_csv(GAME_LIST_CSV)]
+
+    queue = ChartQueue()
+    try:
+        pending = queue.enqueue_due(appids, args.chart_dir, args.max_age_days, args.force, prune=not args.appid)
+        print(f"{pending} chart(s) to fetch from {source.name}")
+        start = time.perf_counter()
+        written, failed = asyncio.run(refresh_charts(queue, source, args.chart_dir, args.concurrency))
+    finally:
+        queue.close()
+    print(f"\nWrote {written} chart(s) to {args.chart_dir}/ in {time.perf_counter() - start:.1f}s"
+          + (f", {failed} failed (left in the queue for the next run)" if failed else ""))
+
+    if args.ingest:
+        from player_store import ingest_charts
+        ingest_charts(None if args.chart_dir == CHART_DIR else args.chart_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+One entry point for the project's scripts:
+
+    python cli.py                     list the commands
+    python cli.py <command> --help    options of one command
+    python cli.py <command> [options]
+
+A command's module is only imported once that command runs, so listing
+commands or checking the lexicon doesn't pay for pandas, nltk or aiohttp.
+Every command runs from the directory its script expects (the repo root, or
+watchdogs_data for the Watch Dogs scripts), wherever cli.py is called from.
+"""
+import argparse
+import importlib
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# name -> (script, function to call or None if importing the script runs it,
+#          whether the script parses its own options, help)
+COMMANDS = {
+    "games": ("data_collection.py", "main", False,
+              "build data/games_list.csv from the seed games' Gamalytic audience overlap"),
+    "game-data": ("game_data_collection.py", "add_game_data", False,
+                  "add Gamalytic stats to data/games_data_list.csv"),
+    "reviews": ("review_collection.py", "main", True,
+                "collect Steam reviews for a sample of games"),
+    "windows": ("review_windows.py", "main", True,
+                "export launch-window review CSVs"),
+    "sentiment": ("review_sentiment_analysis.py", "main", True,
+                  "score every collected review and write the combined dataset"),
+    "avg-sentiment": ("avg_sentiment.py", "main", True,
+                      "average sentiment per game into data/games_data_list_with_sentiment.csv"),
+    "rollups": ("review_rollups.py", "main", True,
+                "per-day launch review rollups and 1-7 / 8-30 / 1-30 day summaries"),
+    "sentiment-stats": ("sentiment_stats.py", "main", True,
+                        "sentiment-by-playtime tables from the aggregates kept while scoring"),
+    "players-ingest": ("player_store.py", "main", True,
+                       "load changed SteamDB player charts into the memory-mapped player store"),
+    "players-pyramid": ("player_pyramid.py", "main", True,
+                        "update the hourly/daily/weekly player tiers and query a game's chart at a point budget"),
+    "players-clean": ("concurrent_player_cleaning.py", "main", True,
+                      "launch-window player metrics for every game, plus the 90-day cleaned charts"),
+    "charts-fetch": ("chart_acquisition.py", "main", True,
+                     "fetch stale player charts into game_concurrent_players/ (no browser)"),
+    "features": ("feature_store.py", "main", True,
+                 "update the per-game feature store (only changed groups/games) and export data/game_features.csv"),
+    "train": ("launch_model.py", "main", True,
+              "cross-validate the launch peak/average player models in parallel and save the best"),
+    "serve": ("prediction_server.py", "main", True,
+              "serve launch player predictions over local HTTP with micro-batching (--bench to load-test)"),
+    "steam-lookup": ("steamdbtestfetch.py", "main", False,
+                     "look a game up on Steam interactively"),
+    "vader-parity": ("vader_batch.py", "main", True,
+                     "check the batch VADER scorer against nltk on the local reviews"),
+    "watchdogs-reviews": ("watchdogs_data/watchdog_franchise_review_puller.py", "main", True,
+                          "pull Watch Dogs franchise reviews into the shared review DB"),
+    "watchdogs-players": ("watchdogs_data/90_day_concurrent_player.py", "main", True,
+                          "pull concurrent players from steamcharts (Watch Dogs games by default)"),
+}
+
+# Commands that should start fast; bench-startup times them
+BENCH_COMMANDS = [
+    ["--help"],
+    ["check-lexicon"],
+    ["windows", "--help"],
+    ["reviews", "--help"],
+    ["sentiment", "--help"],
+    ["sentiment-stats", "--help"],
+]
+STARTUP_BUDGET_S = 1.0
+
+
+def run_script(name, argv):
+    """
+    Import the command's script from its own directory and run it with
+    `argv` as its arguments; returns what its entry function returned.
+    """
+    script, func, _, _ = COMMANDS[name]
+    path = REPO_DIR / script
+
+    # Scripts read and write paths relative to their own directory and
+    # import the shared modules in the repo root
+    os.chdir(path.parent)
+    for d in (str(path.parent), str(REPO_DIR)):
+        if d not in sys.path:
+            sys.path.insert(0, d)
+    sys.argv = [f"{Path(sys.argv[0]).name} {name}", *argv]
+
+    module = importlib.import_module(path.stem)
+    if func is not None:
+        return getattr(module, func)()
+
+
+def check_lexicon(download=False):
+    """Report whether the VADER lexicon is installed; fetch it only when asked to."""
+    from vader_batch import find_lexicon, download_lexicon
+
+    path = find_lexicon()
+    if path is None and download:
+        print("Downloading the VADER lexicon...")
+        download_lexicon()
+        path = find_lexicon()
+    if path is None:
+        print("VADER lexicon not found. Run: python cli.py check-lexicon --download")
+        return 1
+    print(f"VADER lexicon: {path}")
+    return 0
+
+
+def time_command(args, runs):
+    """Median wall time of `python *args` over `runs` fresh processes."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_startup(runs=5, budget=STARTUP_BUDGET_S):
+    """Time BENCH_COMMANDS from a cold interpreter. Returns 1 if any is over `budget` seconds."""
+    baseline = time_command(["-c", "pass"], runs)
+    print(f"{'python -c pass':32s} {baseline:6.3f}s")
+
+    slow = []
+    for args in BENCH_COMMANDS:
+        t = time_command([str(REPO_DIR / "cli.py"), *args], runs)
+        label = "cli.py " + " ".join(args)
+        print(f"{label:32s} {t:6.3f}s{'  OVER BUDGET' if t > budget else ''}")
+        if t > budget:
+            slow.append(label)
+
+    if slow:
+        print(f"{len(slow)} command(s) over the {budget:.1f}s budget")
+        return 1
+    print(f"All under the {budget:.1f}s budget (median of {runs} runs)")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    parser = argparse.ArgumentParser(prog="cli.py", description="Steam launch analysis scripts.")
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+
+    for name, (script, _, own_args, help_text) in COMMANDS.items():
+        # scripts with their own argparse get their options passed through untouched
+        sub.add_parser(name, help=help_text, description=f"{help_text} ({script})", add_help=not own_args)
+
+    lexicon = sub.add_parser("check-lexicon", help="check the VADER lexicon is installed (no network)")
+    lexicon.add_argument("--download", action="store_true", help="download it with nltk if it is missing")
+
+    bench = sub.add_parser("bench-startup", help="time how long light commands take to start")
+    bench.add_argument("--runs", type=int, default=5)
+    bench.add_argument("--budget", type=float, default=STARTUP_BUDGET_S, help="seconds allowed per command")
+
+    # Split off the command ourselves so options meant for a script
+    # (including its --help) aren't parsed here
+    if argv and argv[0] in COMMANDS and COMMANDS[argv[0]][2]:
+        return run_script(argv[0], argv[1:])
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 0
+    if args.command == "check-lexicon":
+        return check_lexicon(args.download)
+    if args.command == "bench-startup":
+        return bench_startup(args.runs, args.budget)
+    return run_script(args.command, [])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,51 +1,93 @@
+import argparse
+import os
+
 import pandas as pd
 import numpy as np
-from datetime import timedelta
+
+from player_metrics import (DEFAULT_WINDOWS, RETENTION_DAYS, Catalog, distribution, player_metrics,
+                            release_timestamps, window_rows)
+from player_store import ingest_charts
 
 GAME_LIST_CSV = "data/games_data_list.csv"
 OUTPUT_DIR = "cleaned_concurrent_players"
-INPUT_CSV = "game_concurrent_players/steamdb_chart_{}.csv"
-
-
-
-df = pd.read_csv(GAME_LIST_CSV)
-data = []
-
-for i in range(len(df)):
-
-    appid = df.iloc[i]['appid']
-    rel_date = df.iloc[i]['release_date']
-    release_date = pd.to_datetime(rel_date)
-    release_date_90 = release_date + timedelta(days=90)
-    
-    chart_df = pd.read_csv(INPUT_CSV.format(appid))
-    chart_df['DateTime'] = pd.to_datetime(chart_df['DateTime'])
-
-    if (chart_df.loc[0,'DateTime'] > release_date):
-        release_date = chart_df.loc[0,'DateTime']
-        release_date_90 = release_date + timedelta(days=90)
-        print(f"{appid}: Data for {rel_date} unavailable. Setting new release date to {release_date}")
-        data.append(int(appid))
-
-    chart_df = chart_df.dropna(thresh=2)
-    chart_df = chart_df.drop(['Average Players'],axis=1)
-
-    chart_df = chart_df[(chart_df['DateTime'] >= release_date) & (chart_df['DateTime'] <= release_date_90)]
-    
-    peak_row = chart_df.loc[chart_df['Players'].idxmax()]
-    peak_players = peak_row['Players']
-    peak_timestamp = peak_row['DateTime']
-    avg_players = chart_df.loc[:, chart_df.columns == 'Players'].mean()
-
-
-    df.loc[i,'peak_concurrent_players_after_90'] = peak_players.item()
-    df.loc[i,'peak_concurrent_players_timestamp'] = peak_timestamp
-    df.loc[i,'avg_concurrent_players_after_90'] = avg_players.item()
-
-    chart_df.to_csv(f'{OUTPUT_DIR}/{appid}.csv',index=False)
-
-df.to_csv(GAME_LIST_CSV,index=False)
-
-print(data)
-
-
+METRICS_CSV = "data/player_metrics.csv"
+
+# Window behind the *_after_90 columns of games_data_list.csv and the cleaned CSVs
+LEGACY_WINDOW_DAYS = 90
+
+
+def write_cleaned_charts(catalog, start_ts, days=LEGACY_WINDOW_DAYS, output_dir=OUTPUT_DIR):
+    """One CSV per game with the DateTime/Players rows of its window (chart gaps left out)."""
+    os.makedirs(output_dir, exist_ok=True)
+    mask = window_rows(catalog, start_ts, days)
+    game = catalog.game[mask]
+    ts = catalog.timestamps[mask]
+    players = catalog.players[mask]
+    # Players was a float column for charts with gaps, so keep writing those as floats
+    has_gaps = catalog.has_gaps()
+    bounds = np.searchsorted(game, np.arange(len(catalog.appids) + 1))
+
+    for g, appid in enumerate(catalog.appids):
+        lo, hi = bounds[g], bounds[g + 1]
+        values = players[lo:hi].astype(np.float64 if has_gaps[g] else np.int64)
+        chart_df = pd.DataFrame({"DateTime": pd.to_datetime(ts[lo:hi], unit="s"), "Players": values})
+        chart_df.to_csv(f"{output_dir}/{appid}.csv", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Launch-window player metrics for every game in games_data_list.csv.")
+    parser.add_argument("--window", type=int, action="append",
+                        help=f"window length in days after release (repeatable; default: {DEFAULT_WINDOWS})")
+    parser.add_argument("--retention-day", type=int, action="append",
+                        help=f"day to report players relative to the peak (repeatable; default: {RETENTION_DAYS})")
+    parser.add_argument("--no-cleaned-csvs", action="store_true",
+                        help=f"don't rewrite the per-game CSVs in {OUTPUT_DIR}/")
+    args = parser.parse_args()
+    windows = sorted(set(args.window or DEFAULT_WINDOWS) | {LEGACY_WINDOW_DAYS})
+
+    # Only charts that changed since the last run are parsed; the rest are read
+    # straight from the memory-mapped store
+    store = ingest_charts()
+
+    df = pd.read_csv(GAME_LIST_CSV)
+    release_dates = df.drop_duplicates("appid").set_index("appid")["release_date"]
+    catalog = Catalog(store, release_dates.index)
+    missing = sorted(set(release_dates.index) - set(catalog.appids.tolist()))
+    if missing:
+        print(f"No player chart for {len(missing)} game(s): {missing}")
+
+    metrics = player_metrics(catalog, release_timestamps(release_dates.reindex(catalog.appids)), windows,
+                             args.retention_day or RETENTION_DAYS)
+
+    adjusted = []
+    for appid, rel_date in zip(df["appid"], df["release_date"]):
+        if appid in metrics.index and metrics.at[appid, "start_adjusted"] and appid not in adjusted:
+            print(f"{appid}: Data for {rel_date} unavailable. "
+                  f"Setting new release date to {metrics.at[appid, 'start_timestamp']}")
+            adjusted.append(int(appid))
+
+    legacy = {
+        "peak_concurrent_players_after_90": metrics[f"peak_{LEGACY_WINDOW_DAYS}d"],
+        "peak_concurrent_players_timestamp":
+            metrics[f"peak_timestamp_{LEGACY_WINDOW_DAYS}d"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "avg_concurrent_players_after_90": metrics[f"mean_{LEGACY_WINDOW_DAYS}d"],
+    }
+    for column, values in legacy.items():
+        new = df["appid"].map(values)
+        df[column] = new.where(new.notna(), df[column]) if column in df.columns else new
+    df.to_csv(GAME_LIST_CSV, index=False)
+
+    metrics.to_csv(METRICS_CSV)
+    if not args.no_cleaned_csvs:
+        start_ts = metrics["start_timestamp"].to_numpy("datetime64[s]").astype(np.int64)
+        write_cleaned_charts(catalog, start_ts)
+
+    print(adjusted)
+    for days in windows:
+        print(f"\nDays from release to peak ({days}-day window), number of games:")
+        print(distribution(metrics[f"time_to_peak_days_{days}d"]).to_string())
+    print(f"\nWrote {len(metrics.columns)} metrics for {len(metrics)} games to {METRICS_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from review_store import REVIEW_DB_PATH
+
+
+GAMES_LIST_PATH = Path("data/games_list.csv")
+FEATURE_DB_PATH = Path(__file__).resolve().parent / "data" / "feature_store.db"
+FEATURES_CSV = Path("data/game_features.csv")
+REVIEWS_DIR = Path("reviews_data")
+
+GAMALYTIC_MAX_AGE_DAYS = 30  # refetch a game's Gamalytic stats after this long
+BASE_COLUMNS = ["appid", "name", "slug", "release_date"]
+
+
+def input_hash(group, fingerprint):
+    """Hash of everything a group's features for one game are computed from (plus the group's version)."""
+    blob = json.dumps([group.name, group.version, fingerprint], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _native(value):
+    """A pandas/numpy cell as something json can store; missing values become null."""
+    if value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value.item() if hasattr(value, "item") else value
+
+
+class FeatureStore:
+    """
+    The model's input table, materialized per (feature group, appid) in
+    SQLite: each row holds the group's features for one game as JSON and
+    the hash of the inputs they were computed from. A group only
+    recomputes the games whose input hash changed.
+    """
+
+    def __init__(self, db_path=FEATURE_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS features (
+                grp TEXT NOT NULL,
+                appid INTEGER NOT NULL,
+                input_hash TEXT NOT NULL,
+                features TEXT NOT NULL,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (grp, appid)
+            );
+            CREATE TABLE IF NOT EXISTS gamalytic_responses (
+                appid INTEGER PRIMARY KEY,
+                body TEXT NOT NULL,
+                fetched_at INTEGER NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def input_hashes(self, group_name):
+        return dict(self.conn.execute("SELECT appid, input_hash FROM features WHERE grp = ?", (group_name,)))
+
+    def save(self, group_name, hashes, frame: pd.DataFrame):
+        """Store one row of `frame` (indexed by appid) per game, with its input hash."""
+        now = int(time.time())
+        rows = [(group_name, int(appid), hashes[appid],
+                 json.dumps({k: _native(v) for k, v in values.items()}), now)
+                for appid, values in frame.to_dict("index").items()]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?)", rows)
+
+    def keep_only(self, group_name, appids):
+        """Drop the group's rows for games that are no longer listed or lost their inputs."""
+        keep = {int(a) for a in appids}
+        gone = [(group_name, a) for a in self.input_hashes(group_name) if a not in keep]
+        with self.conn:
+            self.conn.executemany("DELETE FROM features WHERE grp = ? AND appid = ?", gone)
+        return len(gone)
+
+    def group_frame(self, group_name) -> pd.DataFrame:
+        rows = self.conn.execute("SELECT appid, features FROM features WHERE grp = ? ORDER BY appid", (group_name,))
+        records = {appid: json.loads(features) for appid, features in rows}
+        return pd.DataFrame.from_dict(records, orient="index")
+
+    def gamalytic_responses(self):
+        return {appid: (json.loads(body), fetched_at)
+                for appid, body, fetched_at in self.conn.execute("SELECT * FROM gamalytic_responses")}
+
+    def save_gamalytic_responses(self, responses):
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO gamalytic_responses VALUES (?, ?, ?)",
+                                  [(int(a), json.dumps(data, sort_keys=True), now) for a, data in responses.items()])
+
+    def close(self):
+        self.conn.close()
+
+
+class GamalyticGroup:
+    """The game_data_collection.py columns, from the Gamalytic responses cached in the store."""
+
+    name = "gamalytic"
+    version = 1
+
+    def __init__(self, store: FeatureStore, workers=None):
+        self.store = store
+
+    def fingerprints(self, games):
+        responses = self.store.gamalytic_responses()
+        return {g["appid"]: responses[g["appid"]][0] for g in games if g["appid"] in responses}
+
+    def compute(self, games):
+        from game_data_collection import ENRICHMENT_COLUMNS, game_record
+
+        responses = self.store.gamalytic_responses()
+        records = [game_record(g["appid"], responses[g["appid"]][0]) for g in games]
+        return pd.DataFrame.from_records(records, columns=["appid"] + ENRICHMENT_COLUMNS).set_index("appid")
+
+
+def refresh_gamalytic(store: FeatureStore, games, max_age_days=GAMALYTIC_MAX_AGE_DAYS, base_url=None):
+    """Fetch the Gamalytic stats of games with none cached or older than max_age_days. Returns how many."""
+    from game_data_collection import BASE_URL, fetch_all_gamalytic_info
+
+    cutoff = time.time() - max_age_days * 86_400
+    cached = store.gamalytic_responses()
+    due = [g["appid"] for g in games if g["appid"] not in cached or cached[g["appid"]][1] < cutoff]
+    if not due:
+        return 0
+    print(f"Fetching Gamalytic stats for {len(due)} game(s)")
+    info = asyncio.run(fetch_all_gamalytic_info(due, base_url=base_url or BASE_URL))
+    store.save_gamalytic_responses({appid: data for appid, data in info.items() if data})
+    return len(due)
+
+
+class PlayersGroup:
+    """
+    Launch-window player metrics (as concurrent_player_cleaning.py), from
+    the player store. A game's inputs are its chart files and release date.
+    """
+
+    name = "players"
+    version = 1
+
+    def __init__(self, store: FeatureStore, workers=None):
+        self.workers = workers
+        self._player_store = None
+
+    @property
+    def player_store(self):
+        if self._player_store is None:
+            from player_store import ingest_charts
+            self._player_store = ingest_charts(workers=self.workers)
+        return self._player_store
+
+    def fingerprints(self, games):
+        from concurrent_player_cleaning import LEGACY_WINDOW_DAYS
+        from player_metrics import RETENTION_DAYS
+
+        charts = self.player_store.meta["games"]
+        return {g["appid"]: [charts[str(g["appid"])]["source"], g["release_date"], LEGACY_WINDOW_DAYS, RETENTION_DAYS]
+                for g in games if str(g["appid"]) in charts and g["release_date"]}
+
+    def compute(self, games):
+        from concurrent_player_cleaning import LEGACY_WINDOW_DAYS
+        from player_metrics import RETENTION_DAYS, Catalog, player_metrics, release_timestamps
+
+        release_dates = pd.Series({g["appid"]: g["release_date"] for g in games})
+        catalog = Catalog(self.player_store, release_dates.index)
+        metrics = player_metrics(catalog, release_timestamps(release_dates.reindex(catalog.appids)),
+                                 [LEGACY_WINDOW_DAYS], RETENTION_DAYS)
+        d = LEGACY_WINDOW_DAYS
+        legacy = pd.DataFrame({
+            "peak_concurrent_players_after_90": metrics[f"peak_{d}d"],
+            "peak_concurrent_players_timestamp": metrics[f"peak_timestamp_{d}d"],
+            "avg_concurrent_players_after_90": metrics[f"mean_{d}d"],
+        })
+        return pd.concat([legacy, metrics], axis=1)
+
+
+class SentimentGroup:
+    """
+    avg_sentiment.py's average VADER score over the newest qualifying
+    reviews, from the local review corpus only (review_collection.py /
+    review_sync.py keep it current), so the inputs hashed here are all the
+    score depends on.
+    """
+
+    name = "sentiment"
+    version = 1
+
+    def __init__(self, store: FeatureStore, workers=None, reviews_dir=REVIEWS_DIR, db_path=REVIEW_DB_PATH):
+        self.workers = workers or os.cpu_count()
+        self.reviews_dir = Path(reviews_dir)
+        self.db_path = Path(db_path)
+
+    def fingerprints(self, games):
+        from avg_sentiment import MIN_PLAYTIME_HOURS, MIN_WORDS_PER_REVIEW, TARGET_REVIEWS_PER_GAME
+        from sentiment_scoring import SCORER_VERSION
+
+        db = {}
+        if self.db_path.exists():
+            conn = sqlite3.connect(self.db_path)
+            try:
+                db = {appid: [n, updated] for appid, n, updated in conn.execute("""
+                    SELECT appid, COUNT(*), MAX(timestamp_updated) FROM reviews
+                    WHERE language = 'english' GROUP BY appid
+                """)}
+            finally:
+                conn.close()
+
+        settings = [SCORER_VERSION, MIN_PLAYTIME_HOURS, MIN_WORDS_PER_REVIEW, TARGET_REVIEWS_PER_GAME]
+        out = {}
+        for g in games:
+            csv_path = self.reviews_dir / f"{g['slug']}_reviews.csv"
+            csv_file = [csv_path.stat().st_size, csv_path.stat().st_mtime_ns] if csv_path.exists() else None
+            out[g["appid"]] = [csv_file, db.get(g["appid"]), settings]
+        return out
+
+    def compute(self, games):
+        from avg_sentiment import MAX_CONCURRENT_GAMES, compute_all_sentiment
+        from review_source import ReviewSource
+        from vader_batch import require_lexicon
+
+        require_lexicon()
+        source = ReviewSource(self.reviews_dir, self.db_path, allow_network=False)
+        results = asyncio.run(compute_all_sentiment(games, source, self.workers, MAX_CONCURRENT_GAMES))
+        return pd.DataFrame(results).set_index("appid")
+
+
+# Each group is built with (store, workers) and needs a `name`, a `version`
+# (bump it when compute() changes),
+# `fingerprints(games)` -> {appid: JSON-able inputs} for the games it has
+# inputs for, and `compute(games)` -> DataFrame indexed by appid. The
+# exported table has their columns in this order.
+FEATURE_GROUPS = {
+    GamalyticGroup.name: GamalyticGroup,
+    PlayersGroup.name: PlayersGroup,
+    SentimentGroup.name: SentimentGroup,
+}
+
+
+def load_games(path=GAMES_LIST_PATH):
+    """games_list.csv as dicts with name, slug, appid and release_date (None if blank)."""
+    df = pd.read_csv(path, dtype={"name": str, "slug": str, "release_date": str}).drop_duplicates("appid")
+    df["appid"] = df["appid"].astype(int)
+    df["slug"] = df["slug"].fillna("appid_" + df["appid"].astype(str))
+    df["name"] = df["name"].fillna("")
+    df["release_date"] = df["release_date"].where(df["release_date"].notna(), None)
+    return df[BASE_COLUMNS].to_dict("records")
+
+
+def update_group(store: FeatureStore, group, games):
+    """Recompute the group for the games whose input hash changed. Returns (games recomputed, dropped)."""
+    hashes = {appid: input_hash(group, fp) for appid, fp in group.fingerprints(games).items()}
+    stored = store.input_hashes(group.name)
+    stale = [g for g in games if g["appid"] in hashes and stored.get(g["appid"]) != hashes[g["appid"]]]
+    if stale:
+        store.save(group.name, hashes, group.compute(stale))
+    return len(stale), store.keep_only(group.name, hashes)
+
+
+def feature_table(store: FeatureStore, games, group_names=FEATURE_GROUPS) -> pd.DataFrame:
+    """One row per listed game: the games_list.csv columns, then every group's features."""
+    table = pd.DataFrame(games, columns=BASE_COLUMNS).set_index("appid")
+    for name in group_names:
+        table = table.join(store.group_frame(name))
+    return table.reset_index()
+
+
+def write_atomic(path: Path, write):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the per-game feature store, recomputing only what changed.")
+    parser.add_argument("--games-csv", type=Path, default=GAMES_LIST_PATH)
+    parser.add_argument("--group", action="append", choices=sorted(FEATURE_GROUPS),
+                        help="only update this feature group (repeatable; default: all)")
+    parser.add_argument("--offline", action="store_true", help="don't fetch Gamalytic stats, use the cached ones")
+    parser.add_argument("--gamalytic-max-age-days", type=float, default=GAMALYTIC_MAX_AGE_DAYS)
+    parser.add_argument("--gamalytic-url", help="fetch Gamalytic stats from this URL template instead (e.g. a local stub)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="sentiment scoring processes")
+    parser.add_argument("--output", type=Path, default=FEATURES_CSV)
+    args = parser.parse_args()
+
+    games = load_games(args.games_csv)
+    store = FeatureStore()
+    try:
+        for name in args.group or FEATURE_GROUPS:
+            started = time.perf_counter()
+            group = FEATURE_GROUPS[name](store, args.workers)
+            if name == GamalyticGroup.name and not args.offline:
+                refresh_gamalytic(store, games, args.gamalytic_max_age_days, args.gamalytic_url)
+            recomputed, dropped = update_group(store, group, games)
+            print(f"{name}: {recomputed} game(s) recomputed, {dropped} dropped "
+                  f"in {time.perf_counter() - started:.2f}s")
+
+        table = feature_table(store, games)
+    finally:
+        store.close()
+    write_atomic(args.output, lambda p: table.to_csv(p, index=False))
+    print(f"\nWrote {len(table.columns)} columns for {len(table)} games to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
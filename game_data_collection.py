@@ -1,73 +1,118 @@
-import csv
-import requests
+import asyncio
+
+import aiohttp
 import pandas as pd
 import numpy as np
 
+from async_fetch import get_json, make_session
+
 
 
 BASE_URL = "https://api.gamalytic.com/game/{}"
 GAME_LIST_CSV = "data/games_data_list.csv"
 OUTPUT_CSV = "data/games_data_list.csv"
 
-def get_gamalytic_info(appid:str):
-    response = requests.get(BASE_URL.format(appid))
-
-    if response.status_code != 200:
-        print("Error! Unable to fetch from URL")
+# Requests in flight at once; the request rate itself is capped by the
+# api.gamalytic.com bucket in async_fetch.HOST_RATE_LIMITS
+MAX_CONCURRENT_REQUESTS = 8
+
+ENRICHMENT_COLUMNS = [
+    'total_reviews',
+    'estimated_launch_reviews',
+    'followers',
+    'estimated_launch_followers',
+    'review_score',
+    'avg_playtime',
+    'copies_sold',
+    'estimated_launch_copies_sold',
+    'revenue',
+    'players',
+    'owners',
+    'developer',
+    'publisher',
+]
+
+
+async def get_gamalytic_info(session, appid, base_url=BASE_URL):
+    """Fetch /game/{appid}. Returns None (and prints why) on any failure."""
+    try:
+        return await get_json(session, base_url.format(appid), label=f"appid {appid}")
+    except (aiohttp.ClientError, RuntimeError, ValueError) as e:
+        print(f"[ERROR] Unable to fetch appid {appid}: {e}")
         return None
-    
-    data = response.json()
-    return data
-    
 
-def add_game_data():
 
-    df = pd.read_csv(GAME_LIST_CSV)
-
-    for i in range(len(df)):
-        # cleans game name to remove the trademark symbols
-        df.loc[i,'name'] = df.iloc[i]['name'].encode("ascii", errors="ignore").decode()
-        print(f"{i+1}/{len(df)}: {df.iloc[i]['name'].encode("ascii", errors="ignore").decode()}")
-
-        appid = df.iloc[i]['appid']
-
-        data = get_gamalytic_info(appid)
-        df.loc[i,'total_reviews'] = data.get('reviewsSteam') or np.nan
-        df.loc[i,'estimated_launch_reviews'] = data.get('reviewsSteam',0) * 0.1
-        df.loc[i,'followers'] =  data.get('followers') or np.nan
-        df.loc[i,'estimated_launch_followers'] = data.get('followers',0) * 0.1
-        df.loc[i,'review_score'] = data.get('reviewScore') or np.nan
-        df.loc[i,'avg_playtime'] = data.get('avgPlaytime') or np.nan
-        df.loc[i,'copies_sold'] = data.get('copiesSold') or np.nan
-        df.loc[i,'estimated_launch_copies_sold'] = data.get('copiesSold',0) * 0.1
-        df.loc[i,'revenue'] = data.get('revenue') or np.nan
-        df.loc[i,'players'] = data.get('players') or np.nan
-        df.loc[i,'owners'] = data.get('owners') or np.nan
-
-        developers = data.get('developers')
-        publishers = data.get('publishers')
-        
-        if (developers == []):
-            developers = publishers
-        if (publishers == []):
-            publishers = developers
-
-        df.loc[i,'developer'] = developers[0]
-        df.loc[i,'publisher'] = publishers[0]
-    
+async def fetch_all_gamalytic_info(appids, concurrency=MAX_CONCURRENT_REQUESTS, base_url=BASE_URL):
+    """Fetch every appid concurrently over one pooled session. Returns {appid: data or None}."""
+    sem = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def one(session, appid):
+        nonlocal done
+        async with sem:
+            data = await get_gamalytic_info(session, appid, base_url)
+        done += 1
+        print(f"{done}/{len(appids)}: appid {appid}")
+        return appid, data
+
+    async with make_session(limit_per_host=concurrency) as session:
+        results = await asyncio.gather(*(one(session, a) for a in appids))
+    return dict(results)
+
+
+def game_record(appid, data):
+    """Turn one Gamalytic response into a flat record of the enrichment columns."""
+    developers = data.get('developers') or []
+    publishers = data.get('publishers') or []
+
+    if (developers == []):
+        developers = publishers
+    if (publishers == []):
+        publishers = developers
+
+    return {
+        'appid': appid,
+        'total_reviews': data.get('reviewsSteam') or np.nan,
+        'estimated_launch_reviews': (data.get('reviewsSteam') or 0) * 0.1,
+        'followers': data.get('followers') or np.nan,
+        'estimated_launch_followers': (data.get('followers') or 0) * 0.1,
+        'review_score': data.get('reviewScore') or np.nan,
+        'avg_playtime': data.get('avgPlaytime') or np.nan,
+        'copies_sold': data.get('copiesSold') or np.nan,
+        'estimated_launch_copies_sold': (data.get('copiesSold') or 0) * 0.1,
+        'revenue': data.get('revenue') or np.nan,
+        'players': data.get('players') or np.nan,
+        'owners': data.get('owners') or np.nan,
+        'developer': developers[0] if developers else np.nan,
+        'publisher': publishers[0] if publishers else np.nan,
+    }
 
-    df.to_csv(OUTPUT_CSV,index=False)
 
-if __name__ == '__main__':
-    add_game_data()
+def add_game_data():
 
+    df = pd.read_csv(GAME_LIST_CSV)
 
+    # cleans game names to remove the trademark symbols
+    df['name'] = df['name'].str.encode("ascii", errors="ignore").str.decode("ascii")
 
-    
+    appids = df['appid'].astype(int).tolist()
+    info = asyncio.run(fetch_all_gamalytic_info(appids))
 
-    
+    records = [game_record(appid, data) for appid, data in info.items() if data]
+    failed = [appid for appid, data in info.items() if not data]
 
+    enrichment = pd.DataFrame.from_records(records, columns=['appid'] + ENRICHMENT_COLUMNS)
 
+    # replace the old enrichment columns in one merge, keeping the column order
+    columns = list(df.columns) + [c for c in ENRICHMENT_COLUMNS if c not in df.columns]
+    df['appid'] = df['appid'].astype(int)
+    df = df.drop(columns=ENRICHMENT_COLUMNS, errors='ignore').merge(enrichment, on='appid', how='left')
+    df = df[columns]
 
+    if failed:
+        print(f"Failed to fetch {len(failed)} appids (left as NaN): {failed}")
 
+    df.to_csv(OUTPUT_CSV,index=False)
 
+if __name__ == '__main__':
+    add_game_data()
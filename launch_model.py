@@ -0,0 +1,424 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+
+GAMES_DATA_PATH = Path("data/games_data_list.csv")
+LAUNCH_SUMMARY_PATH = Path("data/launch_review_summary.csv")
+CACHE_DIR = Path("data/training_cache")
+CV_RESULTS_CSV = Path("data/cv_results.csv")
+MODEL_PATH = Path("data/launch_model.pkl")
+
+# name -> games_data_list.csv column; both are predicted as log1p(players)
+TARGETS = {
+    "peak": "peak_concurrent_players_after_90",
+    "avg": "avg_concurrent_players_after_90",
+}
+FEATURE_COLUMNS = [
+    "followers",
+    "estimated_launch_reviews",
+    "estimated_launch_copies_sold",
+    "review_score",
+    "avg_playtime",
+    "release_year",  # from release_date
+]
+LAUNCH_REVIEW_COLUMNS = ["reviews_1_7", "pos_rate_1_7", "avg_sentiment_1_7"]  # review_rollups.py summary
+LOG_FEATURES = {"followers", "estimated_launch_reviews", "estimated_launch_copies_sold", "avg_playtime",
+                "reviews_1_7"}
+
+N_FOLDS = 5
+N_REPEATS = 3
+RANDOM_SEED = 20240601
+
+
+def build_matrix(frame, columns) -> np.ndarray:
+    """
+    The feature matrix for `columns` of a DataFrame as contiguous float32,
+    counts log1p-transformed; missing columns and values are NaN (the
+    models impute them).
+    """
+    import pandas as pd
+
+    X = np.full((len(frame), len(columns)), np.nan, dtype=np.float32)
+    for j, column in enumerate(columns):
+        if column == "release_year" and "release_date" in frame:
+            values = pd.to_datetime(frame["release_date"], errors="coerce").dt.year
+        elif column in frame:
+            values = pd.to_numeric(frame[column], errors="coerce")
+        else:
+            continue
+        values = values.to_numpy(np.float64, na_value=np.nan)
+        X[:, j] = np.log1p(np.clip(values, 0, None)) if column in LOG_FEATURES else values
+    return X
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _year(date):
+    try:
+        return float(np.datetime64(str(date)[:10], "D").astype("datetime64[Y]").astype(int) + 1970)
+    except ValueError:
+        return np.nan
+
+
+def record_matrix(records, columns) -> np.ndarray:
+    """build_matrix for a list of {column: value} dicts, without pandas (for one-off payloads)."""
+    X = np.full((len(records), len(columns)), np.nan, dtype=np.float32)
+    for i, record in enumerate(records):
+        for j, column in enumerate(columns):
+            if column == "release_year" and column not in record:
+                value = _year(record["release_date"]) if record.get("release_date") else np.nan
+            else:
+                value = _number(record.get(column))
+            X[i, j] = np.log1p(max(value, 0)) if column in LOG_FEATURES and not np.isnan(value) else value
+    return X
+
+
+class Model:
+    """Base for the candidates: median-impute and standardize on fit, then _fit / _predict on that."""
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns get 0
+            self.fill = np.nan_to_num(np.nanmedian(X, axis=0)) if len(X) else np.zeros(X.shape[1])
+        Z = self._impute(X)
+        self.center = Z.mean(axis=0)
+        self.scale = Z.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self._fit((Z - self.center) / self.scale, np.asarray(y, dtype=np.float64))
+        return self
+
+    def predict(self, X):
+        Z = self._impute(np.asarray(X, dtype=np.float64))
+        return self._predict((Z - self.center) / self.scale)
+
+    def _impute(self, X):
+        return np.where(np.isnan(X), self.fill, X)
+
+
+class MeanModel(Model):
+    """Baseline: the training mean."""
+
+    def _fit(self, Z, y):
+        self.value = y.mean()
+
+    def _predict(self, Z):
+        return np.full(len(Z), self.value)
+
+
+class Ridge(Model):
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+
+    def _fit(self, Z, y):
+        self.intercept = y.mean()
+        self.coef = np.linalg.solve(Z.T @ Z + self.alpha * np.eye(Z.shape[1]), Z.T @ (y - self.intercept))
+
+    def _predict(self, Z):
+        return Z @ self.coef + self.intercept
+
+
+class KNN(Model):
+    """Mean target of the k nearest training games (Euclidean, standardized features)."""
+
+    def __init__(self, k=5):
+        self.k = k
+
+    def _fit(self, Z, y):
+        self.Z, self.y = Z, y
+
+    def _predict(self, Z):
+        d = ((Z[:, None, :] - self.Z[None, :, :]) ** 2).sum(axis=2)
+        k = min(self.k, len(self.y))
+        nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+        return self.y[nearest].mean(axis=1)
+
+
+class BoostedStumps(Model):
+    """Gradient boosting (squared error) with one-split trees, searched over every feature at once."""
+
+    def __init__(self, rounds=200, learning_rate=0.05):
+        self.rounds = rounds
+        self.learning_rate = learning_rate
+
+    def _fit(self, Z, y):
+        n = len(y)
+        order = np.argsort(Z, axis=0, kind="stable")
+        sorted_z = np.take_along_axis(Z, order, axis=0)
+        # A split between sorted rows i and i + 1 is only possible where the values differ
+        valid = sorted_z[1:] > sorted_z[:-1]
+        left_n = np.arange(1, n)[:, None]
+
+        self.base = y.mean()
+        pred = np.full(n, self.base)
+        self.stumps = []
+        for _ in range(self.rounds if valid.any() else 0):
+            residual = y - pred
+            left = np.cumsum(residual[order], axis=0)[:-1]
+            total = residual.sum()
+            gain = np.where(valid, left ** 2 / left_n + (total - left) ** 2 / (n - left_n), -np.inf)
+            i, j = np.unravel_index(np.argmax(gain), gain.shape)
+            threshold = (sorted_z[i, j] + sorted_z[i + 1, j]) / 2
+            low, high = left[i, j] / (i + 1), (total - left[i, j]) / (n - i - 1)
+            self.stumps.append((j, threshold, self.learning_rate * low, self.learning_rate * high))
+            pred += np.where(Z[:, j] <= threshold, self.learning_rate * low, self.learning_rate * high)
+
+    def _predict(self, Z):
+        pred = np.full(len(Z), self.base)
+        for j, threshold, low, high in self.stumps:
+            pred += np.where(Z[:, j] <= threshold, low, high)
+        return pred
+
+
+# name -> (class, params); every one is cross-validated for every target
+CANDIDATES = {
+    "mean": (MeanModel, {}),
+    **{f"ridge_{a:g}": (Ridge, {"alpha": a}) for a in (0.1, 1, 10, 100)},
+    **{f"knn_{k}": (KNN, {"k": k}) for k in (3, 5, 10)},
+    "stumps_200": (BoostedStumps, {"rounds": 200, "learning_rate": 0.05}),
+    "stumps_500": (BoostedStumps, {"rounds": 500, "learning_rate": 0.02}),
+}
+
+
+def make_model(name) -> Model:
+    cls, params = CANDIDATES[name]
+    return cls(**params)
+
+
+def assign_folds(n, n_folds=N_FOLDS, repeats=N_REPEATS, seed=RANDOM_SEED):
+    """Fold number of every row for each repeat, (repeats, n) int8; repeat r shuffles with seed + r."""
+    folds = np.empty((repeats, n), dtype=np.int8)
+    for r in range(repeats):
+        perm = np.random.default_rng(seed + r).permutation(n)
+        folds[r, perm] = np.arange(n) % n_folds
+    return folds
+
+
+def load_sources(sources, columns):
+    """The first source table with the `columns` of the other ones (e.g. the launch review summary) joined on appid."""
+    import pandas as pd
+
+    df = pd.read_csv(sources[0])
+    for extra in sources[1:]:
+        summary = pd.read_csv(extra)
+        df = df.merge(summary[["appid"] + [c for c in summary.columns if c in columns]], on="appid", how="left")
+    return df
+
+
+def missing_columns(frame, columns):
+    """The `columns` build_matrix would have to leave all NaN for this frame."""
+    return [c for c in columns
+            if c not in frame and not (c == "release_year" and "release_date" in frame)]
+
+
+def prepare_training_data(sources, columns, n_folds=N_FOLDS, repeats=N_REPEATS, seed=RANDOM_SEED,
+                          cache_root=CACHE_DIR):
+    """
+    Build X (float32), Y (log1p of each target) and the fold assignment
+    once and keep them as .npy files under cache_root, keyed by the
+    source files' size/mtime and the settings. Later runs with the same
+    inputs reuse them without touching pandas. Returns the cache directory.
+    """
+    fingerprint = [[str(p), p.stat().st_size, p.stat().st_mtime_ns] for p in map(Path, sources)]
+    blob = json.dumps([fingerprint, columns, TARGETS, n_folds, repeats, seed], sort_keys=True)
+    cache_dir = Path(cache_root) / hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    if (cache_dir / "meta.json").exists():
+        return cache_dir
+
+    import pandas as pd
+
+    df = load_sources(sources, columns)
+    Y = np.column_stack([np.log1p(pd.to_numeric(df[c], errors="coerce").to_numpy(np.float64)) for c in TARGETS.values()])
+    keep = ~np.isnan(Y).any(axis=1)
+    df, Y = df[keep].reset_index(drop=True), np.ascontiguousarray(Y[keep])
+
+    tmp_dir = cache_dir.with_name(cache_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    np.save(tmp_dir / "X.npy", build_matrix(df, columns))
+    np.save(tmp_dir / "Y.npy", Y)
+    np.save(tmp_dir / "folds.npy", assign_folds(len(df), n_folds, repeats, seed))
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump({"columns": columns, "targets": list(TARGETS), "appids": df["appid"].astype(int).tolist()}, f)
+
+    # Only the newest cache is kept
+    for old in Path(cache_root).iterdir():
+        if old.is_dir() and old != tmp_dir:
+            shutil.rmtree(old)
+    os.replace(tmp_dir, cache_dir)
+    return cache_dir
+
+
+def load_training_data(cache_dir):
+    """(X, Y, folds, meta) from prepare_training_data, the arrays memory-mapped."""
+    cache_dir = Path(cache_dir)
+    with (cache_dir / "meta.json").open(encoding="utf-8") as f:
+        meta = json.load(f)
+    return tuple(np.load(cache_dir / f"{name}.npy", mmap_mode="r") for name in ("X", "Y", "folds")) + (meta,)
+
+
+_worker_data = None
+
+
+def init_cv_worker(cache_dir):
+    """Map the cached arrays once per worker; tasks then only carry names and numbers."""
+    global _worker_data
+    _worker_data = load_training_data(cache_dir)
+
+
+def cv_task(task):
+    """Fit one candidate on one fold's training rows. Returns its predictions for the held-out rows."""
+    candidate, target, repeat, fold = task
+    X, Y, folds, _ = _worker_data
+    test = folds[repeat] == fold
+    model = make_model(candidate).fit(X[~test], Y[~test, target])
+    return model.predict(X[test])
+
+
+def make_cv_pool(cache_dir, workers=None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_cv_worker, initargs=(str(cache_dir),))
+
+
+def cross_validate(cache_dir, candidates=CANDIDATES, workers=None):
+    """
+    Every (candidate, target, repeat, fold) fit spread over a process pool.
+    Returns one row per candidate and target: RMSE and MAE of log1p(players)
+    averaged over the folds (with the folds' spread), and R^2 of the
+    out-of-fold predictions averaged over the repeats.
+    """
+    import pandas as pd
+
+    init_cv_worker(cache_dir)
+    X, Y, folds, meta = _worker_data
+    repeats, n_folds = folds.shape[0], int(folds.max()) + 1
+    tasks = [(c, t, r, f) for c in candidates for t in range(Y.shape[1])
+             for r in range(repeats) for f in range(n_folds)]
+
+    if workers == 1:
+        predictions = list(map(cv_task, tasks))
+    else:
+        with make_cv_pool(cache_dir, workers) as pool:
+            predictions = list(pool.map(cv_task, tasks, chunksize=8))
+
+    oof = {}
+    fold_errors = {}
+    for (c, t, r, f), pred in zip(tasks, predictions):
+        test = folds[r] == f
+        oof.setdefault((c, t, r), np.empty(len(Y)))[test] = pred
+        err = pred - Y[test, t]
+        fold_errors.setdefault((c, t), []).append((np.sqrt(np.mean(err ** 2)), np.mean(np.abs(err))))
+
+    rows = []
+    for c in candidates:
+        for t, target in enumerate(meta["targets"]):
+            errors = np.array(fold_errors[(c, t)])
+            y = Y[:, t]
+            r2 = [1 - np.sum((oof[(c, t, r)] - y) ** 2) / np.sum((y - y.mean()) ** 2) for r in range(repeats)]
+            rows.append({"target": target, "model": c, "rmse_log": errors[:, 0].mean(),
+                         "rmse_log_std": errors[:, 0].std(), "mae_log": errors[:, 1].mean(), "r2": np.mean(r2)})
+    return pd.DataFrame(rows).sort_values(["target", "rmse_log"], kind="stable").reset_index(drop=True)
+
+
+class LaunchPredictor:
+    """
+    The chosen model per target with the feature columns it was trained
+    on and the tables they came from (load_sources). predict() takes a
+    matrix from build_matrix(frame, columns) and returns players (not
+    logs) per target.
+    """
+
+    def __init__(self, columns, models, cv_results=None, sources=None):
+        self.columns = list(columns)
+        self.models = models  # target name -> (candidate name, fitted Model)
+        self.cv_results = cv_results
+        self.sources = [str(p) for p in sources or [GAMES_DATA_PATH]]
+
+    def predict(self, X):
+        # A log-scale prediction below 0 would come back as a negative player count
+        return {target: np.clip(np.expm1(model.predict(X)), 0, None) for target, (_, model) in self.models.items()}
+
+
+def fit_best(cache_dir, results, sources) -> LaunchPredictor:
+    """Refit the lowest-RMSE candidate of each target on every row of the cache built from `sources`."""
+    X, Y, _, meta = load_training_data(cache_dir)
+    models = {}
+    for t, target in enumerate(meta["targets"]):
+        best = results[results["target"] == target].iloc[0]["model"]
+        models[target] = (best, make_model(best).fit(X, Y[:, t]))
+    return LaunchPredictor(meta["columns"], models, results.to_dict("records"), sources)
+
+
+def save_model(predictor: LaunchPredictor, path=MODEL_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump(predictor, f)
+    os.replace(tmp_path, path)
+
+
+def load_model(path=MODEL_PATH) -> LaunchPredictor:
+    if not Path(path).exists():
+        raise SystemExit(f"No model at {path}. Train one first with: python cli.py train")
+    with Path(path).open("rb") as f:
+        return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate launch peak/average player models and save the best.")
+    parser.add_argument("--data", type=Path, default=GAMES_DATA_PATH,
+                        help="games table with the targets and features (e.g. data/game_features.csv)")
+    parser.add_argument("--launch-reviews", action="store_true",
+                        help=f"also use the first-week review columns of {LAUNCH_SUMMARY_PATH}")
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--repeats", type=int, default=N_REPEATS)
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--no-save", action="store_true", help=f"don't write {MODEL_PATH}")
+    args = parser.parse_args()
+
+    sources, columns = [args.data], list(FEATURE_COLUMNS)
+    if args.launch_reviews:
+        sources.append(LAUNCH_SUMMARY_PATH)
+        columns += LAUNCH_REVIEW_COLUMNS
+
+    started = time.perf_counter()
+    cache_dir = prepare_training_data(sources, columns, args.folds, args.repeats, args.seed)
+    prepared = time.perf_counter()
+    results = cross_validate(cache_dir, workers=args.workers)
+    done = time.perf_counter()
+
+    X = load_training_data(cache_dir)[0]
+    print(f"{X.shape[0]} games x {X.shape[1]} features, {args.repeats}x{args.folds}-fold CV of "
+          f"{len(CANDIDATES)} models: data {prepared - started:.2f}s, CV {done - prepared:.2f}s "
+          f"({args.workers} workers)\n")
+    print(results.to_string(index=False, float_format="%.4f"))
+
+    CV_RESULTS_CSV.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(CV_RESULTS_CSV, index=False)
+    if not args.no_save:
+        predictor = fit_best(cache_dir, results, sources)
+        save_model(predictor, MODEL_PATH)
+        chosen = ", ".join(f"{t}: {name}" for t, (name, _) in predictor.models.items())
+        print(f"\nSaved {chosen} to {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    # Run through the module so the pickled classes are launch_model.*, not __main__.*
+    import launch_model
+    launch_model.main()
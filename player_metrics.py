@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from player_store import MISSING_PLAYERS, PlayerStore
+
+
+DAY = 86_400
+DEFAULT_WINDOWS = [90]  # days after release
+RETENTION_DAYS = [7, 30, 90]  # players on these days as a fraction of the window's peak
+
+
+class Catalog:
+    """
+    The player series of many games gathered into three flat arrays (game
+    number, timestamp, players), ordered by game and then time, so metrics
+    for every game are computed with whole-array numpy operations.
+    """
+
+    def __init__(self, store: PlayerStore, appids):
+        self.appids = np.array([a for a in appids if a in store], dtype=np.int64)
+        entries = [store.meta["games"][str(a)] for a in self.appids]
+        offsets = np.array([e["offset"] for e in entries], dtype=np.int64)
+        lengths = np.array([e["length"] for e in entries], dtype=np.int64)
+
+        self.starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        self.game = np.repeat(np.arange(len(self.appids)), lengths)
+        rows = np.arange(len(self.game)) - self.starts[self.game] + offsets[self.game]
+        self.timestamps = np.asarray(store.timestamps[rows]) if len(rows) else np.empty(0, np.int64)
+        self.players = np.asarray(store.players[rows]) if len(rows) else np.empty(0, np.int32)
+        self.lengths = lengths
+
+    def first_timestamps(self):
+        """Timestamp of each game's first chart row, gap or not (int64 min for an empty chart)."""
+        out = np.full(len(self.appids), np.iinfo(np.int64).min)
+        has_rows = self.lengths > 0
+        out[has_rows] = self.timestamps[self.starts[has_rows]]
+        return out
+
+    def has_gaps(self):
+        return np.bincount(self.game, weights=self.players == MISSING_PLAYERS, minlength=len(self.appids)) > 0
+
+
+def _first_index(mask, game, n_games):
+    """Index of the first True row of each game, -1 where it has none."""
+    idx = np.flatnonzero(mask)
+    found, pos = np.unique(game[idx], return_index=True)
+    out = np.full(n_games, -1, dtype=np.int64)
+    out[found] = idx[pos]
+    return out
+
+
+def _last_index(mask, game, n_games):
+    """Index of the last True row of each game, -1 where it has none."""
+    idx = np.flatnonzero(mask)[::-1]
+    found, pos = np.unique(game[idx], return_index=True)
+    out = np.full(n_games, -1, dtype=np.int64)
+    out[found] = idx[pos]
+    return out
+
+
+def _take(values, idx, fill=np.nan):
+    out = np.full(len(idx), fill, dtype=np.float64)
+    ok = idx >= 0
+    out[ok] = values[idx[ok]]
+    return out
+
+
+def window_rows(catalog: Catalog, start_ts, days):
+    """Mask of the rows with a player count between each game's start_ts and start_ts + days (both included)."""
+    start = start_ts[catalog.game]
+    return ((catalog.players != MISSING_PLAYERS)
+            & (catalog.timestamps >= start)
+            & (catalog.timestamps <= start + days * DAY))
+
+
+def window_metrics(catalog: Catalog, start_ts, days, retention_days=RETENTION_DAYS) -> pd.DataFrame:
+    """
+    Metrics of every game over [start_ts, start_ts + days]: peak, when it
+    happened (first time if tied, like idxmax), mean, median, days from
+    start to peak, days from peak until players first fall to half of it,
+    and players on each of `retention_days` (the last sample on or before
+    that day) relative to the peak.
+    """
+    n = len(catalog.appids)
+    mask = window_rows(catalog, start_ts, days)
+    game = catalog.game[mask]
+    ts = catalog.timestamps[mask]
+    players = catalog.players[mask].astype(np.int64)
+
+    count = np.bincount(game, minlength=n)
+    total = np.bincount(game, weights=players, minlength=n)
+    has = count > 0
+    group_starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+
+    peak = np.full(n, np.nan)
+    if len(players):
+        peak[has] = np.maximum.reduceat(players, group_starts[has])
+    peak_idx = _first_index(players == peak[game], game, n)
+    peak_ts = _take(ts, peak_idx)
+
+    # Median: sort each game's counts in place (the rows are already grouped by game)
+    by_count = players[np.lexsort((players, game))]
+    lo = np.where(has, group_starts + (count - 1) // 2, -1)
+    hi = np.where(has, group_starts + count // 2, -1)
+    median = (_take(by_count, lo) + _take(by_count, hi)) / 2
+
+    half = _first_index((np.arange(len(game)) >= peak_idx[game]) & (players <= peak[game] / 2), game, n)
+
+    out = pd.DataFrame({
+        "peak": peak,
+        "peak_timestamp": pd.to_datetime(peak_ts, unit="s"),
+        "mean": np.where(has, total / np.maximum(count, 1), np.nan),
+        "median": median,
+        "samples": count,
+        "time_to_peak_days": (peak_ts - start_ts) / DAY,
+        "half_life_days": (_take(ts, half) - peak_ts) / DAY,
+    }, index=pd.Index(catalog.appids, name="appid"))
+
+    for d in retention_days:
+        if d <= days:
+            last = _last_index(ts <= start_ts[game] + d * DAY, game, n)
+            out[f"retention_d{d}"] = _take(players, last) / peak
+    return out
+
+
+def player_metrics(catalog: Catalog, release_ts, windows=DEFAULT_WINDOWS, retention_days=RETENTION_DAYS):
+    """
+    window_metrics for each window length, columns suffixed with _{days}d.
+    Windows start at the release date, or at the first chart row for games
+    whose chart begins after release (start_adjusted).
+    """
+    first = catalog.first_timestamps()
+    start_ts = np.maximum(release_ts, first)
+    frames = [pd.DataFrame({"start_timestamp": pd.to_datetime(start_ts, unit="s"),
+                            "start_adjusted": first > release_ts},
+                           index=pd.Index(catalog.appids, name="appid"))]
+    for days in windows:
+        frames.append(window_metrics(catalog, start_ts, days, retention_days).add_suffix(f"_{days}d"))
+    return pd.concat(frames, axis=1)
+
+
+def release_timestamps(release_dates) -> np.ndarray:
+    """release_date strings (as in games_data_list.csv) as epoch seconds."""
+    return pd.to_datetime(pd.Series(release_dates)).to_numpy("datetime64[s]").astype(np.int64)
+
+
+def distribution(values, bins=(0, 1, 2, 7, 14, 30, 60)) -> pd.Series:
+    """How many games fall in each [bins[i], bins[i+1]) range of `values` (e.g. days to peak)."""
+    values = pd.Series(values).dropna()
+    edges = list(bins) + [np.inf]
+    labels = [f"{a}-{b}" if np.isfinite(b) else f"{a}+" for a, b in zip(edges[:-1], edges[1:])]
+    return pd.cut(values, edges, right=False, labels=labels).value_counts(sort=False)
@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from player_store import MISSING_PLAYERS, ArrayStore, PlayerStore, ingest_charts
+
+
+PYRAMID_DIR = Path("data/player_pyramid")
+
+HOUR = 3_600
+DAY = 86_400
+# (name, bucket width in seconds, bucket offset), finest first; every width
+# is a multiple of the one before. Weeks start on Monday (the epoch was a Thursday).
+TIERS = [
+    ("hourly", HOUR, 0),
+    ("daily", DAY, 0),
+    ("weekly", 7 * DAY, 4 * DAY),
+]
+DEFAULT_MAX_POINTS = 2_000
+
+
+class TierStore(ArrayStore):
+    """
+    One tier of the pyramid: per game, a row per bucket with chart samples
+    in it (bucket start, min / max / sum / count / last of the player
+    counts). Index entries also record how many raw rows the tier covers
+    and a digest of them, so later updates only aggregate what was added.
+    """
+
+    COLUMNS = {"start": np.int64, "min": np.int32, "max": np.int32, "sum": np.int64, "count": np.int32,
+               "last": np.int32}
+
+
+def bucket_starts(ts, width, offset):
+    return (ts - offset) // width * width + offset
+
+
+def aggregate(ts, players, width, offset):
+    """Raw chart rows (sorted by time) -> TierStore columns; gaps are left out."""
+    keep = players != MISSING_PLAYERS
+    ts = np.asarray(ts)[keep]
+    players = np.asarray(players)[keep].astype(np.int64)
+    if not len(ts):
+        return tuple(np.empty(0, dtype) for dtype in TierStore.COLUMNS.values())
+
+    bucket = bucket_starts(ts, width, offset)
+    first = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    end = np.append(first[1:], len(ts))
+    return (bucket[first],
+            np.minimum.reduceat(players, first),
+            np.maximum.reduceat(players, first),
+            np.add.reduceat(players, first),
+            end - first,
+            players[end - 1])
+
+
+def merge(old, new):
+    """Tier columns for `old` followed by `new`, folding them together where both have the same bucket."""
+    if not len(old[0]) or not len(new[0]) or old[0][-1] != new[0][0]:
+        return tuple(np.concatenate([o, n]) for o, n in zip(old, new))
+    start, mn, mx, total, count, last = (np.asarray(c) for c in old)
+    joined = (start[-1], min(mn[-1], new[1][0]), max(mx[-1], new[2][0]), total[-1] + new[3][0],
+              count[-1] + new[4][0], new[5][0])
+    return tuple(np.concatenate([o[:-1], [j], n[1:]]) for o, j, n in zip(old, joined, new))
+
+
+def raw_digest(ts, players):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(ts).tobytes())
+    h.update(np.ascontiguousarray(players).tobytes())
+    return h.hexdigest()
+
+
+class PlayerPyramid:
+    """
+    The player store's charts pre-aggregated into hourly, daily and weekly
+    tiers (one TierStore each), so a chart over any range is read at a
+    resolution that fits a point budget instead of scanning raw rows.
+    """
+
+    def __init__(self, store: PlayerStore, directory=PYRAMID_DIR):
+        self.store = store
+        self.directory = Path(directory)
+        self.tiers = {name: TierStore(self.directory / name) for name, _, _ in TIERS}
+
+    def update(self):
+        """
+        Bring every tier up to date with the store. When a game's raw rows
+        still start with the rows a tier was built from (same digest), only
+        the rows after them are aggregated and merged into its last bucket;
+        otherwise (a chart was revised, or is new) the game is rebuilt.
+        Returns (games extended, games rebuilt).
+        """
+        extended, rebuilt = set(), set()
+        for name, width, offset in TIERS:
+            tier = self.tiers[name]
+            entries = []
+            for appid in self.store.appids():
+                ts, players = self.store.series(appid)
+                entry = tier.meta["games"].get(str(appid))
+                done = entry["raw_length"] if entry else 0
+                if entry and done <= len(ts) and entry["raw_digest"] == raw_digest(ts[:done], players[:done]):
+                    if done == len(ts):
+                        continue
+                    columns = merge(tier.series(appid), aggregate(ts[done:], players[done:], width, offset))
+                    extended.add(appid)
+                else:
+                    columns = aggregate(ts, players, width, offset)
+                    rebuilt.add(appid)
+                entries.append((appid, columns, {"raw_length": len(ts), "raw_digest": raw_digest(ts, players)}))
+
+            if entries:
+                tier._append(entries)
+            gone = set(tier.appids()) - set(self.store.appids())
+            if gone:
+                tier.remove(gone)
+            tier.compact_if_mostly_dead()
+        return extended - rebuilt, rebuilt
+
+    def query(self, appid, start_ts, end_ts, max_points=DEFAULT_MAX_POINTS):
+        """
+        A game's players between start_ts and end_ts at the finest resolution
+        (raw, hourly, daily, weekly) with at most max_points rows, or weekly
+        if even that has more. Returns (resolution, DataFrame of time / min /
+        max / mean / last / samples per bucket).
+        """
+        ts, players = self.store.window(appid, start_ts, end_ts)
+        if len(ts) <= max_points:
+            keep = players != MISSING_PLAYERS
+            values = np.asarray(players)[keep]
+            return "raw", pd.DataFrame({"time": pd.to_datetime(np.asarray(ts)[keep], unit="s"), "min": values,
+                                        "max": values, "mean": values.astype(np.float64), "last": values,
+                                        "samples": np.ones(len(values), dtype=np.int64)})
+
+        for name, width, offset in TIERS:
+            start, mn, mx, total, count, last = self.tiers[name].series(appid)
+            lo = np.searchsorted(start, bucket_starts(start_ts, width, offset), side="left")
+            hi = np.searchsorted(start, end_ts, side="right")
+            if hi - lo <= max_points or name == TIERS[-1][0]:
+                break
+        return name, pd.DataFrame({"time": pd.to_datetime(np.asarray(start[lo:hi]), unit="s"), "min": mn[lo:hi],
+                                   "max": mx[lo:hi], "mean": total[lo:hi] / count[lo:hi], "last": last[lo:hi],
+                                   "samples": count[lo:hi]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hourly / daily / weekly player-count tiers for fast range queries.")
+    parser.add_argument("--appid", type=int, help="print this game's chart over --start/--end")
+    parser.add_argument("--start", default="1970-01-01", help="range start (a date or datetime)")
+    parser.add_argument("--end", default="2100-01-01", help="range end (a date or datetime)")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS)
+    args = parser.parse_args()
+
+    pyramid = PlayerPyramid(ingest_charts())
+    started = time.perf_counter()
+    extended, rebuilt = pyramid.update()
+    print(f"Pyramid up to date in {time.perf_counter() - started:.2f}s: "
+          f"{len(rebuilt)} game(s) rebuilt, {len(extended)} extended")
+    for name, tier in pyramid.tiers.items():
+        print(f"  {name}: {len(tier) - tier.dead_rows()} rows")
+
+    if args.appid is not None:
+        start_ts = pd.Timestamp(args.start).value // 10**9
+        end_ts = pd.Timestamp(args.end).value // 10**9
+        started = time.perf_counter()
+        resolution, chart = pyramid.query(args.appid, start_ts, end_ts, args.max_points)
+        print(f"\n{args.appid}: {len(chart)} {resolution} points in {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(chart.to_string(index=False, max_rows=40))
+
+
+if __name__ == "__main__":
+    main()
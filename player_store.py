@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+CHART_DIR = Path("game_concurrent_players")
+CHART_GLOB = "steamdb_chart_*.csv"  # hand-downloaded SteamDB charts
+STEAMCHARTS_GLOB = "steamcharts_chart_*.csv"  # daily peaks written by chart_acquisition.py
+CHART_DIR_GLOBS = [CHART_GLOB, STEAMCHARTS_GLOB]
+# Every place chart files are kept, in order of precedence: a game with
+# charts in several of them gets the rows of all of them, the first one
+# winning where their timestamps overlap
+CHART_SOURCES = [(CHART_DIR, pattern) for pattern in CHART_DIR_GLOBS] + [
+    (Path("watchdogs_data"), "*_Player_Chart.csv"),  # e.g. Watch_Dogs_2_447040_Player_Chart.csv
+]
+PLAYER_STORE_DIR = Path("data/player_store")
+
+MISSING_PLAYERS = -1  # chart rows with no player count
+COMPACT_DEAD_FRACTION = 0.5  # rewrite the arrays once this much of them belongs to replaced charts
+
+
+def chart_appid(path: Path) -> int:
+    """The appid in a chart file name: its last number (steamdb_chart_447040, Watch_Dogs_2_447040_Player_Chart)."""
+    return int(re.findall(r"\d+", Path(path).stem)[-1])
+
+
+def chart_paths(sources=CHART_SOURCES):
+    """appid -> chart files found for it across `sources` ((directory, glob) pairs), in source order."""
+    paths = {}
+    for directory, pattern in sources:
+        for path in sorted(Path(directory).glob(pattern)):
+            paths.setdefault(chart_appid(path), []).append(path)
+    return paths
+
+
+def source_fingerprint(paths):
+    return [[p.stat().st_size, p.stat().st_mtime_ns] for p in map(Path, paths)]
+
+
+def parse_chart(path):
+    """
+    Read one SteamDB chart CSV into (timestamps, players): int64 seconds
+    since the epoch and int32 counts, MISSING_PLAYERS where the chart has a
+    gap. Rows are sorted by time (stably, so rows with the same timestamp
+    keep their file order), as the store's readers search and bucket the
+    series assuming it; Average Players is not kept.
+    """
+    df = pd.read_csv(path, usecols=["DateTime", "Players"])
+    timestamps = pd.to_datetime(df["DateTime"], format="%Y-%m-%d %H:%M:%S").to_numpy("datetime64[s]").astype(np.int64)
+    players = df["Players"].fillna(MISSING_PLAYERS).to_numpy(np.int32)
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, players = timestamps[order], players[order]
+    return timestamps, players
+
+
+def parse_charts(paths):
+    """parse_chart for one game's chart files, merged by timestamp (earlier files win on duplicates)."""
+    if len(paths) == 1:
+        return parse_chart(paths[0])
+    parts = [parse_chart(p) for p in paths]
+    timestamps = np.concatenate([ts for ts, _ in parts])
+    players = np.concatenate([pl for _, pl in parts])
+    timestamps, first = np.unique(timestamps, return_index=True)
+    return timestamps, players[first]
+
+
+class ArrayStore:
+    """
+    Series keyed by appid, kept as one flat array per column in COLUMNS on
+    disk and memory-mapped read-only. index.json maps appid -> offset and
+    length in the arrays (plus whatever the subclass records with it), so a
+    game's series is a slice of each array and nothing is parsed when it is
+    read.
+
+    Re-adding a game appends its rows to the end of the arrays and moves
+    its index entry; the old rows stay as dead space until compact()
+    rewrites the arrays. The arrays are written before the index, and
+    every append first cuts each array back to the end of the indexed
+    rows, so whatever a crash left half-written after them is dropped
+    instead of shifting the new rows out of line.
+    """
+
+    COLUMNS = {}  # column name -> dtype, one array file each
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.json"
+        self.meta = {"generation": 0, "games": {}}
+        if self.index_path.exists():
+            with self.index_path.open(encoding="utf-8") as f:
+                self.meta = json.load(f)
+        self._open()
+
+    def _array_path(self, name, generation=None):
+        generation = self.meta["generation"] if generation is None else generation
+        dtype = np.dtype(self.COLUMNS[name])
+        return self.directory / f"{name}.{generation}.{dtype.kind}{dtype.itemsize * 8}"
+
+    def _map(self, name, dtype):
+        path = self._array_path(name)
+        if not path.exists() or path.stat().st_size == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def _open(self):
+        self.arrays = {name: self._map(name, dtype) for name, dtype in self.COLUMNS.items()}
+
+    def __len__(self):
+        """Rows in the arrays, dead ones included."""
+        return len(next(iter(self.arrays.values()))) if self.arrays else 0
+
+    def appids(self):
+        return sorted(int(a) for a in self.meta["games"])
+
+    def __contains__(self, appid):
+        return str(appid) in self.meta["games"]
+
+    def series(self, appid):
+        """One game's columns, in COLUMNS order, as read-only views into the mapped arrays."""
+        entry = self.meta["games"][str(appid)]
+        start, end = entry["offset"], entry["offset"] + entry["length"]
+        return tuple(self.arrays[name][start:end] for name in self.COLUMNS)
+
+    def dead_rows(self):
+        live = sum(e["length"] for e in self.meta["games"].values())
+        return len(self) - live
+
+    def _append(self, entries):
+        """
+        Append (appid, columns, extra index fields) for each game and point the
+        index at the new rows; replaces earlier versions of those games.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        offset = self._truncate_to_index()
+        files = {name: self._array_path(name).open("ab") for name in self.COLUMNS}
+        try:
+            for appid, columns, extra in entries:
+                for (name, dtype), values in zip(self.COLUMNS.items(), columns):
+                    files[name].write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                length = len(columns[0])
+                self.meta["games"][str(appid)] = {"offset": offset, "length": length, **extra}
+                offset += length
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for f in files.values():
+                f.close()
+        self._save_index()
+        self._open()
+
+    def _truncate_to_index(self):
+        """
+        Cut every array file to the rows the index references (a crash mid-append
+        can leave the files with different lengths). Returns that row count.
+        """
+        end = max((e["offset"] + e["length"] for e in self.meta["games"].values()), default=0)
+        self.arrays = {}  # unmap before the files change size
+        for name, dtype in self.COLUMNS.items():
+            path = self._array_path(name)
+            size = end * np.dtype(dtype).itemsize
+            actual = path.stat().st_size if path.exists() else 0
+            if actual < size:
+                raise RuntimeError(f"{path} is shorter than {self.index_path} says; rebuild the store")
+            if actual > size:
+                os.truncate(path, size)
+        self._open()
+        return end
+
+    def remove(self, appids):
+        for appid in appids:
+            self.meta["games"].pop(str(appid), None)
+        self._save_index()
+
+    def compact(self):
+        """Rewrite the arrays with only the live rows, as a new generation, then drop the old files."""
+        old_generation = self.meta["generation"]
+        new_generation = old_generation + 1
+        games = {}
+        offset = 0
+        files = {name: self._array_path(name, new_generation).open("wb") for name in self.COLUMNS}
+        try:
+            for appid in self.appids():
+                columns = self.series(appid)
+                for name, values in zip(self.COLUMNS, columns):
+                    files[name].write(np.asarray(values).tobytes())
+                games[str(appid)] = dict(self.meta["games"][str(appid)], offset=offset)
+                offset += len(columns[0])
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for f in files.values():
+                f.close()
+
+        self.arrays = {}  # unmap before the old files go
+        self.meta = {"generation": new_generation, "games": games}
+        self._save_index()
+        for name in self.COLUMNS:
+            self._array_path(name, old_generation).unlink(missing_ok=True)
+        self._open()
+
+    def compact_if_mostly_dead(self):
+        if len(self) and self.dead_rows() > COMPACT_DEAD_FRACTION * len(self):
+            print(f"Compacting {self.directory} ({self.dead_rows()} dead rows)")
+            self.compact()
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.index_path)
+
+
+class PlayerStore(ArrayStore):
+    """
+    Every game's concurrent player chart as two flat arrays, timestamps
+    (int64 seconds) and players (int32). Index entries also keep the
+    size/mtime of the chart file(s) each game came from.
+    """
+
+    COLUMNS = {"timestamps": np.int64, "players": np.int32}
+
+    def __init__(self, directory=PLAYER_STORE_DIR):
+        super().__init__(directory)
+
+    @property
+    def timestamps(self):
+        return self.arrays["timestamps"]
+
+    @property
+    def players(self):
+        return self.arrays["players"]
+
+    def window(self, appid, start_ts, end_ts):
+        """The part of a game's series with start_ts <= timestamp <= end_ts (the series is sorted by time)."""
+        ts, players = self.series(appid)
+        lo = np.searchsorted(ts, start_ts, side="left")
+        hi = np.searchsorted(ts, end_ts, side="right")
+        return ts[lo:hi], players[lo:hi]
+
+    def frame(self, appid):
+        """A game's chart as the DataFrame pd.read_csv(...) gave for DateTime and Players."""
+        ts, players = self.series(appid)
+        missing = players == MISSING_PLAYERS
+        values = np.where(missing, np.nan, players) if missing.any() else np.array(players, dtype=np.int64)
+        return pd.DataFrame({"DateTime": pd.to_datetime(np.asarray(ts), unit="s"), "Players": values})
+
+    def is_current(self, appid, paths) -> bool:
+        entry = self.meta["games"].get(str(appid))
+        return entry is not None and entry["source"] == source_fingerprint(paths)
+
+    def add(self, charts):
+        """
+        Append (appid, source paths, timestamps, players) for each chart and
+        point the index at the new rows; replaces earlier versions of those games.
+        """
+        self._append((appid, (ts, players), {"source": source_fingerprint(paths)})
+                     for appid, paths, ts, players in charts)
+
+
+def ingest_charts(chart_dir=None, store_dir=PLAYER_STORE_DIR, workers=None, rebuild=False) -> PlayerStore:
+    """
+    Bring the store up to date with the chart CSVs of CHART_SOURCES (or only
+    the CHART_DIR_GLOBS files in chart_dir): games whose charts are new
+    or changed since they were ingested are parsed in parallel and
+    appended, games with no chart left are dropped, and the arrays are
+    compacted once too much of them is dead. Returns the opened store.
+    """
+    store = PlayerStore(store_dir)
+    paths = chart_paths([(chart_dir, g) for g in CHART_DIR_GLOBS] if chart_dir is not None else CHART_SOURCES)
+    if rebuild:
+        store.remove(store.appids())
+    todo = [(appid, p) for appid, p in sorted(paths.items()) if not store.is_current(appid, p)]
+    gone = set(store.appids()) - set(paths)
+
+    if gone:
+        store.remove(gone)
+    if todo:
+        print(f"Ingesting {len(todo)} of {len(paths)} player charts into {store.directory}")
+        jobs = [p for _, p in todo]
+        if workers == 1 or len(todo) == 1:
+            parsed = list(map(parse_charts, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(parse_charts, jobs, chunksize=4))
+        store.add((appid, p, ts, pl) for (appid, p), (ts, pl) in zip(todo, parsed))
+
+    store.compact_if_mostly_dead()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the SteamDB player charts into the memory-mapped player store.")
+    parser.add_argument("--chart-dir", type=Path,
+                        help="only ingest the chart files in this directory (default: all chart sources)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--rebuild", action="store_true", help="re-ingest every chart, not only changed ones")
+    args = parser.parse_args()
+
+    store = ingest_charts(args.chart_dir, workers=args.workers, rebuild=args.rebuild)
+    print(f"{len(store.appids())} games, {len(store) - store.dead_rows()} rows in {store.directory}")
+
+
+if __name__ == "__main__":
+    main()
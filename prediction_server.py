@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import time
+from collections import deque
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from launch_model import (MODEL_PATH, LaunchPredictor, build_matrix, load_model, load_sources, missing_columns,
+                          record_matrix)
+
+
+HOST = "127.0.0.1"
+PORT = 8780
+
+MAX_BATCH = 256  # rows per model call
+MAX_WAIT_MS = 2.0  # how long the first row of a batch waits for others to join it
+LATENCY_WINDOW = 10_000  # requests kept for the p50/p99 figures
+BENCH_REQUESTS = 2_000
+BENCH_CONCURRENCY = 64
+
+
+class MicroBatcher:
+    """
+    Coalesces the feature rows of concurrent requests: the first row
+    waits up to max_wait_ms for more, then every queued row (up to
+    max_batch) goes through one vectorized predict call.
+    """
+
+    def __init__(self, predictor: LaunchPredictor, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.rows = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def predict(self, X):
+        """Predictions for the rows of X (one dict of target -> players per row), batched with other callers."""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in range(len(X))]
+        for row, fut in zip(X, futures):
+            self.queue.put_nowait((row, fut))
+        return await asyncio.gather(*futures)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+
+            batch = [(row, fut) for row, fut in batch if not fut.done()]  # callers that went away
+            if not batch:
+                continue
+            try:
+                predictions = self.predictor.predict(np.stack([row for row, _ in batch]))
+            except Exception as e:  # noqa: BLE001 - fail the callers, keep serving
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for i, (_, fut) in enumerate(batch):
+                fut.set_result({target: float(values[i]) for target, values in predictions.items()})
+            self.batches += 1
+            self.rows += len(batch)
+
+
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return {"requests": self.count, "p50_ms": None, "p99_ms": None}
+        p50, p99 = np.percentile(np.fromiter(self.samples, float), [50, 99]) * 1000
+        return {"requests": self.count, "p50_ms": round(p50, 3), "p99_ms": round(p99, 3)}
+
+
+def load_game_features(sources, columns):
+    """
+    (appid -> row number, float32 matrix) for every game in the tables the
+    model was trained on, built once at startup. Exits if a feature the
+    model uses isn't in them, rather than imputing it for every game.
+    """
+    df = load_sources(sources, columns).drop_duplicates("appid")
+    missing = missing_columns(df, columns)
+    if missing:
+        raise SystemExit(f"The model uses {missing}, which {', '.join(map(str, sources))} don't have")
+    return {int(a): i for i, a in enumerate(df["appid"])}, build_matrix(df, columns)
+
+
+def make_app(predictor: LaunchPredictor, sources=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+    """
+    POST /predict with {"appids": [...]} (games in the features table) or
+    {"games": [{column: value, ...}, ...]} (raw features, e.g. what-if
+    variations); GET /predict?appid=N for one game; GET /stats for
+    latency and batching figures. Appids are looked up in `sources`,
+    by default the tables the model was trained on.
+    """
+    row_of, game_matrix = load_game_features(sources or predictor.sources, predictor.columns)
+    batcher = MicroBatcher(predictor, max_batch, max_wait_ms)
+    latency = LatencyTracker()
+
+    @web.middleware
+    async def timed(request, handler):
+        started = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            if request.path == "/predict":
+                latency.add(time.perf_counter() - started)
+
+    async def answer(appids=None, games=None):
+        if appids is not None:
+            if not isinstance(appids, list):
+                raise web.HTTPBadRequest(text="appids must be a list")
+            try:
+                appids = [int(a) for a in appids]
+            except (TypeError, ValueError):
+                raise web.HTTPBadRequest(text="appids must be integers")
+            unknown = [a for a in appids if a not in row_of]
+            if unknown:
+                raise web.HTTPNotFound(text=f"no features for appid(s) {unknown}")
+            X = game_matrix[[row_of[a] for a in appids]]
+        else:
+            if not isinstance(games, list) or not all(isinstance(g, dict) for g in games):
+                raise web.HTTPBadRequest(text='expected {"appids": [...]} or {"games": [{...}, ...]}')
+            X = record_matrix(games, predictor.columns)
+
+        predictions = await batcher.predict(X)
+        if appids is not None:
+            predictions = [{"appid": a, **p} for a, p in zip(appids, predictions)]
+        return web.json_response({"predictions": predictions})
+
+    async def predict_post(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="body is not JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text='expected {"appids": [...]} or {"games": [{...}, ...]}')
+        return await answer(body.get("appids"), body.get("games"))
+
+    async def predict_get(request):
+        return await answer([request.query.get("appid")])
+
+    async def stats(request):
+        return web.json_response({
+            **latency.summary(),
+            "batches": batcher.batches,
+            "mean_batch_rows": round(batcher.rows / batcher.batches, 2) if batcher.batches else None,
+            "models": {t: name for t, (name, _) in predictor.models.items()},
+            "games": len(row_of),
+        })
+
+    async def start_batcher(app):
+        batcher.start()
+
+    async def stop_batcher(app):
+        await batcher.stop()
+
+    app = web.Application(middlewares=[timed])
+    app.router.add_post("/predict", predict_post)
+    app.router.add_get("/predict", predict_get)
+    app.router.add_get("/stats", stats)
+    app.on_startup.append(start_batcher)
+    app.on_cleanup.append(stop_batcher)
+    app["appids"] = list(row_of)
+    return app
+
+
+async def bench(app, n_requests=BENCH_REQUESTS, concurrency=BENCH_CONCURRENCY):
+    """Serve `app` on a free localhost port and fire n_requests single-game queries, `concurrency` at a time."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, 0).start()
+    url = f"http://{HOST}:{runner.addresses[0][1]}"
+    appids = app["appids"]
+
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(session, i):
+        async with sem:
+            started = time.perf_counter()
+            async with session.post(f"{url}/predict", json={"appids": [appids[i % len(appids)]]}) as resp:
+                resp.raise_for_status()
+                await resp.json()
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(one(session, i) for i in range(n_requests)))
+            elapsed = time.perf_counter() - started
+            async with session.get(f"{url}/stats") as resp:
+                server = await resp.json()
+    finally:
+        await runner.cleanup()
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{n_requests} requests, {concurrency} concurrent: {n_requests / elapsed:.0f} req/s")
+    print(f"  client latency  p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    print(f"  server latency  p50 {server['p50_ms']:.2f} ms, p99 {server['p99_ms']:.2f} ms")
+    print(f"  {server['batches']} model calls, {server['mean_batch_rows']} rows per call on average")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service for launch player predictions, with micro-batching.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument("--features", type=Path,
+                        help="games table to look appids up in instead of the one the model was trained on "
+                             "(e.g. data/game_features.csv); the model's other sources are still joined to it")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--bench", type=int, metavar="REQUESTS",
+                        help="serve on a free localhost port, send this many requests, print latency and exit")
+    parser.add_argument("--concurrency", type=int, default=BENCH_CONCURRENCY, help="concurrent requests for --bench")
+    args = parser.parse_args()
+
+    predictor = load_model(args.model)
+    sources = [str(args.features)] + predictor.sources[1:] if args.features else predictor.sources
+    app = make_app(predictor, sources, args.max_batch, args.max_wait_ms)
+    models = ", ".join(f"{t}: {name}" for t, (name, _) in predictor.models.items())
+    print(f"Loaded {models} from {args.model}; {len(app['appids'])} games from {', '.join(sources)}")
+
+    if args.bench:
+        asyncio.run(bench(app, args.bench, args.concurrency))
+    else:
+        web.run_app(app, host=args.host, port=args.port,
+                    print=lambda _: print(f"Serving on http://{args.host}:{args.port} (stats at /stats)"))
+
+
+if __name__ == "__main__":
+    main()
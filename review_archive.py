@@ -0,0 +1,232 @@
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+
+
+# One archive per appid, shared by every collector (like the review DB)
+ARCHIVE_DIR = Path(__file__).resolve().parent / "data" / "raw_pages"
+READ_CHUNK_BYTES = 64 * 1024
+LEGACY_PAGE_ROWS = 100  # rows per archive page when moving an old raw_json column over
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))  # raw_json cells can be large
+
+
+class ReviewArchive:
+    """
+    Append-only archive of the raw Steam review pages for one appid.
+
+    {appid}.jsonl.gz - one gzip member per API page, each holding one JSON
+                       line: {"appid", "cursor", "fetched_at", "reviews": [...]}
+    {appid}.idx      - "recommendationid<TAB>page offset<TAB>position in page"
+                       per archived review, append-only; the last entry wins
+
+    Every page is its own gzip member, so the file can be appended to and a
+    single page can be read by seeking to its byte offset, while gzip -dc
+    or gzip.open still read the whole file as plain JSONL.
+
+    Rows in the review CSVs and DB point into it with a raw_ref of
+    "appid:offset:position" instead of carrying the review's JSON.
+    """
+
+    def __init__(self, appid: int, directory: Path = ARCHIVE_DIR):
+        self.appid = int(appid)
+        self.directory = Path(directory)
+        self.path = self.directory / f"{self.appid}.jsonl.gz"
+        self.index_path = self.directory / f"{self.appid}.idx"
+        self._index = None
+        self._last_page = (None, None)  # (offset, page) of the last page read
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def ref(self, offset: int, position: int) -> str:
+        return f"{self.appid}:{offset}:{position}"
+
+    def append_page(self, reviews, cursor=None) -> int:
+        """Archive one API page of reviews and return its byte offset."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        page = {"appid": self.appid, "cursor": cursor, "fetched_at": int(time.time()), "reviews": reviews}
+        data = gzip.compress((json.dumps(page, ensure_ascii=False) + "\n").encode("utf-8"), mtime=0)
+
+        with self.path.open("ab") as f:
+            offset = f.tell()
+            f.write(data)
+
+        entries = [(str(r.get("recommendationid")), offset, i) for i, r in enumerate(reviews)]
+        with self.index_path.open("a", encoding="utf-8") as f:
+            f.writelines(f"{rid}\t{off}\t{i}\n" for rid, off, i in entries)
+        if self._index is not None:
+            self._index.update((rid, (off, i)) for rid, off, i in entries)
+        return offset
+
+    def _read_member(self, f, offset):
+        """Decompress the gzip member at `offset`. Returns (page, offset of the next member)."""
+        f.seek(offset)
+        d = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        parts = []
+        read = 0
+        while not d.eof:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                raise EOFError(f"{self.path}: page at offset {offset} is incomplete")
+            read += len(chunk)
+            parts.append(d.decompress(chunk))
+        return json.loads(b"".join(parts)), offset + read - len(d.unused_data)
+
+    def read_page(self, offset: int) -> dict:
+        """One archived page, decompressing only that page."""
+        if self._last_page[0] == offset:
+            return self._last_page[1]
+        with self.path.open("rb") as f:
+            page, _ = self._read_member(f, offset)
+        self._last_page = (offset, page)
+        return page
+
+    def _members(self):
+        """(offset, page, next offset) for every readable page, stopping at a damaged one."""
+        if not self.path.exists():
+            return
+        size = self.path.stat().st_size
+        with self.path.open("rb") as f:
+            offset = 0
+            while offset < size:
+                try:
+                    page, next_offset = self._read_member(f, offset)
+                except (EOFError, zlib.error, ValueError):
+                    print(f"[appid {self.appid}] {self.path} has a damaged page at byte {offset}, stopping there.")
+                    return
+                yield offset, page, next_offset
+                offset = next_offset
+
+    def iter_pages(self):
+        """
+        Yield (offset, page) for every archived page in order. A page cut
+        off by a crash mid-write ends the iteration instead of raising.
+        """
+        for offset, page, _ in self._members():
+            yield offset, page
+
+    def repair(self) -> int:
+        """
+        Cut off a page left half-written by a crash (and index entries that
+        point at or past it), so new pages can be appended after the last
+        good one. Returns the number of bytes dropped.
+        """
+        if not self.path.exists():
+            return 0
+        good_end = 0
+        for _, _, next_offset in self._members():
+            good_end = next_offset
+
+        dropped = self.path.stat().st_size - good_end
+        if dropped:
+            with self.path.open("r+b") as f:
+                f.truncate(good_end)
+            index = {rid: e for rid, e in self._load_index().items() if e[0] < good_end}
+            tmp_path = self.index_path.with_suffix(".idx.tmp")
+            with tmp_path.open("w", encoding="utf-8") as f:
+                f.writelines(f"{rid}\t{off}\t{i}\n" for rid, (off, i) in index.items())
+            os.replace(tmp_path, self.index_path)
+            self._index = index
+            self._last_page = (None, None)
+        return dropped
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if self.index_path.exists():
+                with self.index_path.open(encoding="utf-8") as f:
+                    for line in f:
+                        parts = line.rstrip("\n").split("\t")
+                        if len(parts) == 3:
+                            self._index[parts[0]] = (int(parts[1]), int(parts[2]))
+        return self._index
+
+    def ref_for(self, recommendationid) -> str | None:
+        entry = self._load_index().get(str(recommendationid))
+        return self.ref(*entry) if entry else None
+
+    def get(self, recommendationid) -> dict | None:
+        """The raw API dict for one review, or None if it was never archived."""
+        entry = self._load_index().get(str(recommendationid))
+        if entry is None:
+            return None
+        offset, position = entry
+        return self.read_page(offset)["reviews"][position]
+
+    def resolve(self, ref: str) -> dict:
+        """The raw API dict a raw_ref of this archive points to."""
+        appid, offset, position = (int(x) for x in str(ref).split(":"))
+        if appid != self.appid:
+            raise ValueError(f"raw_ref {ref} belongs to appid {appid}, not {self.appid}")
+        return self.read_page(offset)["reviews"][position]
+
+
+_open_archives: dict[tuple[int, str], ReviewArchive] = {}
+
+
+def load_raw_review(ref: str, directory: Path = ARCHIVE_DIR) -> dict:
+    """
+    The raw API dict for any raw_ref ("appid:offset:position"). Each appid's
+    ReviewArchive is kept between calls and remembers the last page it read,
+    so going through the rows of a CSV in order decompresses each page once.
+    """
+    appid = int(str(ref).split(":", 1)[0])
+    key = (appid, os.fspath(directory))
+    if key not in _open_archives:
+        _open_archives[key] = ReviewArchive(appid, directory)
+    return _open_archives[key].resolve(ref)
+
+
+def archive_legacy_csv(csv_path, archive: ReviewArchive, page_rows: int = LEGACY_PAGE_ROWS) -> bool:
+    """
+    Rewrite a reviews CSV that still has a raw_json column: the JSON of every
+    row goes into `archive` (page_rows reviews per page) and the column is
+    replaced by raw_ref, so new rows can be appended under the same header.
+    Rows whose raw_json doesn't parse get an empty raw_ref.
+    Returns False if the CSV has no raw_json column (nothing to do).
+    """
+    csv_path = Path(csv_path)
+    with csv_path.open(newline="", encoding="utf-8") as f_in:
+        reader = csv.reader(f_in)
+        header = next(reader, None)
+        if not header or "raw_json" not in header:
+            return False
+        col = header.index("raw_json")
+
+        tmp_path = csv_path.with_suffix(csv_path.suffix + ".tmp")
+        with tmp_path.open("w", newline="", encoding="utf-8") as f_out:
+            writer = csv.writer(f_out)
+            writer.writerow(header[:col] + ["raw_ref"] + header[col + 1:])
+
+            def write_page(rows):
+                reviews, positions = [], []
+                for row in rows:
+                    try:
+                        review = json.loads(row[col])
+                    except (IndexError, ValueError):
+                        positions.append(None)
+                        continue
+                    positions.append(len(reviews))
+                    reviews.append(review)
+                offset = archive.append_page(reviews) if reviews else None
+                for row, position in zip(rows, positions):
+                    row[col:col + 1] = [archive.ref(offset, position) if position is not None else ""]
+                    writer.writerow(row)
+
+            rows = []
+            for row in reader:
+                rows.append(row)
+                if len(rows) == page_rows:
+                    write_page(rows)
+                    rows = []
+            if rows:
+                write_page(rows)
+
+    os.replace(tmp_path, csv_path)
+    return True
@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+
+CHECKPOINT_DIR = Path("reviews_data/checkpoints")
+
+
+class ReviewCheckpoint:
+    """
+    Crawl progress for one appid, saved after every page so a crash or
+    Ctrl-C only loses the page that was in flight.
+
+    Two files per appid in `directory`:
+      {appid}.json - cursor for the next page, rows written, CSV byte size,
+                     newest timestamp_created written, done flag
+      {appid}.ids  - recommendation IDs already written, one per line (append-only)
+
+    The .ids file can run ahead of the .json if we die between the two writes,
+    so only the first `rows_written` lines are trusted when loading.
+    """
+
+    def __init__(self, appid: int, directory: Path = CHECKPOINT_DIR):
+        self.appid = appid
+        self.directory = Path(directory)
+        self.state_path = self.directory / f"{appid}.json"
+        self.ids_path = self.directory / f"{appid}.ids"
+
+        self.cursor = "*"
+        self.rows_written = 0
+        self.csv_bytes = 0
+        self.newest_created = 0
+        self.done = False
+        self.seen: set[str] = set()
+
+    @classmethod
+    def load(cls, appid: int, directory: Path = CHECKPOINT_DIR):
+        """Load the saved checkpoint for appid, or a fresh one if there is none."""
+        cp = cls(appid, directory)
+        if not cp.state_path.exists():
+            return cp
+
+        with cp.state_path.open(encoding="utf-8") as f:
+            state = json.load(f)
+        cp.cursor = state.get("cursor") or "*"
+        cp.rows_written = int(state.get("rows_written", 0))
+        cp.csv_bytes = int(state.get("csv_bytes", 0))
+        cp.newest_created = int(state.get("newest_created", 0))
+        cp.done = bool(state.get("done", False))
+
+        ids = []
+        ran_ahead = False
+        if cp.ids_path.exists():
+            with cp.ids_path.open(encoding="utf-8") as f:
+                for line in f:
+                    if len(ids) >= cp.rows_written:
+                        ran_ahead = True
+                        break
+                    ids.append(line.rstrip("\n"))
+        if ran_ahead:
+            # drop the ids appended after the last good state write; via a
+            # temp file, so dying here can't leave fewer ids than rows_written
+            tmp_path = cp.ids_path.with_suffix(".ids.tmp")
+            with tmp_path.open("w", encoding="utf-8") as f:
+                f.writelines(i + "\n" for i in ids)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, cp.ids_path)
+        cp.seen = set(ids)
+        return cp
+
+    def exists(self) -> bool:
+        return self.state_path.exists()
+
+    @classmethod
+    def from_csv(cls, appid: int, csv_path, directory: Path = CHECKPOINT_DIR):
+        """
+        Build a finished checkpoint from a reviews CSV collected before
+        checkpoints existed, so it can be delta-synced instead of re-crawled.
+        """
+        cp = cls(appid, directory)
+        cp.reset()
+        csv_path = Path(csv_path)
+
+        reviews = []
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                reviews.append({
+                    "recommendationid": row.get("recommendationid"),
+                    "timestamp_created": row.get("timestamp_created"),
+                })
+        cp.save("*", reviews, csv_path.stat().st_size, done=True)
+        return cp
+
+    def save(self, cursor: str, new_reviews, csv_bytes: int = 0, done: bool = False):
+        """
+        Record a finished page: the reviews it added (API dicts, only the
+        recommendationid and timestamp_created are used) and the cursor to
+        resume from.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        new_ids = [str(r.get("recommendationid")) for r in new_reviews]
+        for r in new_reviews:
+            try:
+                self.newest_created = max(self.newest_created, int(r.get("timestamp_created") or 0))
+            except (TypeError, ValueError):
+                pass
+        if new_ids:
+            with self.ids_path.open("a", encoding="utf-8") as f:
+                f.writelines(i + "\n" for i in new_ids)
+                f.flush()
+                os.fsync(f.fileno())
+            self.seen.update(new_ids)
+
+        self.cursor = cursor
+        self.rows_written += len(new_ids)
+        self.csv_bytes = csv_bytes
+        self.done = done
+        self._write_state()
+
+    def mark_done(self, csv_bytes: int | None = None):
+        if csv_bytes is not None:
+            self.csv_bytes = csv_bytes
+        self.done = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._write_state()
+
+    def reset(self):
+        """Forget all progress (used when a crawl is started from scratch)."""
+        for p in (self.state_path, self.ids_path):
+            if p.exists():
+                p.unlink()
+        self.__init__(self.appid, self.directory)
+
+    def truncate_csv(self, csv_path) -> bool:
+        """
+        Cut the CSV back to the size it had at the last checkpoint, removing
+        rows from a page that was written but never checkpointed.
+        Returns True if the file exists and can be appended to.
+        """
+        csv_path = Path(csv_path)
+        if not csv_path.exists() or self.csv_bytes <= 0:
+            return False
+        if csv_path.stat().st_size > self.csv_bytes:
+            with csv_path.open("r+b") as f:
+                f.truncate(self.csv_bytes)
+        return True
+
+    def _write_state(self):
+        state = {
+            "appid": self.appid,
+            "cursor": self.cursor,
+            "rows_written": self.rows_written,
+            "csv_bytes": self.csv_bytes,
+            "newest_created": self.newest_created,
+            "done": self.done,
+        }
+        tmp_path = self.state_path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
@@ -1,46 +1,47 @@
-import requests
-import time
-import json
 import csv
 import random
-from datetime import datetime, timedelta
-from pathlib import Path
+import argparse
+import asyncio
 import os
+from pathlib import Path
+
+from async_fetch import get_json, make_session
+from review_archive import ReviewArchive, archive_legacy_csv
+from review_checkpoints import ReviewCheckpoint
+from review_sink import ReviewSink
+from review_store import REVIEW_CSV_COLUMNS
+from review_sync import page_is_known
+from review_windows import export_review_windows
 
 
 GAME_CSV_PATH = "data/games_list.csv"  
 FILE_SIZE_LIMIT_BYTES = 40 * 1024 * 1024  # 40 MB per game
+STEAM_REVIEWS_URL = "https://store.steampowered.com/appreviews/{appid}"
 
 #Number of games we're going to sample from the full list to collect reviews for
 N_GAMES_SAMPLE = 5
 
+# How many games are paged at the same time. The request rate to Steam is
+# capped separately by the shared token bucket in async_fetch.
+MAX_CONCURRENT_GAMES = 4
+
 # fixed random seed so the same games are chosen every time
 RANDOM_SEED = 1236
 
 MIN_WORDS_PER_REVIEW = 5
 
 
-def init_csv(csv_path):
-    f = open(csv_path, mode="w", newline="", encoding="utf-8")
-    writer = csv.writer(f)
-    writer.writerow([
-        "recommendationid",
-        "steamid",
-        "review",
-        "timestamp_created",
-        "timestamp_updated",
-        "voted_up",
-        "weighted_vote_score",
-        "playtime_forever",
-        "playtime_at_review",
-        "last_played",
-        "raw_json",
-    ])
-    return f, writer
+def init_csv(csv_path, append=False, max_bytes=None):
+    """
+    Open the per-game CSV as a ReviewSink capped at max_bytes. With
+    append=True an existing file is continued (no second header); otherwise
+    it is truncated and a header is written.
+    """
+    return ReviewSink(csv_path, REVIEW_CSV_COLUMNS, max_bytes=max_bytes, append=append)
 
 
-def save_review_csv(writer, r, raw_json_str):
-    writer.writerow([
+def save_review_csv(writer, r, raw_ref):
+    return writer.writerow([
         r.get("recommendationid"),
         str(r.get("author", {}).get("steamid")),
         r.get("review"),
@@ -51,48 +52,76 @@ def save_review_csv(writer, r, raw_json_str):
         r.get("author", {}).get("playtime_forever"),
         r.get("author", {}).get("playtime_at_review"),
         r.get("author", {}).get("last_played"),
-        raw_json_str,
+        raw_ref,
     ])
 
 
-def fetch_all_reviews_to_csv(app_id, csv_writer, csv_file, max_bytes):
+def review_page_params(cursor):
+    return {
+        "json": 1,
+        "language": "english",
+        "filter": "recent",
+        "review_type": "all",
+        "purchase_type": "all",
+        "num_per_page": 100,
+        "cursor": cursor,
+    }
+
+
+def write_review_page(app_id, reviews, sink, unique, archive, cursor=None):
     """
-    Fetch Steam reviews for one app_id, writing directly to CSV,
-    but stop once the actual CSV file size on disk reaches max_bytes.
+    Archive one raw page of API reviews, then filter it and write the ones
+    we haven't seen yet, each with a raw_ref into the archive.
+    Stops as soon as the next row would not fit in the sink's size cap.
+    Returns the reviews that were written.
     """
-    steam_reviews_url = f"https://store.steampowered.com/appreviews/{app_id}"
-    cursor = "*"
-    total = 0
-    unique = set()
+    written = []
+    page_offset = archive.append_page(reviews, cursor)
 
-    # include header row in size
-    csv_file.flush()
-    bytes_used = os.path.getsize(csv_file.name)
+    for position, r in enumerate(reviews):
 
-    while True:
-        if bytes_used >= max_bytes:
-            print(f"[appid {app_id}] Reached size limit ~{max_bytes / (1024*1024):.1f} MB, stopping.")
-            break
+        text = (r.get("review") or "").strip()
+        if not text:
+            continue
+        word_count = len(text.split())
+        if word_count < MIN_WORDS_PER_REVIEW:
+            continue
 
-        params = {
-            "json": 1,
-            "language": "english",
-            "filter": "recent",
-            "review_type": "all",
-            "purchase_type": "all",
-            "num_per_page": 100,
-            "cursor": cursor,
-        }
-
-        resp = requests.get(steam_reviews_url, params=params, timeout=3)
-
-        if resp.status_code == 429:
-            print(f"[appid {app_id}] rate limited, sleeping 10s...")
-            time.sleep(10)
+        rec_id = r.get("recommendationid")
+        if rec_id in unique:
             continue
 
-        resp.raise_for_status()
-        data = resp.json()
+        # write the row; the sink refuses it once the size cap is reached
+        if not save_review_csv(sink, r, archive.ref(page_offset, position)):
+            print(
+                f"[appid {app_id}] Hit file size limit: "
+                f"{sink.bytes_used / (1024*1024):.2f} MB"
+            )
+            break
+        written.append(r)
+        unique.add(rec_id)
+
+    return written
+
+
+async def fetch_all_reviews_to_csv_async(session, app_id, sink, checkpoint=None, archive=None):
+    """
+    Fetch Steam reviews for one app_id into the CSV sink until the reviews
+    run out or the sink's size cap is reached; raw pages go to `archive`
+    (the appid's ReviewArchive by default). With a ReviewCheckpoint, paging
+    starts from its cursor and progress is saved after every page.
+    Requests go through the shared per-host token bucket in async_fetch,
+    so many games can run at once without going over Steam's rate limit.
+    """
+    steam_reviews_url = STEAM_REVIEWS_URL.format(appid=app_id)
+    cursor = checkpoint.cursor if checkpoint else "*"
+    total = 0
+    unique = set(checkpoint.seen) if checkpoint else set()
+    archive = archive or ReviewArchive(app_id)
+
+    while not sink.full:
+        data = await get_json(session, steam_reviews_url, review_page_params(cursor),
+                              label=f"appid {app_id}")
 
         if data.get("success") != 1:
             print(f"[appid {app_id}] request unsuccessful")
@@ -101,55 +130,73 @@ def fetch_all_reviews_to_csv(app_id, csv_writer, csv_file, max_bytes):
         reviews = data.get("reviews", [])
         if not reviews:
             print(f"[appid {app_id}] Finished fetching all reviews (no more pages).")
+            if checkpoint:
+                checkpoint.mark_done(sink.flush())
             break
 
-        for r in reviews:
-            
-            text = (r.get("review") or "").strip()
-            if not text:
-                continue
-            word_count = len(text.split())
-            if word_count < MIN_WORDS_PER_REVIEW:
-                continue
+        written = write_review_page(app_id, reviews, sink, unique, archive, cursor)
+        total += len(written)
 
-            rec_id = r.get("recommendationid")
-            if rec_id in unique:
-                continue
+        new_cursor = data.get("cursor")
+        finished = sink.full or not new_cursor or new_cursor == cursor
+        if checkpoint:
+            checkpoint.save(new_cursor or cursor, written, sink.flush(), done=finished)
+
+        if not new_cursor or new_cursor == cursor:
+            print(f"[appid {app_id}] cursor did not advance, stopping.")
+            break
+
+        cursor = new_cursor
+        print(f"[appid {app_id}] Fetched {total} reviews so far, file size ~{sink.bytes_used / (1024*1024):.2f} MB")
+
+    print(
+        f"[appid {app_id}] Done. Total unique reviews saved: {len(unique)}, "
+        f"final file size: {sink.bytes_used / (1024*1024):.2f} MB"
+    )
+    return total
 
-            raw_json_str = json.dumps(r, ensure_ascii=False)
 
-            # write the row
-            save_review_csv(csv_writer, r, raw_json_str)
-            total += 1
-            unique.add(rec_id)
+async def sync_new_reviews_async(session, app_id, sink, checkpoint, archive=None):
+    """
+    Delta sync: page from the newest review and append only reviews we don't
+    have yet, stopping at the first page made entirely of known reviews.
+    The checkpoint's resume cursor is left alone.
+    """
+    steam_reviews_url = STEAM_REVIEWS_URL.format(appid=app_id)
+    cursor = "*"
+    total = 0
+    pages = 0
+    unique = set(checkpoint.seen)
+    archive = archive or ReviewArchive(app_id)
+    # what we had before this sync; checkpoint.newest_created moves as we write
+    newest_created = checkpoint.newest_created
 
-            # flush and check actual file size
-            csv_file.flush()
-            bytes_used = os.path.getsize(csv_file.name)
+    while not sink.full:
+        data = await get_json(session, steam_reviews_url, review_page_params(cursor),
+                              label=f"appid {app_id}")
+        pages += 1
 
-            if bytes_used >= max_bytes:
-                print(
-                    f"[appid {app_id}] Hit file size limit after writing row: "
-                    f"{bytes_used / (1024*1024):.2f} MB"
-                )
-                break
+        if data.get("success") != 1:
+            print(f"[appid {app_id}] request unsuccessful")
+            break
 
-        if bytes_used >= max_bytes:
+        reviews = data.get("reviews", [])
+        if not reviews or page_is_known(reviews, unique, newest_created):
             break
 
+        written = write_review_page(app_id, reviews, sink, unique, archive, cursor)
+        total += len(written)
+        checkpoint.save(checkpoint.cursor, written, sink.flush(), done=checkpoint.done or sink.full)
+
         new_cursor = data.get("cursor")
         if not new_cursor or new_cursor == cursor:
-            print(f"[appid {app_id}] cursor did not advance, stopping.")
             break
-
         cursor = new_cursor
-        print(f"[appid {app_id}] Fetched {total} reviews so far, file size ~{bytes_used / (1024*1024):.2f} MB")
-
-    print(
-        f"[appid {app_id}] Done. Total unique reviews saved: {len(unique)}, "
-        f"final file size: {bytes_used / (1024*1024):.2f} MB"
-    )
 
+    if sink.full:
+        print(f"[appid {app_id}] CSV is at the size limit, newer reviews were not saved.")
+    print(f"[appid {app_id}] Sync done. {total} new reviews in {pages} requests.")
+    return total
 
 
 def export_first_90_days_csv(all_csv_path, out_csv_path, release_date_str):
@@ -157,54 +204,10 @@ def export_first_90_days_csv(all_csv_path, out_csv_path, release_date_str):
     Read from the per-game 'all reviews' CSV and write a CSV containing
     only reviews within 90 days of release_date_str (YYYY-MM-DD).
     If release_date_str is None/empty, skip.
+    For several windows at once use review_windows.export_review_windows,
+    which still reads the file only once.
     """
-    if not release_date_str:
-        print(f"[{all_csv_path}] No release_date provided, skipping 90-day export.")
-        return
-
-    release_dt = datetime.strptime(release_date_str, "%Y-%m-%d")
-    end_dt = release_dt + timedelta(days=90)
-    release_ts = int(release_dt.timestamp())
-    end_ts = int(end_dt.timestamp())
-
-    print(f"[{all_csv_path}] 90-day window: {release_dt} -> {end_dt}")
-
-    with open(all_csv_path, newline="", encoding="utf-8") as f_in, \
-         open(out_csv_path, "w", newline="", encoding="utf-8") as f_out:
-
-        reader = csv.DictReader(f_in)
-
-        fieldnames = [
-            "recommendationid",
-            "steamid",
-            "review",
-            "timestamp_created",
-            "timestamp_updated",
-            "voted_up",
-            "weighted_vote_score",
-            "playtime_forever",
-            "playtime_at_review",
-            "last_played",
-            "raw_json",
-        ]
-        writer = csv.DictWriter(f_out, fieldnames=fieldnames)
-        writer.writeheader()
-
-        rows_written = 0
-        for row in reader:
-            ts_str = row.get("timestamp_created")
-            if not ts_str:
-                continue
-            try:
-                ts = int(ts_str)
-            except ValueError:
-                continue
-
-            if release_ts <= ts <= end_ts:
-                writer.writerow(row)
-                rows_written += 1
-
-    print(f"[{all_csv_path}] Wrote {rows_written} reviews to 90-day CSV: {out_csv_path}")
+    export_review_windows(all_csv_path, out_csv_path, release_date_str, [("first90d", 0, 90)])
 
 
 def load_games_from_csv(path):
@@ -227,13 +230,103 @@ def load_games_from_csv(path):
     return games
 
 
+def upgrade_legacy_csv(csv_path, checkpoint, archive):
+    """
+    Before appending to a CSV written with a raw_json column, move that column
+    into the archive so old and new rows share one header.
+    """
+    if archive_legacy_csv(csv_path, archive):
+        print(f"[{csv_path}] Moved raw_json into {archive.path}")
+        if checkpoint.exists():
+            checkpoint.save(checkpoint.cursor, [], os.path.getsize(csv_path), done=checkpoint.done)
+
+
+async def collect_game(session, game, max_bytes, resume=False, sync=False):
+    appid = game["appid"]
+    slug = game["slug"]
+    title = game["title"]
+    release_date = game["release_date"]
+
+    csv_path_all = f"reviews_data/{slug}_reviews.csv"
+    csv_path_90 = f"reviews_data/{slug}_reviews_first90d.csv"
+
+    print(f"\n===== Starting {title} (appid {appid}) =====")
+    print(f"CSV (all):     {csv_path_all}")
+    print(f"CSV (90 days): {csv_path_90}")
+
+    checkpoint = ReviewCheckpoint.load(appid)
+    archive = ReviewArchive(appid)
+    dropped = archive.repair()
+    if dropped:
+        print(f"[appid {appid}] Dropped {dropped} bytes of a half-written page from {archive.path}")
+
+    if sync and os.path.exists(csv_path_all):
+        if not checkpoint.exists():
+            checkpoint = ReviewCheckpoint.from_csv(appid, csv_path_all)
+        checkpoint.truncate_csv(csv_path_all)
+        upgrade_legacy_csv(csv_path_all, checkpoint, archive)
+        with init_csv(csv_path_all, append=True, max_bytes=max_bytes) as sink:
+            await sync_new_reviews_async(session, appid, sink, checkpoint, archive)
+    elif resume and checkpoint.done:
+        print(f"[appid {appid}] Already finished in a previous run, skipping fetch.")
+    else:
+        append = resume and checkpoint.truncate_csv(csv_path_all)
+        if append:
+            print(f"[appid {appid}] Resuming after {checkpoint.rows_written} reviews")
+            upgrade_legacy_csv(csv_path_all, checkpoint, archive)
+        else:
+            checkpoint.reset()
+
+        with init_csv(csv_path_all, append=append, max_bytes=max_bytes) as sink:
+            await fetch_all_reviews_to_csv_async(session, appid, sink, checkpoint, archive)
+
+    # Now create the truncated 90-day CSV from the "all reviews" CSV
+    await asyncio.to_thread(export_first_90_days_csv, csv_path_all, csv_path_90, release_date)
+
+    print(f"===== Finished {title} =====\n")
+
+
+async def collect_games(games, max_bytes=FILE_SIZE_LIMIT_BYTES, concurrency=MAX_CONCURRENT_GAMES,
+                        resume=False, sync=False):
+    """
+    Collect reviews for all games, `concurrency` games at a time.
+    A failure in one game is reported and doesn't stop the others.
+    With resume=True each game continues from its last saved checkpoint.
+    With sync=True games we already have only get their new reviews appended.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run(session, game):
+        async with sem:
+            await collect_game(session, game, max_bytes, resume, sync)
+
+    async with make_session(limit_per_host=concurrency) as session:
+        results = await asyncio.gather(*(run(session, g) for g in games), return_exceptions=True)
+
+    failed = [(g, r) for g, r in zip(games, results) if isinstance(r, Exception)]
+    for game, err in failed:
+        print(f"[appid {game['appid']}] FAILED: {err}")
+    return failed
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Collect Steam reviews for a sample of games.")
+    parser.add_argument("--n-games", type=int, default=N_GAMES_SAMPLE,
+                        help="number of games to sample (0 = every game in the list)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_GAMES,
+                        help="number of games paged at the same time")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue each game from its last checkpoint instead of starting over")
+    parser.add_argument("--sync", action="store_true",
+                        help="only fetch reviews newer than the ones already saved")
+    args = parser.parse_args()
+
     games = load_games_from_csv(GAME_CSV_PATH)
     print(f"Loaded {len(games)} games from {GAME_CSV_PATH}")
 
     random.seed(RANDOM_SEED)
     random.shuffle(games)
-    games_sample = games[:N_GAMES_SAMPLE]  # take first N after shuffling
+    games_sample = games[:args.n_games] if args.n_games else games  # take first N after shuffling
 
     print(f"Sampling {len(games_sample)} games (seed={RANDOM_SEED}):")
     for g in games_sample:
@@ -241,29 +334,7 @@ def main():
 
     Path("reviews_data").mkdir(exist_ok=True)
 
-    for game in games_sample:
-        appid = game["appid"]
-        slug = game["slug"]
-        title = game["title"]
-        release_date = game["release_date"]
-
-        csv_path_all = f"reviews_data/{slug}_reviews.csv"
-        csv_path_90 = f"reviews_data/{slug}_reviews_first90d.csv"
-
-        print(f"\n===== Starting {title} (appid {appid}) =====")
-        print(f"CSV (all):     {csv_path_all}")
-        print(f"CSV (90 days): {csv_path_90}")
-
-        csv_file, csv_writer = init_csv(csv_path_all)
-        try:
-            fetch_all_reviews_to_csv(appid, csv_writer, csv_file, FILE_SIZE_LIMIT_BYTES)
-        finally:
-            csv_file.close()
-
-        # Now create the truncated 90-day CSV from the "all reviews" CSV
-        export_first_90_days_csv(csv_path_all, csv_path_90, release_date)
-
-        print(f"===== Finished {title} =====\n")
+    asyncio.run(collect_games(games_sample, FILE_SIZE_LIMIT_BYTES, args.concurrency, args.resume, args.sync))
 
 
 if __name__ == "__main__":
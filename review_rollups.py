@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from review_store import REVIEW_DB_PATH, open_review_db_readonly
+from sentiment_scoring import SCORER_VERSION, make_scoring_pool, open_cache, score_texts_cached
+from vader_batch import require_lexicon
+
+
+REVIEWS_DIR = Path("reviews_data")
+GAMES_LIST_PATH = Path("data/games_list.csv")
+ROLLUPS_CSV = Path("data/review_daily_rollups.csv")
+ROLLUP_SOURCES_JSON = Path("data/review_daily_rollups.json")  # what each game's rollup was built from
+SUMMARY_CSV = Path("data/launch_review_summary.csv")
+
+ROLLUP_DAYS = 90  # days since release kept, release day = day 1 (as in watch_dogs_analysis.ipynb)
+
+# (name, first day, last day), both included
+SUMMARY_WINDOWS = [
+    ("1_7", 1, 7),
+    ("8_30", 8, 30),
+    ("1_30", 1, 30),
+]
+
+ROLLUP_FIELDS = ["recommendationid", "review", "timestamp_created", "voted_up", "playtime_at_review"]
+ROLLUP_COLUMNS = ["appid", "slug", "days_since_release", "reviews", "positive_rate", "mean_compound",
+                  "median_playtime_at_review", "mean_review_words"]
+
+
+def review_csvs(game, reviews_dir=REVIEWS_DIR):
+    """The game's reviews CSV: every review if we have them, else the 90-day export."""
+    for name in (f"{game['slug']}_reviews.csv", f"{game['slug']}_reviews_first90d.csv"):
+        path = Path(reviews_dir) / name
+        if path.exists():
+            return [path]
+    return []
+
+
+def release_day(release_date_str):
+    """Release date as days since the epoch (UTC, like pd.to_datetime(timestamp, unit="s"))."""
+    return int(pd.Timestamp(release_date_str).value // (86_400 * 10**9))
+
+
+def day_bounds(game):
+    start = release_day(game["release_date"]) * 86_400
+    return start, start + ROLLUP_DAYS * 86_400 - 1
+
+
+def source_fingerprint(game, csv_paths, conn):
+    """Everything a game's rollup depends on; the cached rollup is reused while this is unchanged."""
+    files = [[p.name, p.stat().st_size, p.stat().st_mtime_ns] for p in csv_paths]
+    db = None
+    if conn is not None:
+        start, end = day_bounds(game)
+        db = list(conn.execute("""
+            SELECT COUNT(*), MAX(timestamp_updated) FROM reviews
+            WHERE appid = ? AND timestamp_created BETWEEN ? AND ? AND language = 'english'
+        """, (game["appid"], start, end)).fetchone())
+    return {"release_date": game["release_date"], "scorer_version": SCORER_VERSION, "files": files, "db": db}
+
+
+def to_voted_up(values: pd.Series) -> pd.Series:
+    """voted_up as 0/1; CSVs written straight from the API have True/False."""
+    return values.astype(str).str.strip().str.lower().map({"1": 1, "0": 0, "true": 1, "false": 0})
+
+
+def load_launch_reviews(game, csv_paths, conn) -> pd.DataFrame:
+    """The game's reviews from its first ROLLUP_DAYS days, from its CSV and the shared review DB."""
+    start, end = day_bounds(game)
+    frames = []
+    for path in csv_paths:
+        for chunk in pd.read_csv(path, usecols=lambda c: c in ROLLUP_FIELDS, dtype={"recommendationid": str},
+                                 chunksize=50_000):
+            ts = pd.to_numeric(chunk["timestamp_created"], errors="coerce")
+            frames.append(chunk[ts.between(start, end)])
+    if conn is not None:
+        frames.append(pd.read_sql_query(f"""
+            SELECT {", ".join(ROLLUP_FIELDS)}
+            FROM reviews
+            WHERE appid = ? AND timestamp_created BETWEEN ? AND ? AND language = 'english'
+        """, conn, params=(game["appid"], start, end), dtype={"recommendationid": str}))
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=ROLLUP_FIELDS)
+    return pd.concat(frames, ignore_index=True).drop_duplicates("recommendationid")
+
+
+def review_rows(game, df, cache, pool) -> pd.DataFrame:
+    """One game's reviews reduced to the numbers the rollup needs (the text is dropped once scored)."""
+    text = df["review"].fillna("").astype(str)
+    ts = pd.to_numeric(df["timestamp_created"], errors="coerce")
+    return pd.DataFrame({
+        "appid": game["appid"],
+        "days_since_release": ts // 86_400 - release_day(game["release_date"]) + 1,
+        "voted_up": to_voted_up(df["voted_up"]),
+        "compound": score_texts_cached(df["recommendationid"], text, cache, pool),
+        "playtime_at_review": pd.to_numeric(df["playtime_at_review"], errors="coerce"),
+        "review_words": text.str.split().str.len(),
+    })
+
+
+def rollup(rows: pd.DataFrame, games) -> pd.DataFrame:
+    """Per (appid, day) table for every game in `rows` with one groupby."""
+    grouped = rows.groupby(["appid", "days_since_release"], sort=True).agg(
+        reviews=("voted_up", "size"),
+        positive_rate=("voted_up", "mean"),
+        mean_compound=("compound", "mean"),
+        median_playtime_at_review=("playtime_at_review", "median"),
+        mean_review_words=("review_words", "mean"),
+    ).reset_index()
+    grouped["slug"] = grouped["appid"].map({g["appid"]: g["slug"] for g in games})
+    return grouped[ROLLUP_COLUMNS]
+
+
+def load_cached_rollups():
+    if not ROLLUPS_CSV.exists() or not ROLLUP_SOURCES_JSON.exists():
+        return pd.DataFrame(columns=ROLLUP_COLUMNS), {}
+    with ROLLUP_SOURCES_JSON.open(encoding="utf-8") as f:
+        sources = json.load(f)
+    return pd.read_csv(ROLLUPS_CSV), sources
+
+
+def write_atomic(path: Path, write):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_rollups(rollups: pd.DataFrame, sources: dict):
+    # Sources are written last: if we stop in between, the games that were
+    # just rebuilt still have their old fingerprints and are rebuilt next run
+    write_atomic(ROLLUPS_CSV, lambda p: rollups.to_csv(p, index=False))
+
+    def write_sources(p):
+        with p.open("w", encoding="utf-8") as f:
+            json.dump(sources, f, indent=1)
+    write_atomic(ROLLUP_SOURCES_JSON, write_sources)
+
+
+def build_rollups(games, reviews_dir=REVIEWS_DIR, db_path=REVIEW_DB_PATH, workers=1, rebuild=False):
+    """
+    Daily launch rollups for every game with a release date, from the cache
+    on disk where a game's reviews haven't changed since it was built.
+    Only new or changed games are loaded and scored (scores come from the
+    sentiment cache), then they all go through a single groupby.
+    """
+    games = [g for g in games if g.get("release_date")]
+    cached, sources = (pd.DataFrame(columns=ROLLUP_COLUMNS), {}) if rebuild else load_cached_rollups()
+
+    conn = open_review_db_readonly(db_path) if Path(db_path).exists() else None
+    try:
+        stale = []
+        new_sources = {}
+        for game in games:
+            csv_paths = review_csvs(game, reviews_dir)
+            fingerprint = source_fingerprint(game, csv_paths, conn)
+            new_sources[str(game["appid"])] = fingerprint
+            if sources.get(str(game["appid"])) != fingerprint:
+                stale.append((game, csv_paths))
+
+        print(f"{len(games) - len(stale)} game(s) unchanged, {len(stale)} to roll up")
+        frames = []
+        if stale:
+            pool = make_scoring_pool(workers) if workers > 1 else None
+            cache = open_cache()
+            try:
+                for game, csv_paths in stale:
+                    df = load_launch_reviews(game, csv_paths, conn)
+                    print(f"  [{game['slug']}] {len(df)} reviews in the first {ROLLUP_DAYS} days")
+                    if len(df):
+                        frames.append(review_rows(game, df, cache, pool))
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+                cache.close()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    # Cached days of unchanged games, plus the new rollup of the rest
+    fresh = {g["appid"] for g in games} - {g["appid"] for g, _ in stale}
+    rollups = cached[cached["appid"].isin(fresh)]
+    if frames:
+        rollups = pd.concat([rollups, rollup(pd.concat(frames, ignore_index=True), games)], ignore_index=True)
+    rollups = rollups.sort_values(["appid", "days_since_release"], kind="stable").reset_index(drop=True)
+
+    if sources != new_sources:
+        save_rollups(rollups, new_sources)
+    return rollups
+
+
+def window_summary(rollups: pd.DataFrame, games=None, windows=SUMMARY_WINDOWS) -> pd.DataFrame:
+    """
+    reviews / pos_rate / avg_sentiment / avg_review_len per window and game,
+    like summarize_early_reviews in watch_dogs_analysis.ipynb, computed from
+    the daily rollups (means weighted by each day's review count).
+    Games given in `games` that have no reviews get a row of zero counts.
+    """
+    r = rollups.assign(
+        positive=rollups["positive_rate"] * rollups["reviews"],
+        compound_sum=rollups["mean_compound"] * rollups["reviews"],
+        words_sum=rollups["mean_review_words"] * rollups["reviews"],
+    )
+    summary = r.groupby("appid")[["slug"]].first()
+    if games is not None:
+        summary = pd.DataFrame({"slug": {g["appid"]: g["slug"] for g in games if g.get("release_date")}})
+        summary.index.name = "appid"
+    for name, first, last in windows:
+        w = r[r["days_since_release"].between(first, last)].groupby("appid")[
+            ["reviews", "positive", "compound_sum", "words_sum"]].sum()
+        w = w.reindex(summary.index, fill_value=0)
+        n = w["reviews"].replace(0, np.nan)
+        summary[f"reviews_{name}"] = w["reviews"].astype(int)
+        summary[f"pos_rate_{name}"] = w["positive"] / n
+        summary[f"avg_sentiment_{name}"] = w["compound_sum"] / n
+        summary[f"avg_review_len_{name}"] = w["words_sum"] / n
+    return summary.reset_index()
+
+
+def main():
+    from review_collection import load_games_from_csv
+
+    parser = argparse.ArgumentParser(description="Per-day launch review rollups and 1-7 / 8-30 / 1-30 day summaries.")
+    parser.add_argument("--games-csv", type=Path, default=GAMES_LIST_PATH)
+    parser.add_argument("--reviews-dir", type=Path, default=REVIEWS_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="scoring processes for new reviews")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the cached rollups")
+    args = parser.parse_args()
+
+    require_lexicon()
+
+    games = load_games_from_csv(args.games_csv)
+    rollups = build_rollups(games, args.reviews_dir, workers=args.workers, rebuild=args.rebuild)
+    summary = window_summary(rollups, games)
+
+    write_atomic(SUMMARY_CSV, lambda p: summary.to_csv(p, index=False))
+    print(f"\nWrote {len(rollups)} daily rollup rows to {ROLLUPS_CSV}")
+    print(f"Wrote launch window summary for {len(summary)} game(s) to {SUMMARY_CSV}")
+
+
+if __name__ == "__main__":
+    main()
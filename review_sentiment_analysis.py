@@ -1,18 +1,41 @@
 import csv
+import json
 import os
+import argparse
 from pathlib import Path
 
-import nltk
 import pandas as pd
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 
-# Make sure VADER lexicon is available
-nltk.download("vader_lexicon", quiet=True)
+from review_archive import load_raw_review
+from sentiment_scoring import DEFAULT_CHUNK_SIZE, make_scoring_pool, open_cache, score_texts_cached
+from sentiment_stats import GameStats, SentimentStatsStore
+from vader_batch import require_lexicon
 
 # Folders / files
 REVIEWS_DIR = Path("reviews_data")
 OUTPUT_CSV = Path("data/combined_reviews_with_sentiment.csv")
 GLOB_PATTERN = "*_reviews.csv"
+STREAM_CHUNK_ROWS = 10_000  # rows held in memory at a time
+
+# Columns written to OUTPUT_CSV, in this order (those no input file has are left out).
+# raw_json is only added with --raw-json: it is most of the bytes and nothing downstream reads it.
+# Rows that only have a raw_ref get it filled in from the page archive.
+OUTPUT_COLUMNS = [
+    "game_slug",
+    "recommendationid",
+    "steamid",
+    "review",
+    "playtime_forever",
+    "playtime_hours",
+    "playtime_bucket",
+    "timestamp_created",
+    "timestamp_updated",
+    "voted_up",
+    "weighted_vote_score",
+    "last_played",
+    "sentiment_compound",
+    "raw_ref",
+]
 
 # Playtime buckets (in hours)
 def bucket_playtime(hours: float | None) -> str | None:
@@ -31,49 +54,57 @@ def bucket_playtime(hours: float | None) -> str | None:
         return "high"
 
 
-def main():
-    sid = SentimentIntensityAnalyzer()
-
-    all_dfs = []
+def game_slug_for(csv_path: Path) -> str:
+    stem = csv_path.stem
+    if stem.endswith("_reviews_first90d"):
+        return stem.removesuffix("_reviews_first90d")
+    elif stem.endswith("_reviews"):
+        return stem.removesuffix("_reviews")
+    return stem
 
-    files = sorted(REVIEWS_DIR.glob(GLOB_PATTERN))
-    if not files:
-        print(f"No CSV files found in {REVIEWS_DIR} matching pattern {GLOB_PATTERN}")
-        return
-
-    print(f"Found {len(files)} files to process:")
-    for p in files:
-        print("  -", p.name)
 
+def output_columns(files, raw_json: bool = False) -> list[str]:
+    """OUTPUT_COLUMNS that at least one of the files can fill (raw_json only if asked for)."""
+    present = {"game_slug", "playtime_hours", "playtime_bucket", "sentiment_compound"}
     for csv_path in files:
-        print(f"\nProcessing {csv_path} ...")
-
-        # Derive game_slug from filename,
-        stem = csv_path.stem
-        if stem.endswith("_reviews_first90d"):
-            game_slug = stem.removesuffix("_reviews_first90d")
-        elif stem.endswith("_reviews"):
-            game_slug = stem.removesuffix("_reviews")
-        else:
-            game_slug = stem
-
-        df = pd.read_csv(csv_path)
-
-        # Ensure we have the columns we expect
-        if "review" not in df.columns:
-            print(f"  [WARN] 'review' column missing in {csv_path}, skipping.")
-            continue
+        present.update(pd.read_csv(csv_path, nrows=0).columns)
+    if "raw_ref" in present:
+        present.add("raw_json")
+    wanted = OUTPUT_COLUMNS + (["raw_json"] if raw_json else [])
+    return [c for c in wanted if c in present]
+
+
+def process_file(csv_path: Path, columns, pool=None, chunk_size: int = DEFAULT_CHUNK_SIZE, cache=None,
+                 chunk_rows: int = STREAM_CHUNK_ROWS):
+    """
+    Yield one per-game reviews CSV in frames of up to `chunk_rows` rows,
+    with playtime, bucket, sentiment and game_slug columns added and
+    reindexed to `columns`. Only the columns needed for the output are read,
+    and cells are passed through as the text they were in the CSV.
+    """
+    print(f"\nProcessing {csv_path} ...")
+    game_slug = game_slug_for(csv_path)
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    # Ensure we have the columns we expect
+    if "review" not in header:
+        print(f"  [WARN] 'review' column missing in {csv_path}, skipping.")
+        return
 
+    wanted = set(columns)
+    reader = pd.read_csv(csv_path, usecols=lambda c: c in wanted, dtype=str, keep_default_na=False,
+                         chunksize=chunk_rows)
+    for df in reader:
         # Compute playtime in hours (Steam gives minutes)
         if "playtime_forever" in df.columns:
-            df["playtime_hours"] = df["playtime_forever"] / 60.0
+            df["playtime_hours"] = pd.to_numeric(df["playtime_forever"], errors="coerce") / 60.0
         else:
             df["playtime_hours"] = None
 
-        # VADER sentiment on the review text
-        # Fill NaN with empty strings to avoid crashes
-        texts = df["review"].astype(str).fillna("")
-        df["sentiment_compound"] = texts.apply(lambda t: sid.polarity_scores(t)["compound"]) 
+        # VADER sentiment on the review text; cached scores are reused and
+        # only new or edited reviews are sent to the pool
+        ids = df["recommendationid"] if "recommendationid" in df.columns else df.index
+        df["sentiment_compound"] = score_texts_cached(ids, df["review"], cache, pool, chunk_size)
 
         # Playtime bucket
         df["playtime_bucket"] = df["playtime_hours"].apply(bucket_playtime)
@@ -81,35 +112,78 @@ def main():
         # Add game identifier
         df["game_slug"] = game_slug
 
-        all_dfs.append(df)
-
-    # Combine everything
-    combined = pd.concat(all_dfs, ignore_index=True)
-
-    # Optional: keep only columns you care about
-    cols = [
-        "game_slug",
-        "recommendationid",
-        "steamid",
-        "review",
-        "playtime_forever",
-        "playtime_hours",
-        "playtime_bucket",
-        "timestamp_created",
-        "timestamp_updated",
-        "voted_up",
-        "weighted_vote_score",
-        "last_played",
-        "sentiment_compound",
-        "raw_json",
-    ]
-    # Filter to existing columns (some might not be present in all files)
-    cols = [c for c in cols if c in combined.columns]
+        if "raw_json" in wanted and "raw_ref" in df.columns:
+            # DB window exports carry raw_json only for the rows that have no raw_ref
+            have = df["raw_json"] if "raw_json" in df.columns else [""] * len(df)
+            df["raw_json"] = [raw or (json.dumps(load_raw_review(ref), ensure_ascii=False) if ref else "")
+                              for raw, ref in zip(have, df["raw_ref"])]
+
+        yield df.reindex(columns=columns)
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every collected review with VADER and combine them.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of scoring processes (1 = score in this process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="reviews per task sent to a scoring process")
+    parser.add_argument("--chunk-rows", type=int, default=STREAM_CHUNK_ROWS,
+                        help="rows read, scored and written at a time")
+    parser.add_argument("--raw-json", action="store_true",
+                        help="carry the raw_json column through to the output")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="rescore everything instead of reusing cached scores")
+    args = parser.parse_args()
+
+    # Fail now, not in every worker, if the VADER lexicon was never downloaded
+    require_lexicon()
+
+    files = sorted(REVIEWS_DIR.glob(GLOB_PATTERN))
+    if not files:
+        print(f"No CSV files found in {REVIEWS_DIR} matching pattern {GLOB_PATTERN}")
+        return
+
+    print(f"Found {len(files)} files to process:")
+    for p in files:
+        print("  -", p.name)
+
+    columns = output_columns(files, args.raw_json)
+
+    # Each chunk is appended to a temp file as soon as it is scored, so memory
+    # stays at one chunk no matter how many games there are; the real output
+    # only appears once everything has been written
     OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    combined.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_MINIMAL)
+    tmp_path = OUTPUT_CSV.with_suffix(OUTPUT_CSV.suffix + ".tmp")
+    total_rows = 0
+
+    pool = make_scoring_pool(args.workers) if args.workers > 1 else None
+    cache = None if args.no_cache else open_cache()
+    # Per-game sentiment-by-playtime aggregates, kept up to date as a side
+    # effect of scoring (read back with sentiment_stats.py)
+    stats_store = SentimentStatsStore()
+    try:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            f.write(",".join(columns) + "\n")
+            for csv_path in files:
+                stats = GameStats()
+                for chunk in process_file(csv_path, columns, pool, args.chunk_size, cache, args.chunk_rows):
+                    chunk.to_csv(f, header=False, index=False, quoting=csv.QUOTE_MINIMAL)
+                    stats.add_frame(chunk)
+                    total_rows += len(chunk)
+                stats_store.save_game(game_slug_for(csv_path), csv_path, stats)
+        os.replace(tmp_path, OUTPUT_CSV)
+        stats_store.keep_only([game_slug_for(p) for p in files])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if cache is not None:
+            cache.close()
+        stats_store.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+
     print(f"\nWrote combined dataset with sentiment to: {OUTPUT_CSV}")
-    print(f"Total rows: {len(combined)}")
+    print(f"Total rows: {total_rows}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+import csv
+import io
+import os
+
+
+SINK_BUFFER_BYTES = 1024 * 1024  # 1 MB write buffer
+
+
+class ReviewSink:
+    """
+    CSV writer that keeps its own count of the bytes it has written, so the
+    per-game size cap can be enforced without a flush + stat for every row.
+
+    Rows are csv-formatted into memory, encoded to UTF-8 and measured before
+    they are written through a large buffer. A row that would push the file
+    past `max_bytes` is not written and the sink is marked full, so the file
+    never goes over the cap.
+
+    Has a `writerow` method, so it can be passed anywhere a csv.writer is used.
+    """
+
+    def __init__(self, path, header, max_bytes: int | None = None, append: bool = False,
+                 buffer_size: int = SINK_BUFFER_BYTES):
+        self.path = str(path)
+        self.name = self.path
+        self.max_bytes = max_bytes
+        self.full = False
+        self.rows_written = 0
+
+        append = append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, "ab" if append else "wb", buffering=buffer_size)
+        self.bytes_used = self._file.tell() if append else 0
+
+        self._row_buf = io.StringIO()
+        self._row_writer = csv.writer(self._row_buf)
+
+        if not append:
+            self._write_encoded(self._encode(header))
+
+    def _encode(self, row) -> bytes:
+        self._row_buf.seek(0)
+        self._row_buf.truncate()
+        self._row_writer.writerow(row)
+        return self._row_buf.getvalue().encode("utf-8")
+
+    def _write_encoded(self, data: bytes):
+        self._file.write(data)
+        self.bytes_used += len(data)
+
+    def fits(self, n_bytes: int) -> bool:
+        return self.max_bytes is None or self.bytes_used + n_bytes <= self.max_bytes
+
+    def writerow(self, row) -> bool:
+        """Write one row. Returns False (and marks the sink full) if it would go over max_bytes."""
+        if self.full:
+            return False
+        data = self._encode(row)
+        if not self.fits(len(data)):
+            self.full = True
+            return False
+        self._write_encoded(data)
+        self.rows_written += 1
+        return True
+
+    def flush(self) -> int:
+        """Push buffered rows to the OS and return the file size in bytes."""
+        self._file.flush()
+        return self.bytes_used
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,162 @@
+import asyncio
+from pathlib import Path
+
+import pandas as pd
+
+from async_fetch import get_json
+from review_store import REVIEW_DB_PATH, open_review_db_readonly
+from review_sync import new_reviews_only, page_is_known
+
+
+REVIEWS_DIR = Path("reviews_data")
+STEAM_REVIEWS_URL = "https://store.steampowered.com/appreviews/{appid}"
+
+# The only columns the sentiment scripts need; raw_json is never loaded
+REVIEW_FIELDS = ["recommendationid", "review", "timestamp_created", "playtime_forever"]
+
+# Local reviews are handed out in chunks this size so they can be pipelined
+LOCAL_CHUNK_ROWS = 500
+
+
+def filter_reviews(df: pd.DataFrame, min_playtime_minutes: int, min_words: int) -> pd.DataFrame:
+    """
+    Keep reviews with a non-empty text of at least `min_words` words from
+    players with at least `min_playtime_minutes` played. Works on a whole
+    frame at once; `review` comes back stripped.
+    """
+    text = df["review"].fillna("").astype(str).str.strip()
+    playtime = pd.to_numeric(df["playtime_forever"], errors="coerce")
+    mask = (
+        (text.str.len() > 0)
+        & (text.str.split().str.len() >= min_words)
+        & (playtime >= min_playtime_minutes)
+    )
+    out = df.loc[mask].copy()
+    out["review"] = text[mask]
+    return out
+
+
+def api_reviews_to_frame(reviews) -> pd.DataFrame:
+    return pd.DataFrame.from_records([{
+        "recommendationid": str(r.get("recommendationid")),
+        "review": r.get("review"),
+        "timestamp_created": r.get("timestamp_created"),
+        "playtime_forever": (r.get("author", {}) or {}).get("playtime_forever"),
+    } for r in reviews], columns=REVIEW_FIELDS)
+
+
+def load_local_reviews(appid: int, slug: str, reviews_dir: Path = REVIEWS_DIR,
+                       db_path: Path = REVIEW_DB_PATH) -> pd.DataFrame:
+    """
+    All English reviews we already have for a game, newest first, from
+    reviews_data/{slug}_reviews.csv and the shared review DB (if they exist).
+    """
+    frames = []
+
+    csv_path = Path(reviews_dir) / f"{slug}_reviews.csv"
+    if csv_path.exists():
+        frames.append(pd.read_csv(csv_path, usecols=REVIEW_FIELDS, dtype={"recommendationid": str}))
+
+    if Path(db_path).exists():
+        # Read-only: this runs in worker threads and must not create or migrate the DB
+        conn = open_review_db_readonly(db_path)
+        try:
+            frames.append(pd.read_sql_query(f"""
+                SELECT {", ".join(REVIEW_FIELDS)}
+                FROM reviews
+                WHERE appid = ? AND language = 'english'
+            """, conn, params=(int(appid),), dtype={"recommendationid": str}))
+        finally:
+            conn.close()
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=REVIEW_FIELDS)
+
+    df = pd.concat(frames, ignore_index=True).drop_duplicates("recommendationid")
+    return df.sort_values("timestamp_created", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def review_page_params(cursor, language="english"):
+    return {
+        "json": 1,
+        "language": language,
+        "filter": "recent",
+        "review_type": "all",
+        "purchase_type": "all",
+        "num_per_page": 100,
+        "cursor": cursor,
+    }
+
+
+async def iter_steam_review_pages_async(session, appid: int, language: str = "english",
+                                        known_ids=frozenset(), newest_created: int = 0):
+    """
+    Yield pages of API reviews (newest first) as DataFrames, rate limited
+    through async_fetch. Reviews we already have (review_sync.is_known_review)
+    are left out, and paging stops at the first page made only of them.
+    Raises ValueError if a page isn't shaped like a reviews response.
+    """
+    url = STEAM_REVIEWS_URL.format(appid=appid)
+    cursor = "*"
+
+    while True:
+        data = await get_json(session, url, review_page_params(cursor, language), label=f"appid {appid}")
+        if not isinstance(data, dict):
+            raise ValueError(f"unexpected reviews payload: {str(data)[:100]}")
+
+        if data.get("success") != 1:
+            print(f"[appid {appid}] request unsuccessful, stopping.")
+            return
+
+        reviews = data.get("reviews", [])
+        if not isinstance(reviews, list) or not all(isinstance(r, dict) for r in reviews):
+            raise ValueError(f"unexpected reviews payload: {str(reviews)[:100]}")
+        if not reviews or page_is_known(reviews, known_ids, newest_created):
+            return
+
+        yield api_reviews_to_frame(new_reviews_only(reviews, known_ids, newest_created))
+
+        new_cursor = data.get("cursor")
+        if not new_cursor or new_cursor == cursor:
+            return
+        cursor = new_cursor
+
+
+class ReviewSource:
+    """
+    Serves the newest reviews for a game from the local corpus
+    (reviews_data CSVs and the shared review DB). Steam is only asked
+    once the caller has used up the local reviews, and then only for
+    the reviews newer than the local ones (or all of them for a game we
+    have none of).
+
+    With allow_network=False nothing ever leaves the machine.
+    """
+
+    def __init__(self, reviews_dir: Path = REVIEWS_DIR, db_path: Path = REVIEW_DB_PATH,
+                 allow_network: bool = True):
+        self.reviews_dir = Path(reviews_dir)
+        self.db_path = Path(db_path)
+        self.allow_network = allow_network
+
+    async def iter_pages_async(self, session, appid: int, slug: str, chunk_rows: int = LOCAL_CHUNK_ROWS):
+        """
+        Unfiltered review frames, newest first: the local corpus in chunks,
+        then pages from Steam of the reviews posted since. The generator is
+        lazy, so the network is only touched if the caller keeps asking
+        after the local data runs out.
+        """
+        local = await asyncio.to_thread(load_local_reviews, appid, slug, self.reviews_dir, self.db_path)
+        for start in range(0, len(local), chunk_rows):
+            yield local.iloc[start:start + chunk_rows]
+
+        if not self.allow_network:
+            return
+
+        known = set(local["recommendationid"].astype(str))
+        created = pd.to_numeric(local["timestamp_created"], errors="coerce").max()
+        newest_created = int(created) if pd.notna(created) else 0
+        async for page in iter_steam_review_pages_async(session, appid, known_ids=known,
+                                                        newest_created=newest_created):
+            yield page
@@ -0,0 +1,216 @@
+import csv
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+# One database for every game, next to the other data files
+REVIEW_DB_PATH = Path(__file__).resolve().parent / "data" / "reviews.db"
+
+# Columns of the per-game review CSVs. raw_ref points into the page archive
+# (review_archive) where the review's raw JSON lives; older CSVs have a
+# raw_json column in its place.
+REVIEW_CSV_COLUMNS = [
+    "recommendationid",
+    "steamid",
+    "review",
+    "timestamp_created",
+    "timestamp_updated",
+    "voted_up",
+    "weighted_vote_score",
+    "playtime_forever",
+    "playtime_at_review",
+    "last_played",
+    "raw_ref",
+]
+
+# Columns of the old per-game {slug}_reviews.db files
+LEGACY_REVIEW_COLUMNS = REVIEW_CSV_COLUMNS[:-1] + ["raw_json"]
+
+# raw_json is only filled for reviews that were saved without an archive
+REVIEW_COLUMNS = LEGACY_REVIEW_COLUMNS + ["language", "raw_ref"]
+
+
+def init_review_db(db_path=REVIEW_DB_PATH):
+    """
+    Open (and create if needed) the shared review DB.
+    WAL mode lets readers run while a crawl is writing.
+    """
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reviews (
+            appid INTEGER NOT NULL,
+            recommendationid TEXT NOT NULL,
+            steamid TEXT,
+            review TEXT,
+            timestamp_created INTEGER,
+            timestamp_updated INTEGER,
+            voted_up INTEGER,
+            weighted_vote_score REAL,
+            playtime_forever INTEGER,
+            playtime_at_review INTEGER,
+            last_played INTEGER,
+            raw_json TEXT,
+            language TEXT,
+            raw_ref TEXT,
+            PRIMARY KEY (appid, recommendationid)
+        )
+    """)
+    _add_archive_columns(conn)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_appid_created
+        ON reviews (appid, timestamp_created)
+    """)
+    conn.commit()
+    return conn
+
+
+def open_review_db_readonly(db_path):
+    """
+    Open the shared review DB read-only, for readers that run next to the
+    collectors: nothing is created or migrated. A DB from before the archive
+    columns gets `language` from raw_json through a temporary view instead.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    if "language" not in {row[1] for row in conn.execute("PRAGMA table_info(reviews)")}:
+        conn.execute("""
+            CREATE TEMP VIEW reviews AS
+            SELECT *, json_extract(raw_json, '$.language') AS language FROM main.reviews
+        """)
+    return conn
+
+
+def _add_archive_columns(conn):
+    """Add language and raw_ref to a DB created before the page archive, filling language from raw_json."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(reviews)")}
+    if "language" in existing:
+        return
+    with conn:
+        conn.execute("ALTER TABLE reviews ADD COLUMN language TEXT")
+        conn.execute("ALTER TABLE reviews ADD COLUMN raw_ref TEXT")
+        conn.execute("UPDATE reviews SET language = json_extract(raw_json, '$.language') WHERE raw_json IS NOT NULL")
+
+
+def review_row(appid, r, raw_ref=None):
+    """DB row for one API review. With a raw_ref the JSON is already archived and isn't stored again."""
+    author = r.get("author", {}) or {}
+    return (
+        int(appid),
+        str(r.get("recommendationid")),
+        str(author.get("steamid")),
+        r.get("review"),
+        r.get("timestamp_created"),
+        r.get("timestamp_updated"),
+        1 if r.get("voted_up") else 0,
+        float(r.get("weighted_vote_score") or 0.0),
+        author.get("playtime_forever"),
+        author.get("playtime_at_review"),
+        author.get("last_played"),
+        None if raw_ref else json.dumps(r, ensure_ascii=False),
+        r.get("language"),
+        raw_ref,
+    )
+
+
+def save_reviews(conn, appid, reviews, raw_refs=None):
+    """
+    Insert (or replace) a whole page of API reviews in one transaction.
+    `raw_refs` (one per review) point at the archived JSON; without them
+    the JSON goes in the raw_json column.
+    """
+    raw_refs = raw_refs or [None] * len(reviews)
+    rows = [review_row(appid, r, ref) for r, ref in zip(reviews, raw_refs)]
+    if not rows:
+        return 0
+    with conn:
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO reviews (appid, {", ".join(REVIEW_COLUMNS)})
+            VALUES ({", ".join("?" * (len(REVIEW_COLUMNS) + 1))})
+        """, rows)
+    return len(rows)
+
+
+def count_reviews(conn, appid):
+    cur = conn.execute("SELECT COUNT(*) FROM reviews WHERE appid = ?", (int(appid),))
+    return cur.fetchone()[0]
+
+
+def review_sync_state(conn, appid):
+    """Return (stored recommendation ids, newest timestamp_created) for a delta sync."""
+    ids = {row[0] for row in conn.execute(
+        "SELECT recommendationid FROM reviews WHERE appid = ?", (int(appid),))}
+    newest = conn.execute(
+        "SELECT MAX(timestamp_created) FROM reviews WHERE appid = ?", (int(appid),)).fetchone()[0]
+    return ids, int(newest or 0)
+
+
+def import_legacy_db(conn, appid, legacy_db_path):
+    """
+    Copy reviews from an old per-game {slug}_reviews.db into the shared store.
+    Returns the number of rows copied.
+    """
+    before = count_reviews(conn, appid)
+    conn.execute("ATTACH DATABASE ? AS legacy", (str(legacy_db_path),))
+    try:
+        with conn:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO reviews (appid, {", ".join(LEGACY_REVIEW_COLUMNS)}, language)
+                SELECT ?, {", ".join(LEGACY_REVIEW_COLUMNS)}, json_extract(raw_json, '$.language')
+                FROM legacy.reviews
+            """, (int(appid),))
+    finally:
+        conn.execute("DETACH DATABASE legacy")
+    return count_reviews(conn, appid) - before
+
+
+def export_window_csv(conn, appid, out_csv_path, start_ts, end_ts, columns=None):
+    """
+    Write the reviews for appid created in [start_ts, end_ts] to a CSV.
+    This is a range scan on the (appid, timestamp_created) index, and rows are
+    streamed to the file rather than loaded all at once.
+    By default the columns are REVIEW_CSV_COLUMNS, plus raw_json when some of
+    the rows were saved without an archive (e.g. migrated from before it),
+    so their raw_ref is empty and the JSON is only in the DB.
+    """
+    where = "appid = ? AND timestamp_created BETWEEN ? AND ?"
+    params = (int(appid), start_ts, end_ts)
+    if columns is None:
+        columns = REVIEW_CSV_COLUMNS
+        if conn.execute(f"SELECT 1 FROM reviews WHERE {where} AND raw_ref IS NULL AND raw_json IS NOT NULL LIMIT 1",
+                        params).fetchone():
+            columns = REVIEW_CSV_COLUMNS + ["raw_json"]
+
+    cur = conn.execute(f"""
+        SELECT {", ".join(columns)}
+        FROM reviews
+        WHERE {where}
+        ORDER BY timestamp_created ASC
+    """, params)
+
+    rows_written = 0
+    with open(out_csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in cur:
+            writer.writerow(row)
+            rows_written += 1
+    return rows_written
+
+
+def export_first_90_days_csv(conn, appid, out_csv_path, release_date_str):
+    """
+    Write a CSV containing only reviews for appid within 90 days of
+    release_date_str (YYYY-MM-DD).
+    """
+    release_dt = datetime.strptime(release_date_str, "%Y-%m-%d")
+    end_dt = release_dt + timedelta(days=90)
+    release_ts = int(release_dt.timestamp())
+    end_ts = int(end_dt.timestamp())
+
+    rows = export_window_csv(conn, appid, out_csv_path, release_ts, end_ts)
+    print(f"[appid {appid}] Wrote {rows} reviews to 90-day CSV: {out_csv_path}")
+    return rows
@@ -0,0 +1,23 @@
+# Helpers for delta syncs: re-page a game from the newest review and stop as
+# soon as we are back in reviews we already have.
+#
+# With filter=recent Steam returns reviews newest-first, so once a whole page
+# is made of known reviews everything after it is known too.
+
+
+def is_known_review(r, known_ids, newest_created: int) -> bool:
+    """A review is known if we stored its id or it is no newer than the newest stored one."""
+    if str(r.get("recommendationid")) in known_ids:
+        return True
+    try:
+        return newest_created > 0 and int(r.get("timestamp_created") or 0) <= newest_created
+    except (TypeError, ValueError):
+        return False
+
+
+def page_is_known(reviews, known_ids, newest_created: int) -> bool:
+    return all(is_known_review(r, known_ids, newest_created) for r in reviews)
+
+
+def new_reviews_only(reviews, known_ids, newest_created: int):
+    return [r for r in reviews if not is_known_review(r, known_ids, newest_created)]
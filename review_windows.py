@@ -0,0 +1,156 @@
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+REVIEWS_DIR = Path("reviews_data")
+GAME_CSV_PATH = "data/games_list.csv"
+
+# (name, start_day, end_day): reviews created between release + start_day days
+# and release + end_day days, both ends included. ("first90d", 0, 90) is the
+# window review_collection has always exported; ("days8_30", 7, 30) is the
+# 8-30 day split used in watch_dogs_analysis.ipynb.
+DEFAULT_WINDOWS = [
+    ("first7d", 0, 7),
+    ("days8_30", 7, 30),
+    ("first30d", 0, 30),
+    ("first90d", 0, 90),
+]
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))  # raw_json cells can be large
+
+
+def window_bounds(window, release_date_str):
+    """
+    Turn a window into (name, start_ts, end_ts).
+    A window is (name, start_day, end_day) relative to the release date, or
+    (name, "YYYY-MM-DD", "YYYY-MM-DD") for a fixed date range (end day included).
+    Relative windows need a release date; returns None if there isn't one.
+    """
+    name, start, end = window
+    if isinstance(start, str):
+        start_dt = datetime.strptime(start, "%Y-%m-%d")
+        end_dt = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
+    else:
+        if not release_date_str:
+            return None
+        release_dt = datetime.strptime(release_date_str, "%Y-%m-%d")
+        start_dt = release_dt + timedelta(days=start)
+        end_dt = release_dt + timedelta(days=end)
+    return name, int(start_dt.timestamp()), int(end_dt.timestamp())
+
+
+def export_review_windows(all_csv_path, out_path_template, release_date_str, windows=DEFAULT_WINDOWS,
+                          columns=None):
+    """
+    Read the per-game 'all reviews' CSV once and write one CSV per window.
+    `out_path_template` is formatted with the window name, e.g.
+    "reviews_data/{slug}_reviews_{window}.csv" with slug already filled in.
+    Only timestamp_created is converted; every other cell is copied as-is,
+    and `columns` (if given) limits what is written, e.g. to drop raw_json;
+    columns the file doesn't have are left out.
+    Returns {window name: rows written}.
+    """
+    bounds = [b for b in (window_bounds(w, release_date_str) for w in windows) if b]
+    if not bounds:
+        print(f"[{all_csv_path}] No release_date provided, skipping window export.")
+        return {}
+
+    counts = {name: 0 for name, _, _ in bounds}
+    outputs = []
+
+    with open(all_csv_path, newline="", encoding="utf-8") as f_in:
+        reader = csv.reader(f_in)
+        header = next(reader)
+        ts_idx = header.index("timestamp_created")
+        if columns:
+            columns = [c for c in columns if c in header]
+        keep = [header.index(c) for c in columns] if columns else None
+
+        try:
+            for name, start_ts, end_ts in bounds:
+                f_out = open(out_path_template.format(window=name), "w", newline="", encoding="utf-8")
+                writer = csv.writer(f_out)
+                writer.writerow(columns or header)
+                outputs.append((f_out, writer, name, start_ts, end_ts))
+
+            for row in reader:
+                try:
+                    ts = int(row[ts_idx])
+                except (ValueError, IndexError):
+                    continue
+
+                out_row = None
+                for _, writer, name, start_ts, end_ts in outputs:
+                    if start_ts <= ts <= end_ts:
+                        if out_row is None:
+                            out_row = [row[i] for i in keep] if keep else row
+                        writer.writerow(out_row)
+                        counts[name] += 1
+        finally:
+            for f_out, *_ in outputs:
+                f_out.close()
+
+    for name, n in counts.items():
+        print(f"[{all_csv_path}] Wrote {n} reviews to {name} CSV: {out_path_template.format(window=name)}")
+    return counts
+
+
+def _export_game(args):
+    game, windows, columns, reviews_dir = args
+    all_csv_path = Path(reviews_dir) / f"{game['slug']}_reviews.csv"
+    template = str(Path(reviews_dir) / f"{game['slug']}_reviews_{{window}}.csv")
+    return game["appid"], export_review_windows(all_csv_path, template, game["release_date"], windows, columns)
+
+
+def export_all_games(games, windows=DEFAULT_WINDOWS, columns=None, reviews_dir=REVIEWS_DIR, workers=None):
+    """Export windows for every game that has a reviews CSV, one process per game."""
+    games = [g for g in games if (Path(reviews_dir) / f"{g['slug']}_reviews.csv").exists()]
+    jobs = [(g, windows, columns, reviews_dir) for g in games]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(_export_game, jobs))
+
+
+def parse_window(text):
+    """
+    Parse a --window argument:
+      "90"                          -> ("first90d", 0, 90)
+      "8-30"                        -> ("days8_30", 7, 30)   (days counted from 1, like the notebook)
+      "name:2020-01-01:2020-02-01"  -> fixed date range
+    """
+    if ":" in text:
+        name, start, end = text.split(":")
+        return name, start, end
+    if "-" in text:
+        first, last = (int(x) for x in text.split("-"))
+        return f"days{first}_{last}", first - 1, last
+    return f"first{int(text)}d", 0, int(text)
+
+
+def main():
+    from review_collection import load_games_from_csv
+
+    parser = argparse.ArgumentParser(description="Export launch-window review CSVs in one pass per game.")
+    parser.add_argument("--window", action="append", type=parse_window,
+                        help='window to export, e.g. "7", "8-30", "90" or "name:YYYY-MM-DD:YYYY-MM-DD" '
+                             "(repeatable; default: 7, 8-30, 30, 90)")
+    parser.add_argument("--no-raw-json", action="store_true",
+                        help="leave the raw_json column of older CSVs out (newer ones only have raw_ref)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    columns = None
+    if args.no_raw_json:
+        from review_store import REVIEW_CSV_COLUMNS
+        columns = REVIEW_CSV_COLUMNS
+
+    games = load_games_from_csv(GAME_CSV_PATH)
+    export_all_games(games, args.window or DEFAULT_WINDOWS, columns, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
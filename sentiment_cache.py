@@ -0,0 +1,114 @@
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+
+CACHE_DB_PATH = Path(__file__).resolve().parent / "data" / "sentiment_cache.db"
+MAX_CACHE_ENTRIES = 5_000_000
+LOOKUP_BATCH = 500  # keys per SELECT, well under SQLite's parameter limit
+
+
+def text_hash(text) -> bytes:
+    return hashlib.blake2b(str(text).encode("utf-8"), digest_size=16).digest()
+
+
+def _today() -> int:
+    return int(time.time() // 86400)
+
+
+class SentimentCache:
+    """
+    On-disk map of (recommendationid, hash of the review text, scorer
+    version) -> compound score. Editing a review changes its hash, and a new
+    scorer version never sees old scores, so a hit is always safe to reuse.
+
+    Entries record the day they were last used. Once the table is over
+    `max_entries`, the least recently used tenth is deleted.
+    Safe to open from several processes at once (WAL mode).
+    """
+
+    def __init__(self, scorer_version: str, db_path=CACHE_DB_PATH, max_entries: int = MAX_CACHE_ENTRIES):
+        self.scorer_version = scorer_version
+        self.max_entries = max_entries
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                recommendationid TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                scorer_version TEXT NOT NULL,
+                compound REAL NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (recommendationid, text_hash, scorer_version)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_used ON scores (last_used)")
+        self.conn.commit()
+        self._entries = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, ids, texts):
+        """Cached score for each (id, text) pair, or None where there is none. Same order as the input."""
+        keys = [(str(i), text_hash(t)) for i, t in zip(ids, texts)]
+        found = {}
+        today = _today()
+
+        for start in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[start:start + LOOKUP_BATCH]
+            placeholders = ", ".join("(?, ?)" for _ in batch)
+            params = [x for key in batch for x in key]
+            rows = self.conn.execute(f"""
+                SELECT recommendationid, text_hash, compound, last_used
+                FROM scores
+                WHERE scorer_version = ? AND (recommendationid, text_hash) IN (VALUES {placeholders})
+            """, [self.scorer_version] + params).fetchall()
+
+            stale = []
+            for rid, h, compound, last_used in rows:
+                found[(rid, h)] = compound
+                if last_used < today:
+                    stale.append((today, rid, h, self.scorer_version))
+            if stale:
+                with self.conn:
+                    self.conn.executemany("""
+                        UPDATE scores SET last_used = ?
+                        WHERE recommendationid = ? AND text_hash = ? AND scorer_version = ?
+                    """, stale)
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, ids, texts, scores):
+        today = _today()
+        rows = [(str(i), text_hash(t), self.scorer_version, float(s), today)
+                for i, t, s in zip(ids, texts, scores)]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO scores (recommendationid, text_hash, scorer_version, compound, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+        self._entries += len(rows)
+        if self._entries > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache is at 90% of max_entries."""
+        self._entries = self.conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        with self.conn:
+            self.conn.execute("""
+                DELETE FROM scores WHERE (recommendationid, text_hash, scorer_version) IN (
+                    SELECT recommendationid, text_hash, scorer_version
+                    FROM scores ORDER BY last_used ASC LIMIT ?
+                )
+            """, (excess,))
+        self._entries -= excess
+
+    def close(self):
+        self.conn.close()
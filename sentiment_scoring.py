@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+
+from sentiment_cache import CACHE_DB_PATH, SentimentCache
+from vader_batch import BATCH_VADER_VERSION, BatchVader, lexicon_digest
+
+
+DEFAULT_CHUNK_SIZE = 2000  # reviews per task sent to a worker
+
+# Part of every cache key, so cached scores are dropped whenever they could
+# change: the nltk version BatchVader matches (read without importing nltk),
+# BatchVader's own version and the lexicon file it scores with.
+SCORER_VERSION = f"nltk-vader-{version('nltk')}-batch{BATCH_VADER_VERSION}-lexicon-{lexicon_digest()}"
+
+# Set in every worker process by init_scoring_worker
+_worker_scorer = None
+_worker_cache = None
+
+
+def init_scoring_worker(cache_path=None):
+    """Pool initializer: build the scorer (and open the cache) once per process, not once per chunk."""
+    global _worker_scorer, _worker_cache
+    _worker_scorer = BatchVader()
+    _worker_cache = open_cache(cache_path) if cache_path else None
+
+
+def open_cache(cache_path=CACHE_DB_PATH) -> SentimentCache:
+    return SentimentCache(SCORER_VERSION, cache_path)
+
+
+def worker_scores(texts):
+    """Compound scores for `texts`, using this process's scorer."""
+    if _worker_scorer is None:
+        init_scoring_worker()
+    return _worker_scorer.score_batch(texts)
+
+
+def worker_scores_cached(ids, texts):
+    """Like worker_scores, but goes through this process's cache if the pool was given one."""
+    if _worker_cache is None:
+        return worker_scores(texts)
+    return cached_scores(ids, texts, _worker_cache, worker_scores)
+
+
+def make_scoring_pool(workers: int | None = None, cache_path=None) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_scoring_worker, initargs=(cache_path,))
+
+
+def score_texts(texts, pool: ProcessPoolExecutor | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    VADER compound score for every text, in the same order as `texts`.
+    Chunks of `chunk_size` texts are spread over `pool`; without a pool
+    everything is scored in this process. Either way the scores are the
+    ones polarity_scores would give one text at a time.
+    """
+    texts = list(texts)
+    if pool is None:
+        return worker_scores(texts)
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    scores = []
+    for chunk_scores in pool.map(worker_scores, chunks):
+        scores.extend(chunk_scores)
+    return scores
+
+
+def cached_scores(ids, texts, cache: SentimentCache, score_fn):
+    """
+    Look every (id, text) up in `cache` in batches, score only the misses
+    with score_fn(list of texts) and store them. Same order as the input.
+    """
+    ids = list(ids)
+    texts = list(texts)
+    scores = cache.get_many(ids, texts)
+
+    missing = [i for i, s in enumerate(scores) if s is None]
+    if missing:
+        new_scores = score_fn([texts[i] for i in missing])
+        cache.put_many([ids[i] for i in missing], [texts[i] for i in missing], new_scores)
+        for i, s in zip(missing, new_scores):
+            scores[i] = s
+    return scores
+
+
+def score_texts_cached(ids, texts, cache: SentimentCache | None, pool: ProcessPoolExecutor | None = None,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """score_texts, but reviews already scored by this scorer version come from the cache."""
+    if cache is None:
+        return score_texts(texts, pool, chunk_size)
+    return cached_scores(ids, texts, cache, lambda misses: score_texts(misses, pool, chunk_size))
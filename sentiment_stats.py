@@ -0,0 +1,339 @@
+import argparse
+import math
+import os
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from sentiment_scoring import SCORER_VERSION
+from vader_batch import require_lexicon
+
+
+STATS_DB_PATH = Path(__file__).resolve().parent / "data" / "sentiment_stats.db"
+BUCKETS = ["low", "medium", "high"]
+
+# VADER compound scores have 4 decimals, so a count per score is an exact
+# quantile sketch of at most 20001 entries per game and bucket
+VALUE_SCALE = 10_000
+
+# Spearman works on a 2-D histogram of (playtime bin, sentiment bin) per game.
+# Like the notebook it leaves out playtimes over SPEARMAN_MAX_HOURS.
+SPEARMAN_MAX_HOURS = 500
+PLAYTIME_BIN_EDGES = np.concatenate([[0.0], np.geomspace(0.05, SPEARMAN_MAX_HOURS, 120)])
+SENTIMENT_BIN_KEYS = 100  # 0.01 of compound per sentiment bin
+
+# Strings pandas reads as NaN by default; the notebook drops reviews that are one of them
+NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+              "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+class RunningStats:
+    """Count, mean and sum of squared deviations (Welford), mergeable across batches and games."""
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def merge(self, n, mean, m2):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    def add_many(self, values: np.ndarray):
+        if len(values):
+            mean = float(values.mean())
+            self.merge(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else float("nan")
+
+
+def histogram_median(counts: Counter) -> float:
+    """Median of the scores counted in `counts` (score key -> count), like pandas' median."""
+    keys = sorted(counts)
+    cum = np.cumsum([counts[k] for k in keys])
+    n = int(cum[-1]) if len(cum) else 0
+    if n == 0:
+        return float("nan")
+    lo = keys[np.searchsorted(cum, (n - 1) // 2, side="right")]
+    hi = keys[np.searchsorted(cum, n // 2, side="right")]
+    return (lo + hi) / 2 / VALUE_SCALE
+
+
+def midranks(counts):
+    """Average rank of each group of tied values, given the group sizes in sorted order."""
+    counts = np.asarray(counts, dtype=np.float64)
+    return np.cumsum(counts) - (counts - 1) / 2
+
+
+class GameStats:
+    """
+    Sentiment aggregates for one game, built chunk by chunk while it is
+    scored: per playtime bucket a RunningStats and a count per score, and a
+    (playtime bin, sentiment bin) histogram for Spearman. Rows are filtered
+    the way sentiment_playtime_correlation.ipynb filters them.
+    """
+
+    def __init__(self):
+        self.moments = {b: RunningStats() for b in BUCKETS}
+        self.values = {b: Counter() for b in BUCKETS}
+        self.joint = Counter()
+
+    def add_frame(self, df):
+        sentiment = np.asarray(df["sentiment_compound"], dtype=np.float64)
+        hours = np.asarray(df["playtime_hours"], dtype=np.float64)
+        bucket = np.asarray(df["playtime_bucket"], dtype=object)
+        keep = ~df["review"].isin(NA_STRINGS).to_numpy() & (sentiment != 0.0) & (hours >= 0)
+
+        for b in BUCKETS:
+            s = sentiment[keep & (bucket == b)]
+            self.moments[b].add_many(s)
+            keys, counts = np.unique(np.rint(s * VALUE_SCALE).astype(np.int64), return_counts=True)
+            self.values[b].update(dict(zip(keys.tolist(), counts.tolist())))
+
+        corr = keep & np.isin(bucket, BUCKETS) & (hours <= SPEARMAN_MAX_HOURS)
+        p_bin = np.searchsorted(PLAYTIME_BIN_EDGES, hours[corr], side="right")
+        s_bin = np.floor_divide(np.rint(sentiment[corr] * VALUE_SCALE).astype(np.int64), SENTIMENT_BIN_KEYS)
+        pairs, counts = np.unique(np.stack([p_bin, s_bin]), axis=1, return_counts=True)
+        self.joint.update(dict(zip(map(tuple, pairs.T.tolist()), counts.tolist())))
+
+
+class SentimentStatsStore:
+    """
+    SQLite store of GameStats per game_slug, with the size and mtime of the
+    reviews CSV they came from. Saving a game replaces only that game's rows,
+    and the summary tables merge the stored aggregates without touching the
+    reviews, so adding a game costs only its own rows.
+    """
+
+    def __init__(self, db_path=STATS_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS games (
+                game_slug TEXT PRIMARY KEY,
+                source_size INTEGER NOT NULL,
+                source_mtime_ns INTEGER NOT NULL,
+                scorer_version TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bucket_moments (
+                game_slug TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                mean REAL NOT NULL,
+                m2 REAL NOT NULL,
+                PRIMARY KEY (game_slug, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS bucket_values (
+                game_slug TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                value_key INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (game_slug, bucket, value_key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS playtime_sentiment (
+                game_slug TEXT NOT NULL,
+                playtime_bin INTEGER NOT NULL,
+                sentiment_bin INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (game_slug, playtime_bin, sentiment_bin)
+            ) WITHOUT ROWID;
+        """)
+
+    def is_current(self, game_slug, csv_path: Path) -> bool:
+        """True if the stored stats were built from this exact file with this scorer version."""
+        st = csv_path.stat()
+        row = self.conn.execute("SELECT source_size, source_mtime_ns, scorer_version FROM games WHERE game_slug = ?",
+                                (game_slug,)).fetchone()
+        return row == (st.st_size, st.st_mtime_ns, SCORER_VERSION)
+
+    def save_game(self, game_slug, csv_path: Path, stats: GameStats):
+        st = csv_path.stat()
+        with self.conn:
+            self._delete(game_slug)
+            self.conn.execute("INSERT INTO games VALUES (?, ?, ?, ?)",
+                              (game_slug, st.st_size, st.st_mtime_ns, SCORER_VERSION))
+            self.conn.executemany("INSERT INTO bucket_moments VALUES (?, ?, ?, ?, ?)",
+                                  [(game_slug, b, m.n, m.mean, m.m2) for b, m in stats.moments.items()])
+            self.conn.executemany("INSERT INTO bucket_values VALUES (?, ?, ?, ?)",
+                                  [(game_slug, b, k, c) for b, counts in stats.values.items() for k, c in counts.items()])
+            self.conn.executemany("INSERT INTO playtime_sentiment VALUES (?, ?, ?, ?)",
+                                  [(game_slug, p, s, c) for (p, s), c in stats.joint.items()])
+
+    def _delete(self, game_slug):
+        for table in ("games", "bucket_moments", "bucket_values", "playtime_sentiment"):
+            self.conn.execute(f"DELETE FROM {table} WHERE game_slug = ?", (game_slug,))
+
+    def keep_only(self, game_slugs):
+        """Drop the stats of games whose reviews CSV is gone."""
+        stale = set(self.games()) - set(game_slugs)
+        with self.conn:
+            for game_slug in stale:
+                self._delete(game_slug)
+        return stale
+
+    def games(self):
+        return [r[0] for r in self.conn.execute("SELECT game_slug FROM games ORDER BY game_slug")]
+
+    def _where(self, games):
+        if not games:
+            return "", []
+        return f"WHERE game_slug IN ({', '.join('?' for _ in games)})", list(games)
+
+    def bucket_values(self, games=None):
+        """bucket -> Counter(score key -> count), summed over `games` (all games if None)."""
+        where, params = self._where(games)
+        values = {b: Counter() for b in BUCKETS}
+        for bucket, key, count in self.conn.execute(
+                f"SELECT bucket, value_key, SUM(count) FROM bucket_values {where} GROUP BY bucket, value_key", params):
+            values[bucket][key] = count
+        return values
+
+    def bucket_table(self, games=None):
+        """Rows of (bucket, count, mean, std, median) like the notebook's groupby().agg()."""
+        where, params = self._where(games)
+        moments = {b: RunningStats() for b in BUCKETS}
+        for bucket, n, mean, m2 in self.conn.execute(
+                f"SELECT bucket, n, mean, m2 FROM bucket_moments {where} ORDER BY game_slug", params):
+            moments[bucket].merge(n, mean, m2)
+        values = self.bucket_values(games)
+        return [(b, m.n, m.mean, m.std, histogram_median(values[b]))
+                for b, m in sorted(moments.items()) if m.n]
+
+    def kruskal(self, games=None):
+        """Kruskal-Wallis H and p-value across the buckets, with scipy's tie correction."""
+        from scipy.special import chdtrc  # chi-squared survival function; scipy.stats takes ~1s to import
+
+        values = self.bucket_values(games)
+        groups = [b for b in BUCKETS if values[b]]
+        keys = sorted(set().union(*(values[b] for b in groups)))
+        totals = np.array([sum(values[b][k] for b in groups) for k in keys], dtype=np.float64)
+        ranks = dict(zip(keys, midranks(totals)))
+        n = totals.sum()
+        if len(groups) < 2 or n < 2:
+            return float("nan"), float("nan")
+
+        h = 0.0
+        for b in groups:
+            rank_sum = sum(ranks[k] * c for k, c in values[b].items())
+            h += rank_sum ** 2 / sum(values[b].values())
+        h = 12 / (n * (n + 1)) * h - 3 * (n + 1)
+        h /= 1 - ((totals ** 3 - totals).sum() / (n ** 3 - n))
+        return h, chdtrc(len(groups) - 1, h)
+
+    def spearman(self, games=None):
+        """
+        Spearman's rho of playtime vs sentiment and its p-value, from the
+        binned histogram: reviews in the same bin share their midrank, so
+        this approximates spearmanr on the raw rows.
+        """
+        from scipy.special import stdtr  # Student t CDF
+
+        where, params = self._where(games)
+        rows = self.conn.execute(f"""
+            SELECT playtime_bin, sentiment_bin, SUM(count) FROM playtime_sentiment {where}
+            GROUP BY playtime_bin, sentiment_bin
+        """, params).fetchall()
+        if not rows:
+            return float("nan"), float("nan")
+        p_bins, s_bins, counts = (np.array(col) for col in zip(*rows))
+        counts = counts.astype(np.float64)
+
+        def ranks_of(bins):
+            uniq, inverse = np.unique(bins, return_inverse=True)
+            return midranks(np.bincount(inverse, weights=counts))[inverse]
+
+        rp, rs = ranks_of(p_bins), ranks_of(s_bins)
+        n = counts.sum()
+        mp, ms = (rp * counts).sum() / n, (rs * counts).sum() / n
+        cov = (counts * (rp - mp) * (rs - ms)).sum()
+        rho = cov / math.sqrt((counts * (rp - mp) ** 2).sum() * (counts * (rs - ms) ** 2).sum())
+        if n <= 2 or abs(rho) >= 1:
+            return rho, 0.0 if abs(rho) >= 1 else float("nan")
+        t = rho * math.sqrt((n - 2) / (1 - rho * rho))
+        return rho, 2 * stdtr(n - 2, -abs(t))
+
+    def close(self):
+        self.conn.close()
+
+
+def update(store: SentimentStatsStore, workers: int = 1):
+    """Build stats for the reviews CSVs that are new or changed since they were last counted."""
+    # Imported here: review_sentiment_analysis itself imports this module
+    from review_sentiment_analysis import GLOB_PATTERN, REVIEWS_DIR, game_slug_for, process_file
+    from sentiment_scoring import make_scoring_pool, open_cache
+
+    files = sorted(REVIEWS_DIR.glob(GLOB_PATTERN))
+    todo = [p for p in files if not store.is_current(game_slug_for(p), p)]
+    dropped = store.keep_only([game_slug_for(p) for p in files])
+    if dropped:
+        print(f"Dropped stats of {len(dropped)} game(s) with no reviews CSV: {', '.join(sorted(dropped))}")
+    if not todo:
+        print("Sentiment stats are up to date.")
+        return
+
+    columns = ["recommendationid", "review", "playtime_forever", "playtime_hours", "playtime_bucket",
+               "sentiment_compound"]
+    pool = make_scoring_pool(workers) if workers > 1 else None
+    cache = open_cache()
+    try:
+        for csv_path in todo:
+            stats = GameStats()
+            for chunk in process_file(csv_path, columns, pool, cache=cache):
+                stats.add_frame(chunk)
+            store.save_game(game_slug_for(csv_path), csv_path, stats)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        cache.close()
+
+
+def print_summary(store: SentimentStatsStore, games=None):
+    names = games or store.games()
+    print(f"Sentiment by playtime bucket ({len(names)} game(s))")
+    print(f"{'playtime_bucket':16s}{'count':>10s}{'mean':>10s}{'std':>10s}{'median':>10s}")
+    for bucket, n, mean, std, median in store.bucket_table(games):
+        print(f"{bucket:16s}{n:10d}{mean:10.4f}{std:10.4f}{median:10.4f}")
+
+    h, p = store.kruskal(games)
+    print(f"\nKruskal-Wallis H-stat: {h}")
+    print(f"p-value: {p}")
+
+    rho, p = store.spearman(games)
+    print(f"\nSpearman correlation (playtime <= {SPEARMAN_MAX_HOURS}h, binned): {rho}")
+    print(f"p-value: {p}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sentiment-by-playtime tables from the aggregates kept by review_sentiment_analysis.py.")
+    parser.add_argument("--game", action="append", help="only this game_slug (repeatable)")
+    parser.add_argument("--update", action="store_true",
+                        help="first count the reviews CSVs that are new or changed since the last run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="scoring processes for --update")
+    args = parser.parse_args()
+
+    store = SentimentStatsStore()
+    try:
+        if args.update:
+            require_lexicon()
+            update(store, args.workers)
+        if not store.games():
+            print(f"No sentiment stats in {STATS_DB_PATH}; run review_sentiment_analysis.py or pass --update.")
+            return
+        print_summary(store, args.game)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+import argparse
+import hashlib
+import math
+import os
+import string
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+
+REVIEWS_DIR = Path("reviews_data")
+# Part of the sentiment cache key (sentiment_scoring.SCORER_VERSION); bump it
+# whenever a change to the rules or tables below could change a score
+BATCH_VADER_VERSION = 1
+MAX_TOKEN_TABLE = 1_000_000  # distinct tokens remembered before the table is cleared
+
+# Where nltk's downloader puts the lexicon, relative to an nltk_data directory
+LEXICON_ZIP = Path("sentiment") / "vader_lexicon.zip"
+LEXICON_MEMBER = "vader_lexicon/vader_lexicon.txt"
+
+# VADER's word lists and constants, as in nltk.sentiment.vader.VaderConstants.
+# Kept here so scoring doesn't import nltk (over a second on its own);
+# check_parity() checks they still match nltk's.
+B_INCR = 0.293
+B_DECR = -0.293
+C_INCR = 0.733
+N_SCALAR = -0.74
+
+NEGATE = frozenset([
+    "ain't", "aint", "aren't", "arent", "can't", "cannot", "cant", "couldn't", "couldnt", "daren't",
+    "darent", "despite", "didn't", "didnt", "doesn't", "doesnt", "don't", "dont", "hadn't", "hadnt",
+    "hasn't", "hasnt", "haven't", "havent", "isn't", "isnt", "mightn't", "mightnt", "mustn't",
+    "mustnt", "needn't", "neednt", "neither", "never", "none", "nope", "nor", "not", "nothing",
+    "nowhere", "oughtn't", "oughtnt", "rarely", "seldom", "shan't", "shant", "shouldn't",
+    "shouldnt", "uh-uh", "uhuh", "wasn't", "wasnt", "weren't", "werent", "without", "won't", "wont",
+    "wouldn't", "wouldnt",
+])
+
+BOOSTER_DICT = {
+    **dict.fromkeys([
+        "absolutely", "amazingly", "awfully", "completely", "considerably", "decidedly", "deeply",
+        "effing", "enormously", "entirely", "especially", "exceptionally", "extremely",
+        "fabulously", "flipping", "flippin", "fricking", "frickin", "frigging", "friggin", "fully",
+        "fucking", "greatly", "hella", "highly", "hugely", "incredibly", "intensely", "majorly",
+        "more", "most", "particularly", "purely", "quite", "really", "remarkably", "so",
+        "substantially", "thoroughly", "totally", "tremendously", "uber", "unbelievably",
+        "unusually", "utterly", "very",
+    ], B_INCR),
+    **dict.fromkeys([
+        "almost", "barely", "hardly", "just enough", "kind of", "kinda", "kindof", "kind-of",
+        "less", "little", "marginally", "occasionally", "partly", "scarcely", "slightly",
+        "somewhat", "sort of", "sorta", "sortof", "sort-of",
+    ], B_DECR),
+}
+
+SPECIAL_CASE_IDIOMS = {
+    "the shit": 3,
+    "the bomb": 3,
+    "bad ass": 1.5,
+    "yeah right": -2,
+    "cut the mustard": 2,
+    "kiss of death": -1.5,
+    "hand to mouth": -2,
+}
+
+PUNC_LIST = [
+    ".", "!", "?", ",", ";", ":", "-", "'", "\"", "!!", "!!!", "??", "???", "?!?", "!?!", "?!?!",
+    "!?!?",
+]
+
+_PUNCTUATION = frozenset(string.punctuation)
+_PUNC_SET = frozenset(PUNC_LIST)
+# Every word that appears in an idiom or a two-word booster; if none of them
+# is near a word, the idiom check can't change its valence
+_IDIOM_WORDS = frozenset(w for phrase in [*SPECIAL_CASE_IDIOMS, *BOOSTER_DICT] if " " in phrase
+                         for w in phrase.split())
+
+
+def nltk_data_dirs():
+    """The directories nltk.data searches, in the same order, worked out without importing nltk."""
+    dirs = [os.path.expanduser(d) for d in os.environ.get("NLTK_DATA", "").split(os.pathsep) if d]
+    dirs.append(os.path.expanduser("~/nltk_data"))
+    dirs += [
+        os.path.join(sys.prefix, "nltk_data"),
+        os.path.join(sys.prefix, "share", "nltk_data"),
+        os.path.join(sys.prefix, "lib", "nltk_data"),
+        "/usr/share/nltk_data",
+        "/usr/local/share/nltk_data",
+        "/usr/lib/nltk_data",
+        "/usr/local/lib/nltk_data",
+    ]
+    return [Path(d) for d in dirs]
+
+
+def find_lexicon() -> Path | None:
+    """Path of the installed vader_lexicon.zip, or None if it hasn't been downloaded."""
+    for d in nltk_data_dirs():
+        if (d / LEXICON_ZIP).is_file():
+            return d / LEXICON_ZIP
+    return None
+
+
+def require_lexicon() -> Path:
+    """find_lexicon, but fail with instructions instead of reaching for the network."""
+    path = find_lexicon()
+    if path is None:
+        raise SystemExit("VADER lexicon not found in any nltk_data directory. "
+                         "Download it once with: python cli.py check-lexicon --download")
+    return path
+
+
+def lexicon_digest(path=None) -> str:
+    """Short hash of the lexicon file's word list (not versioned with nltk), or "none" if it isn't installed."""
+    path = path or find_lexicon()
+    if path is None:
+        return "none"
+    with zipfile.ZipFile(path) as zf:
+        return hashlib.blake2b(zf.read(LEXICON_MEMBER), digest_size=8).hexdigest()
+
+
+def load_lexicon(path=None):
+    """The VADER lexicon as {word: valence}, parsed the same way nltk does it."""
+    with zipfile.ZipFile(path or require_lexicon()) as zf:
+        text = zf.read(LEXICON_MEMBER).decode("utf-8")
+    lex = {}
+    for line in text.split("\n"):
+        word, measure = line.strip().split("\t")[0:2]
+        lex[word] = float(measure)
+    return lex
+
+
+def _strip_punc(token):
+    """
+    nltk's SentiText maps "word," and ",word" to "word" by building every
+    (punctuation, word) combination for each text. This does the same
+    lookup directly on one token: strip one PUNC_LIST entry from the end
+    (or else the start) if what's left is a punctuation-free word of 2+ chars.
+    """
+    if token[0] not in _PUNCTUATION:
+        for k, ch in enumerate(token):
+            if ch in _PUNCTUATION:
+                if k > 1 and token[k:] in _PUNC_SET:
+                    return token[:k]
+                return token
+        return token
+
+    k = len(token)
+    while k and token[k - 1] not in _PUNCTUATION:
+        k -= 1
+    if token[:k] in _PUNC_SET and len(token) - k > 1:
+        return token[k:]
+    return token
+
+
+class BatchVader:
+    """
+    Scores whole lists of texts with the same compound score as
+    nltk's SentimentIntensityAnalyzer.polarity_scores(text)["compound"].
+
+    The rules are nltk's, applied in the same order so the floats come out
+    bit-for-bit equal. What's different is the bookkeeping: everything
+    about a token that doesn't depend on its neighbours (punctuation
+    stripping, lowercase, ALL CAPS, lexicon valence, booster, negation) is
+    worked out once and kept in a table, so a batch of reviews only pays
+    for each distinct token once, and repeated texts are only scored once.
+    Use check_parity() to compare against nltk on real reviews.
+    """
+
+    def __init__(self, lexicon=None):
+        self.lexicon = lexicon if lexicon is not None else load_lexicon()
+        # raw token -> (word, lower, isupper, negated, can_score), or () for
+        # the 1-char tokens nltk drops
+        self._tokens = {}
+
+    def _token(self, raw):
+        if len(raw) < 2:
+            info = ()
+        else:
+            word = _strip_punc(raw)
+            lower = word.lower()
+            negated = lower in NEGATE or "n't" in lower
+            # only lexicon words that aren't boosters ever get a non-zero valence
+            can_score = lower in self.lexicon and lower not in BOOSTER_DICT
+            info = (word, lower, word.isupper(), negated, can_score)
+        self._tokens[raw] = info
+        return info
+
+    def compound(self, text):
+        if not isinstance(text, str):
+            text = str(text.encode("utf-8"))
+
+        raws = text.split()
+        tokens = list(map(self._tokens.get, raws))
+        if None in tokens:
+            if len(self._tokens) > MAX_TOKEN_TABLE:
+                self._tokens.clear()
+            tokens = [self._token(raw) if info is None else info for raw, info in zip(raws, tokens)]
+        tokens = [info for info in tokens if info]
+        if not tokens:
+            return 0.0
+
+        words = [t[0] for t in tokens]
+        lowers = [t[1] for t in tokens]
+        n_caps = sum(1 for t in tokens if t[2])
+        is_cap_diff = 0 < len(tokens) - n_caps < len(tokens)
+
+        # nltk scores every occurrence of a token as if it sat where the
+        # token first appears; keep that so the numbers match
+        first_valence = {}
+        sentiments = []
+        for i, info in enumerate(tokens):
+            if not info[4]:
+                sentiments.append(0)
+                continue
+            valence = first_valence.get(info[0])
+            if valence is None:
+                valence = self._valence(tokens, words, lowers, i, is_cap_diff)
+                first_valence[info[0]] = valence
+            sentiments.append(valence)
+
+        if "but" in lowers:
+            bi = lowers.index("but")
+            for sidx, sentiment in enumerate(sentiments):
+                if sidx < bi:
+                    sentiments[sidx] = sentiment * 0.5
+                elif sidx > bi:
+                    sentiments[sidx] = sentiment * 1.5
+
+        sum_s = float(sum(sentiments))
+        if sum_s:
+            ep_count = min(text.count("!"), 4)
+            qm_count = text.count("?")
+            qm_amplifier = 0
+            if qm_count > 1:
+                qm_amplifier = qm_count * 0.18 if qm_count <= 3 else 0.96
+            punct_emph_amplifier = ep_count * 0.292 + qm_amplifier
+            if sum_s > 0:
+                sum_s += punct_emph_amplifier
+            else:
+                sum_s -= punct_emph_amplifier
+
+        return round(sum_s / math.sqrt((sum_s * sum_s) + 15), 4)
+
+    def _valence(self, tokens, words, lowers, i, is_cap_diff):
+        """Valence of the lexicon word at position i, with nltk's rules for the words around it."""
+        lower = lowers[i]
+        if i < len(words) - 1 and lower == "kind" and lowers[i + 1] == "of":
+            return 0
+
+        lexicon = self.lexicon
+        valence = lexicon[lower]
+        if tokens[i][2] and is_cap_diff:
+            if valence > 0:
+                valence += C_INCR
+            else:
+                valence -= C_INCR
+
+        for start_i in range(0, 3):
+            j = i - (start_i + 1)
+            if i > start_i and lowers[j] not in lexicon:
+                s = 0.0
+                if lowers[j] in BOOSTER_DICT:
+                    s = BOOSTER_DICT[lowers[j]]
+                    if valence < 0:
+                        s *= -1
+                    if tokens[j][2] and is_cap_diff:
+                        if valence > 0:
+                            s += C_INCR
+                        else:
+                            s -= C_INCR
+                if start_i == 1 and s != 0:
+                    s = s * 0.95
+                if start_i == 2 and s != 0:
+                    s = s * 0.9
+                valence = valence + s
+                valence = self._never_check(valence, tokens, words, start_i, i)
+                if start_i == 2:
+                    valence = self._idioms_check(valence, words, i)
+
+        # negation with "least"
+        if i > 1 and lowers[i - 1] not in lexicon and lowers[i - 1] == "least":
+            if lowers[i - 2] != "at" and lowers[i - 2] != "very":
+                valence = valence * N_SCALAR
+        elif i > 0 and lowers[i - 1] not in lexicon and lowers[i - 1] == "least":
+            valence = valence * N_SCALAR
+        return valence
+
+    @staticmethod
+    def _never_check(valence, tokens, words, start_i, i):
+        if start_i == 0:
+            if tokens[i - 1][3]:
+                valence = valence * N_SCALAR
+        elif start_i == 1:
+            if words[i - 2] == "never" and (words[i - 1] == "so" or words[i - 1] == "this"):
+                valence = valence * 1.5
+            elif tokens[i - 2][3]:
+                valence = valence * N_SCALAR
+        else:
+            if (words[i - 3] == "never" and (words[i - 2] == "so" or words[i - 2] == "this")
+                    or (words[i - 1] == "so" or words[i - 1] == "this")):
+                valence = valence * 1.25
+            elif tokens[i - 3][3]:
+                valence = valence * N_SCALAR
+        return valence
+
+    @staticmethod
+    def _idioms_check(valence, words, i):
+        if _IDIOM_WORDS.isdisjoint(words[i - 3:i + 3]):
+            return valence
+        idioms = SPECIAL_CASE_IDIOMS
+        onezero = f"{words[i - 1]} {words[i]}"
+        twoonezero = f"{words[i - 2]} {words[i - 1]} {words[i]}"
+        twoone = f"{words[i - 2]} {words[i - 1]}"
+        threetwoone = f"{words[i - 3]} {words[i - 2]} {words[i - 1]}"
+        threetwo = f"{words[i - 3]} {words[i - 2]}"
+
+        for seq in (onezero, twoonezero, twoone, threetwoone, threetwo):
+            if seq in idioms:
+                valence = idioms[seq]
+                break
+
+        if len(words) - 1 > i:
+            zeroone = f"{words[i]} {words[i + 1]}"
+            if zeroone in idioms:
+                valence = idioms[zeroone]
+        if len(words) - 1 > i + 1:
+            zeroonetwo = f"{words[i]} {words[i + 1]} {words[i + 2]}"
+            if zeroonetwo in idioms:
+                valence = idioms[zeroonetwo]
+
+        if threetwo in BOOSTER_DICT or twoone in BOOSTER_DICT:
+            valence = valence + B_DECR
+        return valence
+
+    def score_batch(self, texts):
+        """Compound score for every text, same order. Identical texts are scored once."""
+        seen = {}
+        scores = []
+        for text in texts:
+            if not isinstance(text, str):
+                scores.append(self.compound(text))
+                continue
+            score = seen.get(text)
+            if score is None:
+                score = seen[text] = self.compound(text)
+            scores.append(score)
+        return scores
+
+
+def corpus_texts(reviews_dir=REVIEWS_DIR, limit=None):
+    """
+    Review texts from each game's reviews CSV in reviews_dir, as the sentiment
+    scripts would see them: the full file, else its 90-day export (as in
+    review_rollups.review_csvs), so no review is counted twice.
+    """
+    import pandas as pd
+
+    reviews_dir = Path(reviews_dir)
+    full = sorted(reviews_dir.glob("*_reviews.csv"))
+    have = {p.name[:-len("_reviews.csv")] for p in full}
+    first90d = [p for p in sorted(reviews_dir.glob("*_reviews_first90d.csv"))
+                if p.name[:-len("_reviews_first90d.csv")] not in have]
+
+    texts = []
+    for csv_path in sorted(full + first90d):
+        df = pd.read_csv(csv_path, usecols=["review"])
+        texts.extend(df["review"].dropna().astype(str).str.strip())
+        if limit and len(texts) >= limit:
+            return texts[:limit]
+    return texts
+
+
+def download_lexicon():
+    """Fetch the lexicon with nltk's downloader. The only thing here that touches the network."""
+    import nltk
+
+    return nltk.download("vader_lexicon", quiet=True)
+
+
+def constants_differing_from_nltk() -> list[str]:
+    """Names of the word lists/constants above that differ from the installed nltk's."""
+    from nltk.sentiment.vader import VaderConstants
+
+    ours = {"B_INCR": B_INCR, "B_DECR": B_DECR, "C_INCR": C_INCR, "N_SCALAR": N_SCALAR, "NEGATE": NEGATE,
+            "BOOSTER_DICT": BOOSTER_DICT, "SPECIAL_CASE_IDIOMS": SPECIAL_CASE_IDIOMS, "PUNC_LIST": PUNC_LIST}
+    return [name for name, value in ours.items() if getattr(VaderConstants, name) != value]
+
+
+def check_parity(texts, scorer=None):
+    """
+    Score `texts` with both nltk and BatchVader. Returns
+    (number of mismatches, first few (text, nltk score, batch score), nltk seconds, batch seconds).
+    """
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+    sid = SentimentIntensityAnalyzer()
+    scorer = scorer or BatchVader()
+    if scorer.lexicon != sid.lexicon:
+        raise ValueError("BatchVader and nltk loaded different lexicons")
+
+    t0 = time.perf_counter()
+    expected = [sid.polarity_scores(t)["compound"] for t in texts]
+    t1 = time.perf_counter()
+    got = scorer.score_batch(texts)
+    t2 = time.perf_counter()
+
+    mismatches = [(t, e, g) for t, e, g in zip(texts, expected, got) if e != g]
+    return len(mismatches), mismatches[:10], t1 - t0, t2 - t1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check BatchVader against nltk's VADER on the local review corpus.")
+    parser.add_argument("--reviews-dir", default=str(REVIEWS_DIR))
+    parser.add_argument("--limit", type=int, default=None, help="only check the first N reviews")
+    args = parser.parse_args()
+
+    stale = constants_differing_from_nltk()
+    if stale:
+        raise SystemExit(f"VADER constants differ from the installed nltk: {', '.join(stale)}")
+
+    texts = corpus_texts(args.reviews_dir, args.limit)
+    if not texts:
+        raise SystemExit(f"No reviews found in {args.reviews_dir}")
+
+    n_bad, examples, nltk_s, batch_s = check_parity(texts)
+    print(f"Checked {len(texts)} reviews: {n_bad} mismatches")
+    print(f"nltk:  {nltk_s:.2f}s ({len(texts) / nltk_s:.0f} reviews/s)")
+    print(f"batch: {batch_s:.2f}s ({len(texts) / batch_s:.0f} reviews/s), {nltk_s / batch_s:.1f}x")
+    for text, expected, got in examples:
+        print(f"  nltk={expected} batch={got}: {text[:80]!r}")
+    if n_bad:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
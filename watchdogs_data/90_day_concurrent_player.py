@@ -1,9 +1,20 @@
-import requests
-import json
+import argparse
+import asyncio
+import os
 import sqlite3
 import csv
+import sys
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
+import aiohttp
+
+# shared helpers live in the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from async_fetch import get_json, make_session
+
+STEAMCHARTS_URL = "https://steamcharts.com/app/{appid}/chart-data.json"
+MAX_CONCURRENT_GAMES = 8  # requests still go through the per-host rate limit in async_fetch
 
 
 def init_db(db_path: str):
@@ -19,39 +30,35 @@ def init_db(db_path: str):
     return conn
 
 
-def init_csv(csv_path: str):
-    f = open(csv_path, mode="w", newline="", encoding="utf-8")
-    writer = csv.writer(f)
-    writer.writerow([
-        "timestamp",
-        "player_count"
-    ])
-    return f, writer
-
-
-
-def save_player_csv(writer, data):
-    writer.writerow([
-        data[0],
-        data[1]
-    ])
+def latest_timestamp(conn):
+    """Newest stored point (steamcharts ms timestamp), or None for an empty DB."""
+    return conn.execute("SELECT MAX(timestamp) FROM reviews").fetchone()[0]
 
 
-def save_player_db(conn, data):
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT OR REPLACE INTO reviews (
-            timestamp,
-            player_count
-        ) VALUES (?, ?)
-    """, (
-        data[0],
-        data[1]))
-    conn.commit()
-    dt = datetime.fromtimestamp(int(data[0])/1000, tz=timezone.utc)
-    formatted_date = dt.strftime("%Y-%m-%d")
-    print(formatted_date)
-    
+def save_player_points(conn, points):
+    """
+    Store the [timestamp, player_count] points newer than the latest one
+    already in the DB, all in one transaction. Returns how many were new.
+    """
+    latest = latest_timestamp(conn)
+    new = [(int(ts), count) for ts, count in points if latest is None or int(ts) > latest]
+    if new:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO reviews (timestamp, player_count) VALUES (?, ?)", new)
+    return len(new)
+
+
+def write_players_csv(conn, csv_path: str):
+    """Write the whole stored series to csv_path (via a temp file, so a crash never leaves half a CSV)."""
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "timestamp",
+            "player_count"
+        ])
+        writer.writerows(conn.execute("SELECT timestamp, player_count FROM reviews ORDER BY timestamp"))
+    os.replace(tmp_path, csv_path)
 
 
 def export_first_90_days_csv(db_path: str, out_csv_path: str, release_date_str: str):
@@ -93,7 +100,6 @@ def export_first_90_days_csv(db_path: str, out_csv_path: str, release_date_str:
             "timestamp",
             "player_count"
         ])
-        print(rows)
         writer.writerows(rows)
 
     print(f"[{db_path}] Wrote {len(rows)} reviews to 90-day CSV: {out_csv_path}")
@@ -101,16 +107,53 @@ def export_first_90_days_csv(db_path: str, out_csv_path: str, release_date_str:
 
 
 
-def get_concurrent_players(conn,appid,writer):
-    url = f'https://steamcharts.com/app/{appid}/chart-data.json'
-    
-    resp = requests.get(url,timeout=5)
-    resp.raise_for_status()
-    data = resp.json()
-    for row in data:
-        save_player_db(conn,row)
-        save_player_csv(writer,row)
-        
+async def get_concurrent_players(session, appid):
+    """The full steamcharts series for appid as [[ms timestamp, players], ...]; ValueError if it isn't one."""
+    points = await get_json(session, STEAMCHARTS_URL.format(appid=appid), label=f"appid {appid}")
+    if not isinstance(points, list) or not all(
+            isinstance(p, list) and len(p) == 2 and isinstance(p[0], (int, float))
+            and (p[1] is None or isinstance(p[1], (int, float))) for p in points):
+        raise ValueError(f"unexpected chart payload: {str(points)[:100]}")
+    return points
+
+
+def store_players(game, points):
+    """Save the new points of one game and refresh its CSV. Runs in a thread, off the event loop."""
+    slug = game["slug"]
+    db_path = f"{slug}_players.db"
+    csv_path_all = f"{slug}_players.csv"
+
+    conn = init_db(db_path)
+    try:
+        added = save_player_points(conn, points)
+        if added or not os.path.exists(csv_path_all):
+            write_players_csv(conn, csv_path_all)
+        latest = latest_timestamp(conn)
+    finally:
+        conn.close()
+    return added, latest
+
+
+async def collect_players(games, concurrency=MAX_CONCURRENT_GAMES):
+    """Fetch and store every game's series, `concurrency` games at a time."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(session, game):
+        appid = game["appid"]
+        async with sem:
+            try:
+                points = await get_concurrent_players(session, appid)
+            except (aiohttp.ClientError, RuntimeError, ValueError, TypeError) as e:
+                print(f"[appid {appid}] {game['title']}: failed: {e}")
+                return
+            added, latest = await asyncio.to_thread(store_players, game, points)
+
+        day = datetime.fromtimestamp(latest / 1000, tz=timezone.utc).strftime("%Y-%m-%d") if latest else "-"
+        print(f"[appid {appid}] {game['title']}: {added} new of {len(points)} points, latest {day} "
+              f"-> {game['slug']}_players.db")
+
+    async with make_session(limit_per_host=concurrency) as session:
+        await asyncio.gather(*(one(session, g) for g in games))
 
 
 GAMES = [
@@ -135,30 +178,25 @@ GAMES = [
 ]
 
 def main():
-    for game in GAMES:
-        appid = game["appid"]
-        slug = game["slug"]
-        title = game["title"]
-        release_date = game["release_date"]
-
-        db_path = f"{slug}_players.db"
-        csv_path_all = f"{slug}_players.csv"
-        csv_path_90 = f"{slug}_players_first90d.csv"
-
-        print(f"\n===== Starting {title} (appid {appid}) =====")
-        print(f"DB:           {db_path}")
-
-        conn = init_db(db_path)
-        csv_file, csv_writer = init_csv(csv_path_all)
+    parser = argparse.ArgumentParser(description="Pull concurrent player counts from steamcharts into per-game DBs.")
+    parser.add_argument("--games-csv", help="games list with name, slug, appid, release_date "
+                                            "(e.g. ../data/games_list.csv); default: the Watch Dogs games")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_GAMES,
+                        help="number of games fetched at the same time")
+    args = parser.parse_args()
 
-        try:
-            get_concurrent_players(conn,appid,csv_writer)
-        finally:
-            conn.close()
+    games = GAMES
+    if args.games_csv:
+        from review_collection import load_games_from_csv
+        games = load_games_from_csv(args.games_csv)
 
-        # export_first_90_days_csv(db_path, csv_path_90, release_date)
+    print(f"Pulling steamcharts player counts for {len(games)} game(s)")
+    asyncio.run(collect_players(games, args.concurrency))
 
+    # for game in games:
+    #     export_first_90_days_csv(f"{game['slug']}_players.db", f"{game['slug']}_players_first90d.csv",
+    #                              game["release_date"])
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,22 @@
 import requests
-import sqlite3
 import time
-import json
-import csv
-from datetime import datetime, timedelta
+import os
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# shared helpers live in the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from review_archive import ReviewArchive, archive_legacy_csv
+from review_checkpoints import ReviewCheckpoint
+from review_sink import ReviewSink
+from review_store import (REVIEW_CSV_COLUMNS, init_review_db, save_reviews, import_legacy_db, count_reviews,
+                          review_sync_state, export_first_90_days_csv)
+from review_sync import page_is_known, new_reviews_only
+
+CHECKPOINT_DIR = Path("checkpoints")
+REQUEST_TIMEOUT_S = 10
 
 # All games from Watch Dogs franchise to pull reviews from
 GAMES = [
@@ -28,80 +41,11 @@ GAMES = [
 ]
 
 
-def init_db(db_path: str):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS reviews (
-            recommendationid TEXT PRIMARY KEY,
-            steamid TEXT,
-            review TEXT,
-            timestamp_created INTEGER,
-            timestamp_updated INTEGER,
-            voted_up INTEGER,
-            weighted_vote_score REAL,
-            playtime_forever INTEGER,
-            playtime_at_review INTEGER,
-            last_played INTEGER,
-            raw_json TEXT
-        )
-    """)
-    conn.commit()
-    return conn
-
-
-def init_csv(csv_path: str):
-    f = open(csv_path, mode="w", newline="", encoding="utf-8")
-    writer = csv.writer(f)
-    writer.writerow([
-        "recommendationid",
-        "steamid",
-        "review",
-        "timestamp_created",
-        "timestamp_updated",
-        "voted_up",
-        "weighted_vote_score",
-        "playtime_forever",
-        "playtime_at_review",
-        "last_played",
-        "raw_json",
-    ])
-    return f, writer
+def init_csv(csv_path: str, append: bool = False):
+    return ReviewSink(csv_path, REVIEW_CSV_COLUMNS, append=append)
 
 
-def save_review_db(conn, r):
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT OR REPLACE INTO reviews (
-            recommendationid,
-            steamid,
-            review,
-            timestamp_created,
-            timestamp_updated,
-            voted_up,
-            weighted_vote_score,
-            playtime_forever,
-            playtime_at_review,
-            last_played,
-            raw_json
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        r.get("recommendationid"),
-        str(r.get("author", {}).get("steamid")),
-        r.get("review"),
-        r.get("timestamp_created"),
-        r.get("timestamp_updated"),
-        1 if r.get("voted_up") else 0,
-        float(r.get("weighted_vote_score") or 0.0),
-        r.get("author", {}).get("playtime_forever"),
-        r.get("author", {}).get("playtime_at_review"),
-        r.get("author", {}).get("last_played"),
-        json.dumps(r, ensure_ascii=False)
-    ))
-    conn.commit()
-
-
-def save_review_csv(writer, r):
+def save_review_csv(writer, r, raw_ref):
     writer.writerow([
         r.get("recommendationid"),
         str(r.get("author", {}).get("steamid")),
@@ -113,15 +57,22 @@ def save_review_csv(writer, r):
         r.get("author", {}).get("playtime_forever"),
         r.get("author", {}).get("playtime_at_review"),
         r.get("author", {}).get("last_played"),
-        json.dumps(r, ensure_ascii=False),
+        raw_ref,
     ])
 
 
-def fetch_all_reviews(app_id, conn, csv_writer):
+def fetch_all_reviews(app_id, conn, csv_writer, checkpoint=None, archive=None):
+    """
+    Page through every review for app_id into the shared review DB and the CSV sink.
+    Raw pages go to the page archive; the DB and CSV rows point into it.
+    With a checkpoint, paging resumes from the saved cursor and progress
+    is saved every page.
+    """
     steam_reviews_url = f"https://store.steampowered.com/appreviews/{app_id}"
-    cursor = "*"
+    cursor = checkpoint.cursor if checkpoint else "*"
     total = 0
-    unique = set()
+    unique = set(checkpoint.seen) if checkpoint else set()
+    archive = archive or ReviewArchive(app_id)
 
     while len(unique) < 40000: #Want to avoid having too large of a file size:
         params = {
@@ -134,7 +85,7 @@ def fetch_all_reviews(app_id, conn, csv_writer):
             "cursor": cursor,
         }
 
-        resp = requests.get(steam_reviews_url, params=params, timeout=5)
+        resp = requests.get(steam_reviews_url, params=params, timeout=REQUEST_TIMEOUT_S)
 
         if resp.status_code == 429:
             print(f"[appid {app_id}] rate limited, sleeping 10s...")
@@ -151,18 +102,31 @@ def fetch_all_reviews(app_id, conn, csv_writer):
         reviews = data.get("reviews", [])
         if not reviews:
             print(f"[appid {app_id}] Finished fetching all reviews (no more pages).")
+            if checkpoint:
+                checkpoint.mark_done(csv_writer.flush())
             break
 
-        for r in reviews:
+        page_offset = archive.append_page(reviews, cursor)
+        new_reviews = []
+        raw_refs = []
+        for position, r in enumerate(reviews):
             rec_id = r.get("recommendationid")
             if rec_id not in unique:
                 unique.add(rec_id)
-                save_review_db(conn, r)
-                save_review_csv(csv_writer, r)
+                raw_ref = archive.ref(page_offset, position)
+                save_review_csv(csv_writer, r, raw_ref)
+                new_reviews.append(r)
+                raw_refs.append(raw_ref)
                 total += 1
 
+        # one transaction per page
+        save_reviews(conn, app_id, new_reviews, raw_refs)
 
         new_cursor = data.get("cursor")
+        if checkpoint:
+            finished = len(unique) >= 40000 or not new_cursor or new_cursor == cursor
+            checkpoint.save(new_cursor or cursor, new_reviews, csv_writer.flush(), done=finished)
+
         if not new_cursor or new_cursor == cursor:
             print(f"[appid {app_id}] cursor did not advance, stopping.")
             break
@@ -173,110 +137,140 @@ def fetch_all_reviews(app_id, conn, csv_writer):
 
 
 
-def export_first_90_days_csv(db_path: str, out_csv_path: str, release_date_str: str):
+def sync_new_reviews(app_id, conn, csv_writer, archive=None):
     """
-    Read from the SQLite DB for one game and write a CSV containing
-    only reviews within 90 days of release_date_str (YYYY-MM-DD).
+    Delta sync against the shared review DB: page from the newest review,
+    store only reviews we don't have, and stop at the first page that is
+    entirely made of known reviews.
     """
-    # Compute unix timestamps for [release_date, release_date + 90 days]
-    release_dt = datetime.strptime(release_date_str, "%Y-%m-%d")
-    end_dt = release_dt + timedelta(days=90)
-    print(release_dt, end_dt)
-    release_ts = int(release_dt.timestamp())
-    end_ts = int(end_dt.timestamp())
-
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    steam_reviews_url = f"https://store.steampowered.com/appreviews/{app_id}"
+    archive = archive or ReviewArchive(app_id)
+    known_ids, newest_created = review_sync_state(conn, app_id)
+    cursor = "*"
+    total = 0
+    pages = 0
 
-    cur.execute("""
-        SELECT
-            recommendationid,
-            steamid,
-            review,
-            timestamp_created,
-            timestamp_updated,
-            voted_up,
-            weighted_vote_score,
-            playtime_forever,
-            playtime_at_review,
-            last_played,
-            raw_json
-        FROM reviews
-        WHERE timestamp_created BETWEEN ? AND ?
-        ORDER BY timestamp_created ASC
-    """, (release_ts, end_ts))
-
-    rows = cur.fetchall()
-    conn.close()
-
-    # Write filtered rows to a new CSV
-    with open(out_csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "recommendationid",
-            "steamid",
-            "review",
-            "timestamp_created",
-            "timestamp_updated",
-            "voted_up",
-            "weighted_vote_score",
-            "playtime_forever",
-            "playtime_at_review",
-            "last_played",
-            "raw_json",
-        ])
-        writer.writerows(rows)
-
-    print(f"[{db_path}] Wrote {len(rows)} reviews to 90-day CSV: {out_csv_path}")
+    while True:
+        params = {
+            "json": 1,
+            "language": "all",
+            "filter": "recent",
+            "review_type": "all",
+            "purchase_type": "all",
+            "num_per_page": 100,
+            "cursor": cursor,
+        }
 
+        resp = requests.get(steam_reviews_url, params=params, timeout=REQUEST_TIMEOUT_S)
 
-def main():
-    for game in GAMES:
-        appid = game["appid"]
-        slug = game["slug"]
-        title = game["title"]
-        release_date = game["release_date"]
+        if resp.status_code == 429:
+            print(f"[appid {app_id}] rate limited, sleeping 10s...")
+            time.sleep(10)
+            continue
 
-        db_path = f"{slug}_reviews.db"
-        csv_path_all = f"{slug}_reviews.csv"
-        csv_path_90 = f"{slug}_reviews_first90d.csv"
+        resp.raise_for_status()
+        pages += 1
+        data = resp.json()
 
-        print(f"\n===== Starting {title} (appid {appid}) =====")
-        print(f"DB:           {db_path}")
-        print(f"CSV (all):    {csv_path_all}")
-        print(f"CSV (90 days): {csv_path_90}")
+        if data.get("success") != 1:
+            print(f"[appid {app_id}] request unsuccessful")
+            break
 
-        # conn = init_db(db_path)
-        # csv_file, csv_writer = init_csv(csv_path_all)
+        reviews = data.get("reviews", [])
+        if not reviews or page_is_known(reviews, known_ids, newest_created):
+            break
 
-        # try:
-        #     fetch_all_reviews(appid, conn, csv_writer)
-        # finally:
-        #     conn.close()
-        #     csv_file.close()
+        new_reviews = new_reviews_only(reviews, known_ids, newest_created)
+        page_offset = archive.append_page(reviews, cursor)
+        position = {id(r): i for i, r in enumerate(reviews)}
+        raw_refs = [archive.ref(page_offset, position[id(r)]) for r in new_reviews]
+        for r, raw_ref in zip(new_reviews, raw_refs):
+            save_review_csv(csv_writer, r, raw_ref)
+        save_reviews(conn, app_id, new_reviews, raw_refs)
+        known_ids.update(str(r.get("recommendationid")) for r in new_reviews)
+        total += len(new_reviews)
 
-        # Now create the truncated 90-day CSV from the DB
-        export_first_90_days_csv(db_path, csv_path_90, release_date)
+        new_cursor = data.get("cursor")
+        if not new_cursor or new_cursor == cursor:
+            break
+        cursor = new_cursor
 
-        print(f"===== Finished {title} =====\n")
+    print(f"[appid {app_id}] Sync done. {total} new reviews in {pages} requests.")
+    return total
 
 
-def find_first_date(db_path):
-    print("path:", db_path)
-    conn = sqlite3.connect(db_path)
+def main():
+    parser = argparse.ArgumentParser(description="Pull Watch Dogs franchise reviews and export the first 90 days.")
+    parser.add_argument("--fetch", action="store_true",
+                        help="pull reviews from Steam before exporting (otherwise only export from the DB)")
+    parser.add_argument("--resume", action="store_true",
+                        help="with --fetch, continue each game from its last checkpoint")
+    parser.add_argument("--sync", action="store_true",
+                        help="only fetch reviews newer than the ones already in the DB")
+    args = parser.parse_args()
+
+    conn = init_review_db()
+
+    try:
+        for game in GAMES:
+            appid = game["appid"]
+            slug = game["slug"]
+            title = game["title"]
+            release_date = game["release_date"]
+
+            legacy_db_path = f"{slug}_reviews.db"
+            csv_path_all = f"{slug}_reviews.csv"
+            csv_path_90 = f"{slug}_reviews_first90d.csv"
+
+            print(f"\n===== Starting {title} (appid {appid}) =====")
+            print(f"CSV (all):    {csv_path_all}")
+            print(f"CSV (90 days): {csv_path_90}")
+
+            # Reviews pulled before the shared DB existed live in one DB per game
+            if count_reviews(conn, appid) == 0 and Path(legacy_db_path).exists():
+                copied = import_legacy_db(conn, appid, legacy_db_path)
+                print(f"[appid {appid}] Imported {copied} reviews from {legacy_db_path}")
+
+            archive = ReviewArchive(appid)
+            dropped = archive.repair()
+            if dropped:
+                print(f"[appid {appid}] Dropped {dropped} bytes of a half-written page from {archive.path}")
+
+            if args.sync and count_reviews(conn, appid) > 0:
+                # CSVs written before the archive still have a raw_json column
+                if Path(csv_path_all).exists() and archive_legacy_csv(csv_path_all, archive):
+                    print(f"[{csv_path_all}] Moved raw_json into {archive.path}")
+                with init_csv(csv_path_all, append=True) as sink:
+                    sync_new_reviews(appid, conn, sink, archive)
+            elif args.fetch:
+                checkpoint = ReviewCheckpoint.load(appid, CHECKPOINT_DIR)
+                if args.resume and checkpoint.done:
+                    print(f"[appid {appid}] Already finished in a previous run, skipping fetch.")
+                else:
+                    append = args.resume and checkpoint.truncate_csv(csv_path_all)
+                    if append and archive_legacy_csv(csv_path_all, archive):
+                        print(f"[{csv_path_all}] Moved raw_json into {archive.path}")
+                        checkpoint.save(checkpoint.cursor, [], os.path.getsize(csv_path_all), done=checkpoint.done)
+                    if not append:
+                        checkpoint.reset()
+
+                    with init_csv(csv_path_all, append=append) as sink:
+                        fetch_all_reviews(appid, conn, sink, checkpoint, archive)
+
+            # Now create the truncated 90-day CSV from the DB
+            export_first_90_days_csv(conn, appid, csv_path_90, release_date)
+
+            print(f"===== Finished {title} =====\n")
+    finally:
+        conn.close()
+
+
+def find_first_date(conn, appid):
+    """When the game's earliest stored review was written (UTC), or None if it has none."""
     cur = conn.cursor()
-    cur.execute("""
-        SELECT 
-            COUNT(*),
-            MIN(timestamp_created),
-            MAX(timestamp_created)
-        FROM reviews
-    """)
-    count, t_min, t_max = cur.fetchone()
-    conn.close()
-
-    print("earliest review:", datetime.utcfromtimestamp(t_min))
-    print()
+    cur.execute("SELECT MIN(timestamp_created) FROM reviews WHERE appid = ?", (appid,))
+    (t_min,) = cur.fetchone()
+    return datetime.utcfromtimestamp(t_min) if t_min is not None else None
 
 
 if __name__ == "__main__":